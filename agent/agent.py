@@ -1,24 +1,77 @@
 from __future__ import annotations
 from typing import AsyncGenerator,Optional
 from pathlib import Path
+import asyncio
+import json
+import logging
 from agent.event import AgentEvent
 
 from client.llm_client import LLMClient
-from client.response import StreamEventType,ToolCall,ToolResultMessage
+from client.response import StreamEventType,TokenUsage,ToolCall,ToolResultMessage
 from agent.event import AgentEventType
 
 from context.manager import ContextManager
-from tools.registry import create_default_registry
+from tools.base import ToolResult
+from tools.builtin.spawn_agent import SpawnAgentTool
+from tools.registry import ToolRegistry,create_default_registry
+from tools.shaping import output_budget
+from utils.memory import over_soft_limit
+from workspace.snapshot import attach_watcher
+from workspace.watcher import WorkspaceWatcher
+
+logger = logging.getLogger(__name__)
+
+FINAL_TURN_PROMPT = (
+    "This is your last request and tools are no longer available. "
+    "Answer now with what you have found so far."
+)
 
 class Agent:
-    def __init__(self):
-        self.client = LLMClient()
-        self.contextManager = ContextManager()
-        self.tool_registry = create_default_registry()
+    """One conversation.
+
+    ``client`` and ``watcher`` may be shared between agents (see agent/batch.py);
+    an agent only closes or stops the ones it created itself. A ``tool_registry``
+    passed in (a sub-agent's, see tools/builtin/spawn_agent.py) is already
+    kept current by its owner and gets no ``spawn_agent`` of its own.
+
+    Each run makes up to ``max_turns`` requests, feeding tool results back
+    until the model answers without calling a tool. When there is more than
+    one, the last is sent without tools so the run always ends in an answer.
+    """
+
+    def __init__(
+        self,
+        cwd : Optional[Path] = None,
+        client : Optional[LLMClient] = None,
+        watcher : Optional[WorkspaceWatcher] = None,
+        tool_registry : Optional[ToolRegistry] = None,
+        max_turns : int = 1,
+    ):
+        self.cwd = Path(cwd).resolve() if cwd else Path.cwd()
+        self._owns_client = client is None
+        self.client = client or LLMClient()
+        self.contextManager = ContextManager(self.cwd)
+        self.max_turns = max_turns
+        self._owns_watcher = watcher is None
+        self.watcher = watcher or WorkspaceWatcher(self.cwd)
+        self._detach_registry = None
+        if tool_registry is None:
+            self.tool_registry = create_default_registry()
+            self.tool_registry.register(SpawnAgentTool(self.tool_registry, self.client, self.watcher))
+            self._detach_registry = self.tool_registry.attach_watcher(self.watcher)
+        else:
+            self.tool_registry = tool_registry
+        self._detach_snapshots = None
+        self._detach_repo_maps = None
+        self._preparing : Optional[asyncio.Future] = None
+        self._usage : Optional[TokenUsage] = None
 
     async def run(self, messages : str):
         yield AgentEvent.agent_start(messages)
         self.contextManager.add_user_message(messages)
+        self._usage = None
+        if self._preparing is not None:
+            await self._preparing
 
         final_response : Optional[str] = None
         async for event in self._agentic_loop():
@@ -26,16 +79,43 @@ class Agent:
             if event.type == AgentEventType.TEXT_COMPLETE:
                 final_response = event.data.get("content")
         
-        yield AgentEvent.agent_end(final_response)
+        self._enforce_memory_limit()
+        yield AgentEvent.agent_end(final_response, self._usage)
+
+    def _enforce_memory_limit(self) -> None:
+        """Past MEMORY_SOFT_LIMIT_MB, drop old tool outputs from the conversation."""
+        if not over_soft_limit():
+            return
+        freed = self.contextManager.compact()
+        if freed:
+            logger.info(f"Memory above soft limit, compacted {freed} chars of old tool output")
 
     async def _agentic_loop(self) -> AsyncGenerator[AgentEvent | None]:
+        for turn in range(1, self.max_turns + 1):
+            tool_calls : list[ToolCall] = []
+            failed = False
+            final = self.max_turns > 1 and turn == self.max_turns
+            async for event in self._turn(tool_calls, final):
+                yield event
+                if event.type == AgentEventType.AGENT_ERROR:
+                    failed = True
+            if failed or not tool_calls:
+                return
+
+    async def _turn(self, tool_calls : list[ToolCall], final : bool = False) -> AsyncGenerator[AgentEvent]:
+        """One request and the tool calls it asked for, collected into ``tool_calls``.
+
+        A ``final`` request offers no tools and asks for the answer outright.
+        """
         response_text = ""
         tool_schemas = self.tool_registry.get_schemas()
-        tool_calls : list[ToolCall] = []
+        self.contextManager.set_tools(tool_schemas)
+        if final:
+            self.contextManager.add_user_message(FINAL_TURN_PROMPT)
 
         async for event in self.client.chat_completion(
             self.contextManager.get_messages(), 
-            tools = tool_schemas if tool_schemas else None,
+            tools = tool_schemas if tool_schemas and not final else None,
             stream = True
         ):  
             if event.type == StreamEventType.TEXT_DELTA:
@@ -46,6 +126,10 @@ class Agent:
             elif event.type == StreamEventType.TOOL_CALL_COMPLETE:
                 if event.tool_call:
                     tool_calls.append(event.tool_call)
+            elif event.type == StreamEventType.MESSAGE_COMPLETE:
+                self.contextManager.record_usage(event.usage)
+                if event.usage:
+                    self._usage = self._usage + event.usage if self._usage else event.usage
             elif event.type == StreamEventType.ERROR:
                 yield AgentEvent.agent_error(event.error or "Unkown error occured")
 
@@ -57,7 +141,7 @@ class Agent:
                     "type" : "function",
                     "function" : {
                         "name" : tc.name,
-                        "arguments" : str(tc.arguments)
+                        "arguments" : json.dumps(tc.arguments)
                     }
                 }
                 for tc in tool_calls
@@ -69,18 +153,22 @@ class Agent:
         if response_text:
             yield AgentEvent.text_complete(response_text)
         
-        tool_call_results : list[ToolResultMessage] = []
-        for tool_call in tool_calls:
+        for index, tool_call in enumerate(tool_calls):
             yield AgentEvent.tool_call_start(
                 tool_call.call_id,
                 tool_call.name,
                 tool_call.arguments,
             )
-            result = await self.tool_registry.invoke(
-                tool_call.name,
-                tool_call.arguments,
-                Path.cwd(),
+            max_tokens = output_budget(
+                self.contextManager.remaining_tokens,
+                len(tool_calls) - index,
             )
+            result = None
+            async for event in self._invoke_tool(tool_call, max_tokens):
+                if isinstance(event, AgentEvent):
+                    yield event
+                else:
+                    result = event
 
             yield AgentEvent.tool_call_complete(
                 tool_call.call_id,
@@ -88,21 +176,74 @@ class Agent:
                 result,
             )
 
-            tool_call_results.append(
-                ToolResultMessage(
-                    tool_call_id = tool_call.call_id,
-                    content = result.to_model_output(),
-                    isError = not result.success
-                )
+            tool_result = ToolResultMessage(
+                tool_call_id = tool_call.call_id,
+                content = result.to_model_output(),
+                isError = not result.success
             )
-        
-        for tool_result in tool_call_results:
             self.contextManager.add_tool_result(
                 tool_result.tool_call_id,
                 tool_result.content
             )
 
+    async def _invoke_tool(self, tool_call : ToolCall, max_tokens : int) -> AsyncGenerator[AgentEvent | ToolResult]:
+        """Run one tool call, yielding its output deltas and finally its result."""
+        queue : asyncio.Queue[AgentEvent | None] = asyncio.Queue()
+
+        def on_output(stream : str, content : str) -> None:
+            queue.put_nowait(
+                AgentEvent.tool_call_output_delta(
+                    tool_call.call_id,
+                    tool_call.name,
+                    stream,
+                    content,
+                )
+            )
+
+        task = asyncio.create_task(
+            self.tool_registry.invoke(
+                tool_call.name,
+                tool_call.arguments,
+                self.cwd,
+                on_output = on_output,
+                max_tokens = max_tokens,
+            )
+        )
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+            yield await task
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def _warm_up(self) -> None:
+        """Build the HTTP client and tool schemas before the first request needs them."""
+        self.contextManager.set_tools(self.tool_registry.get_schemas())
+        try:
+            self.client.get_client()
+        except Exception:
+            # e.g. a missing API key; the first request reports it
+            logger.debug("LLM client warm-up failed", exc_info = True)
+
     async def __aenter__(self) -> Agent:
+        # the system prompt (environment, repository map) is built in the
+        # background and only awaited by the first request
+        self._preparing = asyncio.ensure_future(asyncio.to_thread(self.contextManager.prepare))
+        if not self._owns_watcher:
+            await asyncio.to_thread(self._warm_up)
+            return self
+
+        from workspace.repo_map import watch_repo_maps
+
+        await asyncio.gather(
+            self.watcher.start(),
+            asyncio.to_thread(self._warm_up),
+        )
+        self._detach_snapshots = attach_watcher(self.watcher)
+        self._detach_repo_maps = watch_repo_maps(self.watcher)
         return self
     
     async def __aexit__(
@@ -113,5 +254,18 @@ class Agent:
     ) -> Agent:
         
         if self.client:
-            await self.client.close()
+            if self._owns_client:
+                await self.client.close()
             self.client = None
+
+        if self._detach_registry:
+            self._detach_registry()
+            self._detach_registry = None
+        if self._detach_snapshots:
+            self._detach_snapshots()
+            self._detach_snapshots = None
+        if self._detach_repo_maps:
+            self._detach_repo_maps()
+            self._detach_repo_maps = None
+        if self._owns_watcher:
+            await self.watcher.stop()
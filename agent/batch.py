@@ -0,0 +1,219 @@
+"""Run a JSONL file of prompts through independent agents.
+
+    python main.py --batch prompts.jsonl --concurrency 8
+
+Each input line is a JSON object with a ``prompt`` (or ``body``) and an
+optional ``id`` (or ``request_id``; the line number otherwise), or a bare
+JSON string. Every item gets a fresh Agent, but all of them share one
+LLMClient, so one HTTP connection pool and one RateLimiter, and one
+workspace watcher.
+
+Results are appended to the output file as items finish, one JSON line
+each, so the file is in completion order. Rerunning the same command skips
+ids that already have a successful result; failed items are retried and
+their new line supersedes the old one.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any,Iterator,Optional,TextIO
+from agent.agent import Agent
+from agent.event import AgentEventType
+from client.llm_client import LLMClient
+from client.rate_limit import RateLimiter
+from utils.config import get_config
+from workspace.repo_map import watch_repo_maps
+from workspace.snapshot import attach_watcher
+from workspace.watcher import WorkspaceWatcher
+import asyncio
+import json
+import logging
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchItem:
+    id : str
+    prompt : str
+
+
+@dataclass
+class BatchSummary:
+    total : int = 0
+    skipped : int = 0
+    succeeded : int = 0
+    failed : int = 0
+
+
+def load_items(path : Path) -> list[BatchItem]:
+    items = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e.msg})") from None
+
+            if isinstance(data, str):
+                data = {"prompt" : data}
+            prompt = (data.get("prompt") or data.get("body")) if isinstance(data, dict) else None
+            if not prompt:
+                raise ValueError(f"{path}:{line_number}: expected a 'prompt' field")
+
+            item_id = str(data.get("id") or data.get("request_id") or line_number)
+            if item_id in seen:
+                raise ValueError(f"{path}:{line_number}: duplicate id {item_id!r}")
+            seen.add(item_id)
+            items.append(BatchItem(item_id, prompt))
+    return items
+
+
+def completed_ids(path : Path) -> set[str]:
+    """Ids with a successful result in an earlier run's output."""
+    done = set()
+    if not path.exists():
+        return done
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short when the last run was interrupted
+            if record.get("success"):
+                done.add(str(record["id"]))
+            else:
+                done.discard(str(record.get("id")))
+    return done
+
+
+def default_output_path(input_path : Path) -> Path:
+    return input_path.with_name(f"{input_path.stem}.results.jsonl")
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        input_path : Path,
+        output_path : Optional[Path] = None,
+        concurrency : int = 4,
+        cwd : Optional[Path] = None,
+    ) -> None:
+        self.input_path = Path(input_path)
+        self.output_path = Path(output_path) if output_path else default_output_path(self.input_path)
+        self.concurrency = max(1, concurrency)
+        self.cwd = Path(cwd).resolve() if cwd else Path.cwd()
+        self.summary = BatchSummary()
+
+    async def run(self) -> BatchSummary:
+        items = load_items(self.input_path)
+        done = completed_ids(self.output_path)
+        pending = [item for item in items if item.id not in done]
+        self.summary = BatchSummary(total=len(items), skipped=len(items) - len(pending))
+        if not pending:
+            return self.summary
+
+        client = LLMClient(RateLimiter(get_config().llm_requests_per_minute))
+        watcher = WorkspaceWatcher(self.cwd)
+        await watcher.start()
+        detach_snapshots = attach_watcher(watcher)
+        detach_repo_maps = watch_repo_maps(watcher)
+        try:
+            with self._open_output() as out:
+                queue = iter(pending)
+                workers = [
+                    self._worker(queue, client, watcher, out)
+                    for _ in range(min(self.concurrency, len(pending)))
+                ]
+                await asyncio.gather(*workers)
+        finally:
+            detach_snapshots()
+            detach_repo_maps()
+            await watcher.stop()
+            await client.close()
+        return self.summary
+
+    def _open_output(self) -> TextIO:
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        partial_line = False
+        if self.output_path.exists() and self.output_path.stat().st_size:
+            with open(self.output_path, "rb") as f:
+                f.seek(-1, 2)
+                partial_line = f.read(1) != b"\n"
+
+        out = open(self.output_path, "a", encoding="utf-8")
+        # an interrupted run can leave a partial last line; start on a fresh one
+        if partial_line:
+            out.write("\n")
+        return out
+
+    async def _worker(
+        self,
+        queue : Iterator[BatchItem],
+        client : LLMClient,
+        watcher : WorkspaceWatcher,
+        out : TextIO,
+    ) -> None:
+        # the iterator is only advanced between awaits, so workers can share it
+        for item in queue:
+            record = await self._run_item(item, client, watcher)
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+            if record["success"]:
+                self.summary.succeeded += 1
+            else:
+                self.summary.failed += 1
+            finished = self.summary.succeeded + self.summary.failed
+            status = "ok" if record["success"] else "failed"
+            print(
+                f"[{finished}/{self.summary.total - self.summary.skipped}] "
+                f"{item.id} {status} {record['duration_ms'] / 1000:.1f}s",
+                file=sys.stderr,
+            )
+
+    async def _run_item(self, item : BatchItem, client : LLMClient, watcher : WorkspaceWatcher) -> dict[str, Any]:
+        start = time.perf_counter()
+        response = None
+        usage = None
+        errors = []
+        tool_calls = 0
+
+        try:
+            agent = await asyncio.to_thread(Agent, self.cwd, client, watcher)
+            async with agent:
+                async for event in agent.run(item.prompt):
+                    if event.type == AgentEventType.AGENT_END:
+                        response = event.data.get("response")
+                        usage = event.data.get("usage")
+                    elif event.type == AgentEventType.AGENT_ERROR:
+                        errors.append(event.data.get("error"))
+                    elif event.type == AgentEventType.TOOL_CALL_START:
+                        tool_calls += 1
+        except Exception as e:
+            logger.exception(f"Batch item {item.id} failed")
+            errors.append(f"{type(e).__name__}: {e}")
+
+        return {
+            "id" : item.id,
+            "success" : response is not None and not errors,
+            "response" : response,
+            "errors" : errors,
+            "tool_calls" : tool_calls,
+            "usage" : usage,
+            "duration_ms" : round((time.perf_counter() - start) * 1000, 1),
+        }
+
+
+async def run_batch(
+    input_path : Path,
+    output_path : Optional[Path] = None,
+    concurrency : int = 4,
+) -> BatchSummary:
+    return await BatchRunner(input_path, output_path, concurrency).run()
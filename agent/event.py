@@ -15,6 +15,7 @@ class AgentEventType(str,Enum):
     TEXT_COMPLETE = "text_complete"
 
     TOOL_CALL_START = "tool_call_start"
+    TOOL_CALL_OUTPUT_DELTA = "tool_call_output_delta"
     TOOL_CALL_COMPLETE = "tool_call_complete"
 
 @dataclass
@@ -22,6 +23,19 @@ class AgentEvent:
     type : AgentEventType
     data : dict[str, Any]
 
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "type" : self.type.value,
+            "data" : self.data,
+        }
+
+    @classmethod
+    def from_dict(cls, payload : dict[str, Any]) -> AgentEvent:
+        return cls(
+            type = AgentEventType(payload["type"]),
+            data = payload.get("data") or {},
+        )
+
     @classmethod
     def agent_start(
         cls, message
@@ -56,7 +70,7 @@ class AgentEvent:
             type = AgentEventType.AGENT_ERROR,
             data = {
                 'error' : error,
-                details : details or {}
+                'details' : details or {}
             }
         )
     
@@ -96,6 +110,24 @@ class AgentEvent:
             },
         )
     
+    @classmethod
+    def tool_call_output_delta(
+        cls,
+        call_id : str,
+        name : str,
+        stream : str,
+        content : str,
+    ) -> AgentEvent:
+        return cls(
+            type = AgentEventType.TOOL_CALL_OUTPUT_DELTA,
+            data = {
+                "call_id" : call_id,
+                "name" : name,
+                "stream" : stream,
+                "content" : content,
+            },
+        )
+
     @classmethod
     def tool_call_complete(
         cls,
@@ -0,0 +1,85 @@
+"""Startup-time regression benchmark.
+
+Times fresh interpreters for the cheapest CLI path, the imports a prompt run
+needs before its first request, and the full set including openai:
+
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --max-ms agent_imports=400
+
+Exits with status 1 when a case's median exceeds its --max-ms limit.
+"""
+from __future__ import annotations
+from pathlib import Path
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CASES = {
+    "cli_help" : [str(ROOT / "main.py"), "--help"],
+    "agent_imports" : ["-c", "import agent.agent, ui.tui"],
+    "all_imports" : ["-c", "import agent.agent, ui.tui, openai"],
+}
+
+
+def time_case(args : list[str], runs : int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, check=True, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def parse_limits(values : list[str]) -> dict[str, float]:
+    limits = {}
+    for value in values:
+        name, _, ms = value.partition("=")
+        if name not in CASES or not ms:
+            raise SystemExit(f"--max-ms expects CASE=MS with CASE in {', '.join(CASES)}")
+        limits[name] = float(ms)
+    return limits
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--case", action="append", choices=list(CASES), help="Cases to run (default: all)")
+    parser.add_argument("--max-ms", action="append", default=[], metavar="CASE=MS")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    limits = parse_limits(args.max_ms)
+    results = {}
+    for name in args.case or CASES:
+        time_case(CASES[name], 1)  # warm the page cache and __pycache__
+        timings = time_case(CASES[name], args.runs)
+        results[name] = {
+            "median_ms" : round(statistics.median(timings), 1),
+            "min_ms" : round(min(timings), 1),
+            "max_ms" : round(max(timings), 1),
+            "runs" : args.runs,
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'case':<16}{'median':>10}{'min':>10}{'max':>10}")
+        for name, result in results.items():
+            print(f"{name:<16}{result['median_ms']:>10.1f}{result['min_ms']:>10.1f}{result['max_ms']:>10.1f}")
+
+    failed = [
+        name for name, limit in limits.items()
+        if name in results and results[name]["median_ms"] > limit
+    ]
+    for name in failed:
+        print(f"REGRESSION: {name} median {results[name]['median_ms']}ms > {limits[name]}ms", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
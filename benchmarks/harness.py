@@ -0,0 +1,172 @@
+"""Timing, storage and comparison for the microbenchmarks in micro.py.
+
+Each case is timed with ``timeit``: the loop count is picked so one
+repetition takes at least MIN_TIME seconds, then the repetition is repeated
+and the per-call minimum and median are kept. Result files are plain JSON:
+
+    {"meta": {"python": ..., "machine": ..., "git": ...},
+     "results": {"count_token[estimate,1MB]": {"median_s": ..., ...}}}
+
+Comparisons use the median and are only meaningful between files recorded
+on the same machine; ``compare`` warns when the metadata differs.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any,Callable,Optional
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+MIN_TIME = 0.2
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10
+
+
+@dataclass
+class Case:
+    """``setup()`` builds the inputs and returns the zero-argument call to time."""
+    name : str
+    setup : Callable[[], Callable[[], Any]]
+    teardown : Optional[Callable[[], None]] = None
+
+
+def measure(fn : Callable[[], Any], repeat : int = DEFAULT_REPEAT, min_time : float = MIN_TIME) -> dict[str, Any]:
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+
+    per_call = [t / number for t in timer.repeat(repeat, number)]
+    return {
+        "median_s" : statistics.median(per_call),
+        "min_s" : min(per_call),
+        "stdev_s" : statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "loops" : number,
+        "repeat" : repeat,
+    }
+
+
+def run_cases(
+    cases : list[Case],
+    repeat : int = DEFAULT_REPEAT,
+    min_time : float = MIN_TIME,
+    on_result : Optional[Callable[[str, dict[str, Any]], None]] = None,
+) -> dict[str, dict[str, Any]]:
+    results = {}
+    for case in cases:
+        try:
+            fn = case.setup()
+        except Skip as e:
+            results[case.name] = {"skipped" : str(e)}
+        else:
+            try:
+                fn()  # first call pays for imports and cold caches
+                results[case.name] = measure(fn, repeat, min_time)
+            finally:
+                if case.teardown:
+                    case.teardown()
+        if on_result:
+            on_result(case.name, results[case.name])
+    return results
+
+
+class Skip(Exception):
+    """Raised by a case's setup when it cannot run here (e.g. no tokenizer data)."""
+
+
+def machine_info() -> dict[str, Any]:
+    try:
+        git = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        git = None
+
+    return {
+        "python" : platform.python_version(),
+        "implementation" : sys.implementation.name,
+        "platform" : platform.platform(),
+        "machine" : platform.machine(),
+        "processor" : platform.processor() or None,
+        "cpu_count" : os.cpu_count(),
+        "git" : git,
+        "recorded" : time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def resolve_result_path(name : str) -> Path:
+    """Bare names refer to benchmarks/baselines/<name>.json."""
+    path = Path(name)
+    if path.suffix == ".json" or path.parent != Path("."):
+        return path
+    return BASELINE_DIR / f"{name}.json"
+
+
+def save_results(path : Path, results : dict[str, dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"meta" : machine_info(), "results" : results}
+    path.write_text(json.dumps(payload, indent=2, sort_keys=True) + "\n")
+
+
+def load_results(path : Path) -> dict[str, Any]:
+    return json.loads(path.read_text())
+
+
+def format_time(seconds : float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def compare(
+    base : dict[str, Any],
+    new : dict[str, Any],
+    threshold : float = DEFAULT_THRESHOLD,
+) -> tuple[list[str], list[str]]:
+    """Return (report lines, names of cases slower than ``threshold``)."""
+    lines = []
+    differing = [
+        key for key in ("python", "implementation", "machine", "cpu_count")
+        if base["meta"].get(key) != new["meta"].get(key)
+    ]
+    if differing:
+        lines.append(f"warning: results come from different machines ({', '.join(differing)} differ)")
+
+    base_results, new_results = base["results"], new["results"]
+    width = max((len(name) for name in {**base_results, **new_results}), default=10) + 2
+    lines.append(f"{'case':<{width}}{'base':>12}{'new':>12}{'change':>10}")
+
+    regressions = []
+    for name in sorted({**base_results, **new_results}):
+        old, cur = base_results.get(name, {}), new_results.get(name, {})
+        if "median_s" not in old or "median_s" not in cur:
+            status = cur.get("skipped") or old.get("skipped") or ("new" if not old else "missing")
+            lines.append(f"{name:<{width}}{'':>12}{'':>12}  {status}")
+            continue
+
+        change = cur["median_s"] / old["median_s"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        lines.append(
+            f"{name:<{width}}{format_time(old['median_s']):>12}{format_time(cur['median_s']):>12}"
+            f"{change:>+10.1%}{flag}"
+        )
+    return lines, regressions
@@ -0,0 +1,299 @@
+"""End-to-end load test: N concurrent Agent sessions against the mock server.
+
+    python benchmarks/load.py --sessions 100 --turns 3
+    python benchmarks/load.py --sessions 200 --script tools.json --rate-limit-rate 0.05
+    python benchmarks/load.py --server http://127.0.0.1:8089/v1 --json
+
+Unless --server is given, benchmarks/mock_llm.py is started in a subprocess
+with the mock options below, so its work does not show up as event-loop
+lag here. Every session is a real Agent whose requests go through the real
+LLMClient and openai SDK; the sessions share one client, as in --batch.
+Reports turn latency percentiles, time to first event, throughput,
+event-loop lag and resident memory per session. Exits with status 1 when
+--max-p95-ms or --max-lag-ms is exceeded.
+"""
+from __future__ import annotations
+from dataclasses import dataclass,field
+from pathlib import Path
+from typing import Any,Optional
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.mock_llm import add_mock_arguments  # noqa: E402
+
+LAG_INTERVAL = 0.01
+
+
+@dataclass
+class LoadStats:
+    latencies : list[float] = field(default_factory=list)
+    first_event : list[float] = field(default_factory=list)
+    lags : list[float] = field(default_factory=list)
+    rss_samples : list[int] = field(default_factory=list)
+    errors : list[str] = field(default_factory=list)
+    turns : int = 0
+    tool_calls : int = 0
+    completion_tokens : int = 0
+
+
+def percentile(values : list[float], p : float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def ms(seconds : float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # peak rather than current, but the best portable figure
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def make_workspace() -> Path:
+    workspace = Path(tempfile.mkdtemp(prefix="ved-load-"))
+    for i in range(20):
+        package = workspace / f"pkg{i % 4}"
+        package.mkdir(exist_ok=True)
+        (package / f"module{i}.py").write_text(
+            "\n".join(f"def function_{i}_{j}(x):\n    return x * {j}\n" for j in range(30))
+        )
+    (workspace / "README.md").write_text("Synthetic workspace for load testing.\n")
+    return workspace
+
+
+def start_mock(args : argparse.Namespace) -> tuple[subprocess.Popen, str]:
+    command = [
+        sys.executable, str(ROOT / "benchmarks" / "mock_llm.py"),
+        "--ttft-ms", str(args.ttft_ms),
+        "--tokens-per-sec", str(args.tokens_per_sec),
+        "--response-tokens", str(args.response_tokens),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate),
+        "--retry-after", str(args.retry_after),
+    ]
+    if args.script:
+        command += ["--script", str(args.script)]
+    if args.seed is not None:
+        command += ["--seed", str(args.seed)]
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("listening "):
+        process.kill()
+        raise SystemExit(f"mock server failed to start: {line!r}")
+    return process, line.split(" ", 1)[1].strip()
+
+
+def server_stats(base_url : str) -> Optional[dict[str, Any]]:
+    try:
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/stats", timeout=5) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+
+async def monitor(stats : LoadStats, stop : asyncio.Event) -> None:
+    """Sample event-loop lag (oversleep of a short sleep) and RSS."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        stats.lags.append(max(0.0, time.perf_counter() - start - LAG_INTERVAL))
+        if len(stats.lags) % 10 == 0:
+            stats.rss_samples.append(rss_bytes())
+
+
+async def run_session(
+    index : int,
+    args : argparse.Namespace,
+    workspace : Path,
+    client : Any,
+    watcher : Any,
+    stats : LoadStats,
+    ready : asyncio.Barrier,
+) -> None:
+    from agent.agent import Agent
+    from agent.event import AgentEventType
+
+    try:
+        agent = await asyncio.to_thread(Agent, workspace, client, watcher)
+        await agent.__aenter__()
+    except BaseException:
+        await ready.abort()
+        raise
+
+    try:
+        await ready.wait()
+        for turn in range(args.turns):
+            start = time.perf_counter()
+            first = None
+            async for event in agent.run(f"{args.prompt} (session {index}, turn {turn})"):
+                if first is None and event.type not in (AgentEventType.AGENT_START, AgentEventType.AGENT_END):
+                    first = time.perf_counter() - start
+                if event.type == AgentEventType.AGENT_ERROR:
+                    stats.errors.append(event.data.get("error"))
+                elif event.type == AgentEventType.TOOL_CALL_START:
+                    stats.tool_calls += 1
+                elif event.type == AgentEventType.AGENT_END and event.data.get("usage"):
+                    stats.completion_tokens += event.data["usage"]["completion_tokens"]
+
+            stats.latencies.append(time.perf_counter() - start)
+            if first is not None:
+                stats.first_event.append(first)
+            stats.turns += 1
+    finally:
+        await agent.__aexit__(None, None, None)
+
+
+async def run_load(args : argparse.Namespace, workspace : Path) -> dict[str, Any]:
+    from client.llm_client import LLMClient
+    from client.rate_limit import RateLimiter
+    from utils.config import get_config
+    from utils.tokens import warm_up_tokenizer
+    from workspace.snapshot import attach_watcher
+    from workspace.watcher import WorkspaceWatcher
+
+    import agent.agent  # noqa: F401  loaded before the memory baseline
+
+    warm_up_tokenizer()
+    client = LLMClient(RateLimiter(get_config().llm_requests_per_minute))
+    client.get_client()
+    watcher = WorkspaceWatcher(workspace)
+    await watcher.start()
+    detach_snapshots = attach_watcher(watcher)
+
+    stats = LoadStats()
+    stop = asyncio.Event()
+    baseline_rss = rss_bytes()
+    # sessions are built and entered first, so the timed phase is only traffic
+    ready = asyncio.Barrier(args.sessions + 1)
+    sessions = [
+        asyncio.create_task(run_session(i, args, workspace, client, watcher, stats, ready))
+        for i in range(args.sessions)
+    ]
+    try:
+        await ready.wait()
+        sessions_rss = rss_bytes()
+        monitor_task = asyncio.create_task(monitor(stats, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*sessions)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await monitor_task
+    finally:
+        for task in sessions:
+            task.cancel()
+        detach_snapshots()
+        await watcher.stop()
+        await client.close()
+
+    peak_rss = max([sessions_rss, *stats.rss_samples])
+    return {
+        "sessions" : args.sessions,
+        "turns" : stats.turns,
+        "elapsed_s" : round(elapsed, 2),
+        "turns_per_s" : round(stats.turns / elapsed, 2) if elapsed else 0.0,
+        "completion_tokens_per_s" : round(stats.completion_tokens / elapsed, 1) if elapsed else 0.0,
+        "tool_calls" : stats.tool_calls,
+        "errors" : len(stats.errors),
+        "latency_ms" : {f"p{p}" : ms(percentile(stats.latencies, p)) for p in (50, 95, 99)}
+            | {"max" : ms(max(stats.latencies, default=0.0))},
+        "first_event_ms" : {f"p{p}" : ms(percentile(stats.first_event, p)) for p in (50, 95, 99)},
+        "loop_lag_ms" : {f"p{p}" : ms(percentile(stats.lags, p)) for p in (50, 99)}
+            | {"max" : ms(max(stats.lags, default=0.0))},
+        "memory_mb" : {
+            "baseline" : round(baseline_rss / 2**20, 1),
+            "peak" : round(peak_rss / 2**20, 1),
+            "per_session" : round((peak_rss - baseline_rss) / args.sessions / 2**20, 2),
+        },
+        "sample_errors" : sorted(set(stats.errors))[:5],
+    }
+
+
+def print_report(report : dict[str, Any]) -> None:
+    latency, first, lag, memory = report["latency_ms"], report["first_event_ms"], report["loop_lag_ms"], report["memory_mb"]
+    print(f"sessions        {report['sessions']} ({report['turns']} turns in {report['elapsed_s']}s)")
+    print(f"throughput      {report['turns_per_s']} turns/s, {report['completion_tokens_per_s']} tokens/s")
+    print(f"turn latency    p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms  max {latency['max']}ms")
+    print(f"first event     p50 {first['p50']}ms  p95 {first['p95']}ms  p99 {first['p99']}ms")
+    print(f"event-loop lag  p50 {lag['p50']}ms  p99 {lag['p99']}ms  max {lag['max']}ms")
+    print(f"memory          {memory['baseline']}MB -> {memory['peak']}MB, {memory['per_session']}MB/session")
+    print(f"tool calls      {report['tool_calls']}")
+    print(f"errors          {report['errors']}")
+    for error in report["sample_errors"]:
+        print(f"  {error}")
+    if report.get("server"):
+        print(f"server          {json.dumps(report['server'])}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent Agent sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Prompts per session")
+    parser.add_argument("--prompt", default="Summarise this repository")
+    parser.add_argument("--server", help="Base URL of an already running server (default: start the mock)")
+    parser.add_argument("--model", default="mock-model")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail when p95 turn latency is higher")
+    parser.add_argument("--max-lag-ms", type=float, help="Fail when p99 event-loop lag is higher")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock = None
+    base_url = args.server
+    if not base_url:
+        mock, base_url = start_mock(args)
+
+    # settings are read once, on first import of utils.config
+    os.environ["LLM_BASE_URL"] = base_url
+    os.environ["MODEL"] = args.model
+    os.environ.setdefault("OPENROUTER_API_KEY", "mock")
+    os.environ.setdefault("TIKTOKEN_OFFLINE", "1")
+
+    workspace = make_workspace()
+    try:
+        report = asyncio.run(run_load(args, workspace))
+        report["server"] = server_stats(base_url)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+        if mock:
+            mock.terminate()
+            mock.wait(timeout=10)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    failed = []
+    if args.max_p95_ms is not None and report["latency_ms"]["p95"] > args.max_p95_ms:
+        failed.append(f"p95 turn latency {report['latency_ms']['p95']}ms > {args.max_p95_ms}ms")
+    if args.max_lag_ms is not None and report["loop_lag_ms"]["p99"] > args.max_lag_ms:
+        failed.append(f"p99 event-loop lag {report['loop_lag_ms']['p99']}ms > {args.max_lag_ms}ms")
+    for failure in failed:
+        print(f"FAILED: {failure}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
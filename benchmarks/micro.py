@@ -0,0 +1,365 @@
+"""Offline microbenchmarks for the CLI's hot paths.
+
+    python benchmarks/micro.py run                       # print timings
+    python benchmarks/micro.py run --save reference      # store benchmarks/baselines/reference.json
+    python benchmarks/micro.py run --compare reference   # time, then diff against a baseline
+    python benchmarks/micro.py compare reference new.json --threshold 0.15
+    python benchmarks/micro.py list
+
+Cases never touch the network: the LLM stream is a fake chunk iterator, files
+are generated in a temp dir, and MODEL is pinned to an estimator model. The
+exact-tokenizer cases run only when tiktoken's data is cached or can be seeded
+from $TIKTOKEN_BUNDLE_DIR; --save refuses a baseline with skipped cases unless
+--allow-skipped is given.
+Exits with status 1 when a comparison finds a case slower than --threshold.
+"""
+from __future__ import annotations
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any,Callable
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# pin the settings the cases depend on before utils.config reads .env
+os.environ["MODEL"] = "google/gemini-2.5-flash"
+os.environ["TIKTOKEN_OFFLINE"] = "1"
+os.environ["REPO_MAP_TOKENS"] = "0"
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from benchmarks.harness import (  # noqa: E402
+    DEFAULT_REPEAT,DEFAULT_THRESHOLD,MIN_TIME,Case,Skip,compare,format_time,
+    load_results,machine_info,resolve_result_path,run_cases,save_results,
+)
+
+MODEL = os.environ["MODEL"]
+EXACT_MODEL = "gpt-4o"
+
+SIZES = {"1KB" : 1024, "100KB" : 100 * 1024, "1MB" : 1024 * 1024}
+# read_file refuses files over ReadFileTool.MAX_FILE_SIZE (10MB)
+FILE_SIZES = {"1KB" : 1024, "1MB" : 1024 * 1024, "10MB" : 10 * 1024 * 1024}
+HISTORY_SIZES = (10, 100, 1000)
+STREAM_CHUNKS = 2000
+
+_loop = asyncio.new_event_loop()
+_tmp = Path(tempfile.mkdtemp(prefix="ved-bench-"))
+
+
+def sample_text(size : int) -> str:
+    """Source-like text: mixed identifiers, punctuation and line lengths."""
+    line = "    result = compute_total(items, tax_rate=0.2)  # adjust for {n} discounts\n"
+    lines = []
+    total = 0
+    n = 0
+    while total < size:
+        text = line.format(n=n)
+        lines.append(text)
+        total += len(text)
+        n += 1
+    return "".join(lines)[:size]
+
+
+def _counter_case(model : str, text : str) -> Callable[[], Any]:
+    from utils.text import count_token
+    from utils.tokens import get_token_counter,seed_tokenizer_cache
+
+    if model == EXACT_MODEL:
+        seed_tokenizer_cache()
+        if get_token_counter(model).encoder() is None:
+            raise Skip("tiktoken data for gpt-4o is not cached (set TIKTOKEN_BUNDLE_DIR)")
+    return lambda: count_token(text, model)
+
+
+def count_token_cases() -> list[Case]:
+    cases = []
+    for label, size in SIZES.items():
+        text = sample_text(size)
+        for kind, model in (("estimate", MODEL), ("exact", EXACT_MODEL)):
+            cases.append(Case(
+                f"count_token[{kind},{label}]",
+                lambda model=model, text=text: _counter_case(model, text),
+            ))
+    return cases
+
+
+def truncate_text_cases() -> list[Case]:
+    def setup(text : str, preserve_lines : bool) -> Callable[[], Any]:
+        from utils.text import truncate_text
+
+        return lambda: truncate_text(text, 2000, MODEL, preserve_lines=preserve_lines)
+
+    cases = []
+    for label, size in SIZES.items():
+        text = sample_text(size)
+        for mode, preserve in (("lines", True), ("chars", False)):
+            cases.append(Case(
+                f"truncate_text[{mode},{label}]",
+                lambda text=text, preserve=preserve: setup(text, preserve),
+            ))
+    return cases
+
+
+def read_file_cases() -> list[Case]:
+    def setup(path : Path, size : int, params : dict[str, Any]) -> Callable[[], Any]:
+        from tools.base import ToolInvocation
+        from tools.builtin.read_file import ReadFileTool
+
+        if not path.exists():
+            chunk = sample_text(1024 * 1024)
+            with open(path, "w") as f:
+                for _ in range(size // len(chunk)):
+                    f.write(chunk)
+                f.write(chunk[: size % len(chunk)])
+
+        tool = ReadFileTool()
+        invocation = ToolInvocation(cwd=_tmp, params={"path" : str(path), **params})
+        # time a read, not an early error return
+        result = _loop.run_until_complete(tool.execute(invocation))
+        if not result.success:
+            raise Skip(f"read_file failed: {result.error}")
+        return lambda: _loop.run_until_complete(tool.execute(invocation))
+
+    cases = []
+    for label, size in FILE_SIZES.items():
+        path = _tmp / f"read_{label}.txt"
+        cases.append(Case(f"read_file[{label}]", lambda path=path, size=size: setup(path, size, {})))
+        cases.append(Case(
+            f"read_file[{label},limit=100]",
+            lambda path=path, size=size: setup(path, size, {"offset" : 1, "limit" : 100}),
+        ))
+    return cases
+
+
+class _FakeStream:
+    def __init__(self, chunks : list[Any]) -> None:
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            yield chunk
+
+
+def _text_chunks(count : int) -> list[Any]:
+    def chunk(content, finish_reason = None, usage = None):
+        delta = SimpleNamespace(content=content, tool_calls=None)
+        choice = SimpleNamespace(delta=delta, finish_reason=finish_reason)
+        return SimpleNamespace(choices=[choice], usage=usage)
+
+    chunks = [chunk(f"token{i} ") for i in range(count)]
+    chunks.append(chunk(None, "stop"))
+    usage = SimpleNamespace(prompt_tokens=1000, completion_tokens=count, total_tokens=1000 + count)
+    chunks.append(SimpleNamespace(choices=[], usage=usage))
+    return chunks
+
+
+def _tool_call_chunks(count : int) -> list[Any]:
+    def chunk(arguments, first = False):
+        function = SimpleNamespace(name="read_file" if first else None, arguments=arguments)
+        call = SimpleNamespace(index=0, id="call_0" if first else None, function=function)
+        delta = SimpleNamespace(content=None, tool_calls=[call])
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)], usage=None)
+
+    pieces = ['{"path": "', *(f"dir{i}/" for i in range(count)), 'file.py"}']
+    return [chunk(pieces[0], first=True), *(chunk(piece) for piece in pieces[1:])]
+
+
+def stream_response_cases() -> list[Case]:
+    def setup(chunks : list[Any]) -> Callable[[], Any]:
+        from client.llm_client import LLMClient
+
+        async def create(**kwargs):
+            return _FakeStream(chunks)
+
+        fake = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        llm = LLMClient()
+
+        async def consume():
+            async for _ in llm._stream_response(fake, {}):
+                pass
+
+        return lambda: _loop.run_until_complete(consume())
+
+    return [
+        Case(f"stream_response[text,{STREAM_CHUNKS}chunks]", lambda: setup(_text_chunks(STREAM_CHUNKS))),
+        Case(f"stream_response[tool_args,{STREAM_CHUNKS}chunks]", lambda: setup(_tool_call_chunks(STREAM_CHUNKS))),
+    ]
+
+
+def get_messages_cases() -> list[Case]:
+    def setup(turns : int) -> Callable[[], Any]:
+        from context.manager import ContextManager
+
+        workspace = _tmp / "workspace"
+        workspace.mkdir(exist_ok=True)
+        manager = ContextManager(workspace)
+        body = sample_text(2000)
+        for i in range(turns):
+            manager.add_user_message(f"question {i}\n{body}")
+            manager.add_assistant_message(
+                f"answer {i}",
+                [{"id" : f"call_{i}", "type" : "function", "function" : {"name" : "read_file", "arguments" : "{}"}}],
+            )
+            manager.add_tool_result(f"call_{i}", body)
+        return manager.get_messages
+
+    return [
+        Case(f"get_messages[{turns}turns]", lambda turns=turns: setup(turns))
+        for turns in HISTORY_SIZES
+    ]
+
+
+def tui_cases() -> list[Case]:
+    def setup(name : str, output : str, metadata : dict[str, Any], cold : bool = False) -> Callable[[], Any]:
+        from rich.console import Console
+        from ui.highlight import highlight_cache
+        from ui.tui import AGENT_THEME,TUI
+
+        sink = io.StringIO()
+        console = Console(file=sink, theme=AGENT_THEME, width=120, force_terminal=True, color_system="truecolor")
+        tui = TUI(console)
+
+        def render():
+            if cold:
+                highlight_cache.clear()
+            tui.tool_call_start("call_0", name, "read", {"path" : metadata.get("path", "x")})
+            tui.tool_call_complete("call_0", name, "read", True, output, None, metadata, False)
+            sink.seek(0)
+            sink.truncate()
+
+        return render
+
+    def read_file_output(lines : int) -> tuple[str, dict[str, Any]]:
+        from tools.builtin.read_file import format_lines
+
+        text = format_lines([f"value_{i} = compute(value_{i - 1})" for i in range(lines)], 1)
+        path = str(_tmp / "module.py")
+        return text, {"path" : path, "shown_start" : 1, "shown_end" : lines, "total_lines" : lines}
+
+    cases = []
+    for lines in (50, 2000):
+        output, metadata = read_file_output(lines)
+        cases.append(Case(
+            f"tui.tool_call_complete[read_file,{lines}lines]",
+            lambda output=output, metadata=metadata: setup("read_file", output, metadata),
+        ))
+    # the same read rendered again is a cache hit; cold measures the highlighting
+    output, metadata = read_file_output(2000)
+    cases.append(Case(
+        "tui.tool_call_complete[read_file,2000lines,cold]",
+        lambda: setup("read_file", output, metadata, cold=True),
+    ))
+    shell_output = sample_text(64 * 1024)
+    cases.append(Case(
+        "tui.tool_call_complete[shell,64KB]",
+        lambda: setup("shell", shell_output, {}),
+    ))
+    return cases
+
+
+def all_cases() -> list[Case]:
+    return [
+        *count_token_cases(),
+        *truncate_text_cases(),
+        *read_file_cases(),
+        *stream_response_cases(),
+        *get_messages_cases(),
+        *tui_cases(),
+    ]
+
+
+def _print_result(name : str, result : dict[str, Any]) -> None:
+    if "skipped" in result:
+        print(f"{name:<48}skipped: {result['skipped']}")
+    else:
+        print(
+            f"{name:<48}{format_time(result['median_s']):>12}{format_time(result['min_s']):>12}"
+            f"{result['loops']:>10}"
+        )
+
+
+def cmd_run(args : argparse.Namespace) -> int:
+    cases = [
+        case for case in all_cases()
+        if not args.filter or any(f in case.name for f in args.filter)
+    ]
+    print(f"{'case':<48}{'median':>12}{'min':>12}{'loops':>10}")
+    try:
+        results = run_cases(cases, args.repeat, args.min_time, on_result=_print_result)
+    finally:
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+    skipped = sorted(name for name, result in results.items() if "skipped" in result)
+    if args.save and skipped and not args.allow_skipped:
+        print(f"not saving {args.save}: {len(skipped)} cases skipped ({', '.join(skipped)}); pass --allow-skipped to save anyway")
+        args.save = None
+
+    if args.save:
+        path = resolve_result_path(args.save)
+        save_results(path, results)
+        print(f"saved {path}")
+
+    if args.compare:
+        base = load_results(resolve_result_path(args.compare))
+        lines, regressions = compare(base, {"meta" : machine_info(), "results" : results}, args.threshold)
+        print()
+        print("\n".join(lines))
+        return 1 if regressions else 0
+    return 0
+
+
+def cmd_compare(args : argparse.Namespace) -> int:
+    base = load_results(resolve_result_path(args.base))
+    new = load_results(resolve_result_path(args.new))
+    lines, regressions = compare(base, new, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def cmd_list(args : argparse.Namespace) -> int:
+    for case in all_cases():
+        print(case.name)
+    shutil.rmtree(_tmp, ignore_errors=True)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Time the cases")
+    run.add_argument("-k", "--filter", action="append", help="Only cases whose name contains this (repeatable)")
+    run.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run.add_argument("--min-time", type=float, default=MIN_TIME, help="Seconds per repetition")
+    run.add_argument("--save", metavar="NAME|PATH", help="Write results as a baseline")
+    run.add_argument("--allow-skipped", action="store_true", help="Save a baseline even when cases were skipped")
+    run.add_argument("--compare", metavar="NAME|PATH", help="Diff the results against a baseline")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    run.set_defaults(func=cmd_run)
+
+    diff = commands.add_parser("compare", help="Diff two result files")
+    diff.add_argument("base", help="Baseline name or path")
+    diff.add_argument("new", help="Result name or path")
+    diff.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown, e.g. 0.1 for 10%%")
+    diff.set_defaults(func=cmd_compare)
+
+    listing = commands.add_parser("list", help="Print the case names")
+    listing.set_defaults(func=cmd_list)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""Local stand-in for an OpenAI-compatible chat-completions endpoint.
+
+    python benchmarks/mock_llm.py --port 8089 --ttft-ms 300 --tokens-per-sec 80
+    LLM_BASE_URL=http://127.0.0.1:8089/v1 python main.py "hello"
+
+Streams ``chat.completion.chunk`` events over SSE (or returns a whole
+completion when ``stream`` is false) after a configurable time to first
+token, at a configurable token rate. A script can make the model call tools:
+a JSON list of steps, where the step used for a request is the number of
+assistant messages already in its history:
+
+    [{"tool_calls": [{"name": "list_dir", "arguments": {"path": "."}}]},
+     {"text": "The directory holds three files."}]
+
+Steps past the end of the script produce plain text. --error-rate and
+--rate-limit-rate make that fraction of requests fail with a 500 or a 429
+(with Retry-After). GET /stats reports request counts. Only the standard
+library is used, so the server adds no dependencies.
+"""
+from __future__ import annotations
+from dataclasses import dataclass,field
+from pathlib import Path
+from typing import Any,Optional
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+
+DEFAULT_TEXT_TOKENS = 64
+
+
+@dataclass
+class MockConfig:
+    ttft : float = 0.2
+    tokens_per_sec : float = 100.0
+    response_tokens : int = DEFAULT_TEXT_TOKENS
+    script : list[dict[str, Any]] = field(default_factory=list)
+    error_rate : float = 0.0
+    rate_limit_rate : float = 0.0
+    retry_after : float = 1.0
+    seed : Optional[int] = None
+
+
+@dataclass
+class MockStats:
+    requests : int = 0
+    completed : int = 0
+    errors : int = 0
+    rate_limited : int = 0
+    tokens : int = 0
+    open_streams : int = 0
+    max_open_streams : int = 0
+
+
+class MockLLMServer:
+    def __init__(self, config : MockConfig, host : str = "127.0.0.1", port : int = 0) -> None:
+        self.config = config
+        self.host = host
+        self.port = port
+        self.stats = MockStats()
+        self._random = random.Random(config.seed)
+        self._server : Optional[asyncio.base_events.Server] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter) -> None:
+        # HTTP/1.1 keep-alive: serve requests until the client hangs up
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                if method == "GET" and path.rstrip("/").endswith("/stats"):
+                    await self._send_json(writer, 200, self.stats.__dict__)
+                elif method == "POST" and path.rstrip("/").endswith("/chat/completions"):
+                    await self._completion(writer, json.loads(body or b"{}"))
+                else:
+                    await self._send_json(writer, 404, {"error" : {"message" : f"No route for {method} {path}"}})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _completion(self, writer : asyncio.StreamWriter, request : dict[str, Any]) -> None:
+        self.stats.requests += 1
+        roll = self._random.random()
+        if roll < self.config.rate_limit_rate:
+            self.stats.rate_limited += 1
+            await self._send_json(
+                writer, 429,
+                {"error" : {"message" : "Rate limit exceeded (mock)", "type" : "rate_limit_error"}},
+                {"Retry-After" : f"{self.config.retry_after:g}"},
+            )
+            return
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.stats.errors += 1
+            await self._send_json(writer, 500, {"error" : {"message" : "Injected failure (mock)", "type" : "server_error"}})
+            return
+
+        step = self._step(request.get("messages") or [])
+        prompt_chars = len(json.dumps(request.get("messages") or [])) + len(json.dumps(request.get("tools") or []))
+        usage = {
+            "prompt_tokens" : prompt_chars // 4,
+            "completion_tokens" : 0,
+            "total_tokens" : 0,
+        }
+
+        await asyncio.sleep(self.config.ttft)
+        if request.get("stream"):
+            await self._stream(writer, request, step, usage)
+        else:
+            await self._whole(writer, request, step, usage)
+        self.stats.completed += 1
+
+    def _step(self, messages : list[dict[str, Any]]) -> dict[str, Any]:
+        index = sum(1 for message in messages if message.get("role") == "assistant")
+        if index < len(self.config.script):
+            return self.config.script[index]
+        return {"text" : None}
+
+    def _text_tokens(self, step : dict[str, Any]) -> list[str]:
+        if step.get("text"):
+            words = step["text"].split(" ")
+            return [word + " " for word in words[:-1]] + [words[-1]]
+        return [f"word{i} " for i in range(self.config.response_tokens)]
+
+    async def _paced(self, count : int):
+        """Yield ``count`` times at tokens_per_sec, catching up after slow sleeps."""
+        start = time.monotonic()
+        interval = 1 / self.config.tokens_per_sec if self.config.tokens_per_sec > 0 else 0
+        for i in range(count):
+            delay = start + i * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield i
+
+    async def _stream(
+        self,
+        writer : asyncio.StreamWriter,
+        request : dict[str, Any],
+        step : dict[str, Any],
+        usage : dict[str, int],
+    ) -> None:
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = request.get("model") or "mock"
+
+        def chunk(delta : dict[str, Any], finish_reason : Optional[str] = None) -> dict[str, Any]:
+            return {
+                "id" : completion_id,
+                "object" : "chat.completion.chunk",
+                "created" : int(time.time()),
+                "model" : model,
+                "choices" : [{"index" : 0, "delta" : delta, "finish_reason" : finish_reason}],
+            }
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        self.stats.open_streams += 1
+        self.stats.max_open_streams = max(self.stats.max_open_streams, self.stats.open_streams)
+        try:
+            await self._event(writer, chunk({"role" : "assistant", "content" : ""}))
+
+            tokens = 0
+            tool_calls = step.get("tool_calls") or []
+            if tool_calls:
+                for index, call in enumerate(tool_calls):
+                    arguments = json.dumps(call.get("arguments") or {})
+                    pieces = [arguments[i : i + 8] for i in range(0, len(arguments), 8)] or [""]
+                    await self._event(writer, chunk({"tool_calls" : [{
+                        "index" : index,
+                        "id" : f"call_{uuid.uuid4().hex[:8]}",
+                        "type" : "function",
+                        "function" : {"name" : call["name"], "arguments" : ""},
+                    }]}))
+                    async for i in self._paced(len(pieces)):
+                        await self._event(writer, chunk({"tool_calls" : [{
+                            "index" : index,
+                            "function" : {"arguments" : pieces[i]},
+                        }]}))
+                    tokens += len(pieces)
+                finish_reason = "tool_calls"
+            else:
+                words = self._text_tokens(step)
+                async for i in self._paced(len(words)):
+                    await self._event(writer, chunk({"content" : words[i]}))
+                tokens = len(words)
+                finish_reason = "stop"
+
+            await self._event(writer, chunk({}, finish_reason))
+            self._count(usage, tokens)
+            if (request.get("stream_options") or {}).get("include_usage"):
+                final = chunk({})
+                final["choices"] = []
+                final["usage"] = usage
+                await self._event(writer, final)
+            await self._write_chunk(writer, b"data: [DONE]\n\n")
+            await self._write_chunk(writer, b"")
+        finally:
+            self.stats.open_streams -= 1
+
+    async def _whole(
+        self,
+        writer : asyncio.StreamWriter,
+        request : dict[str, Any],
+        step : dict[str, Any],
+        usage : dict[str, int],
+    ) -> None:
+        message : dict[str, Any] = {"role" : "assistant", "content" : None}
+        if step.get("tool_calls"):
+            message["tool_calls"] = [
+                {
+                    "id" : f"call_{uuid.uuid4().hex[:8]}",
+                    "type" : "function",
+                    "function" : {"name" : call["name"], "arguments" : json.dumps(call.get("arguments") or {})},
+                }
+                for call in step["tool_calls"]
+            ]
+            tokens = sum(len(call["function"]["arguments"]) // 8 + 1 for call in message["tool_calls"])
+            finish_reason = "tool_calls"
+        else:
+            words = self._text_tokens(step)
+            async for _ in self._paced(len(words)):
+                pass
+            message["content"] = "".join(words)
+            tokens = len(words)
+            finish_reason = "stop"
+
+        self._count(usage, tokens)
+        await self._send_json(writer, 200, {
+            "id" : f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object" : "chat.completion",
+            "created" : int(time.time()),
+            "model" : request.get("model") or "mock",
+            "choices" : [{"index" : 0, "message" : message, "finish_reason" : finish_reason}],
+            "usage" : usage,
+        })
+
+    def _count(self, usage : dict[str, int], tokens : int) -> None:
+        usage["completion_tokens"] = tokens
+        usage["total_tokens"] = usage["prompt_tokens"] + tokens
+        self.stats.tokens += tokens
+
+    async def _event(self, writer : asyncio.StreamWriter, payload : dict[str, Any]) -> None:
+        await self._write_chunk(writer, b"data: " + json.dumps(payload).encode() + b"\n\n")
+
+    async def _write_chunk(self, writer : asyncio.StreamWriter, data : bytes) -> None:
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    async def _send_json(
+        self,
+        writer : asyncio.StreamWriter,
+        status : int,
+        payload : dict[str, Any],
+        headers : Optional[dict[str, str]] = None,
+    ) -> None:
+        reason = {200 : "OK", 404 : "Not Found", 429 : "Too Many Requests", 500 : "Internal Server Error"}[status]
+        body = json.dumps(payload).encode()
+        head = [
+            f"HTTP/1.1 {status} {reason}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            *(f"{name}: {value}" for name, value in (headers or {}).items()),
+        ]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+
+
+def add_mock_arguments(parser : argparse.ArgumentParser) -> None:
+    parser.add_argument("--ttft-ms", type=float, default=200, help="Delay before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=100, help="0 streams as fast as possible")
+    parser.add_argument("--response-tokens", type=int, default=DEFAULT_TEXT_TOKENS, help="Length of generated text replies")
+    parser.add_argument("--script", type=Path, help="JSON list of steps (tool calls or text)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, help="Seed for error injection")
+
+
+def mock_config(args : argparse.Namespace) -> MockConfig:
+    return MockConfig(
+        ttft = args.ttft_ms / 1000,
+        tokens_per_sec = args.tokens_per_sec,
+        response_tokens = args.response_tokens,
+        script = json.loads(args.script.read_text()) if args.script else [],
+        error_rate = args.error_rate,
+        rate_limit_rate = args.rate_limit_rate,
+        retry_after = args.retry_after,
+        seed = args.seed,
+    )
+
+
+async def _serve(server : MockLLMServer) -> None:
+    await server.start()
+    # the load generator reads this line to find the port
+    print(f"listening {server.base_url}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_serve(MockLLMServer(mock_config(args), args.host, args.port)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,44 @@
-from typing import Any,AsyncGenerator,Optional
-from openai import AsyncOpenAI,RateLimitError,APIConnectionError,APIError
-from dotenv import load_dotenv
+from __future__ import annotations
+from typing import Any,AsyncGenerator,Optional,TYPE_CHECKING
+from utils.config import get_config
 import asyncio
-import os
+import contextlib
 
+from client.rate_limit import RateLimiter,retry_after
 from client.response import TextDelta,TokenUsage,StreamEvent,StreamEventType,ToolCallDelta,ToolCall,parse_tool_call_arguments
 
-load_dotenv()
-api_key = os.getenv('OPENROUTER_API_KEY')
-model = os.getenv('MODEL')
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+config = get_config()
+api_key = config.api_key
+base_url = config.base_url
+model = config.model
+
+def _token_usage(usage : Any) -> TokenUsage:
+    # providers behind OpenRouter often omit prompt_tokens_details
+    details = getattr(usage, "prompt_tokens_details", None)
+    return TokenUsage(
+        prompt_tokens = usage.prompt_tokens or 0,
+        completion_tokens = usage.completion_tokens or 0,
+        total_tokens = usage.total_tokens or 0,
+        cached_tokens = getattr(details, "cached_tokens", None) or 0,
+    )
 
 class LLMClient:
-    def __init__(self):
+    def __init__(self, rate_limiter : Optional[RateLimiter] = None):
         self._client: AsyncOpenAI | None = None
         self.max_retries : int = 3
+        self.rate_limiter = rate_limiter
     
     def get_client(self) -> AsyncOpenAI:
         if self._client is None:
+            # openai's import costs more than the rest of startup combined
+            from openai import AsyncOpenAI
+
             self._client = AsyncOpenAI(
                 api_key = api_key,
-                base_url = "https://openrouter.ai/api/v1"
+                base_url = base_url
             )
         return self._client
     
@@ -53,28 +72,35 @@ class LLMClient:
             tools : Optional[dict[dict[str, Any]]] = None,
             stream : bool = True,
     ) -> AsyncGenerator[StreamEvent, None]:
+        from openai import RateLimitError,APIConnectionError,APIError
+
         client = self.get_client()
         kwargs = {
                 "model" : model,
                 "messages" : messages,
                 "stream" : stream
         }
+        if stream:
+            kwargs["stream_options"] = {"include_usage" : True}
         if tools:
             kwargs["tools"] = self._build_tools(tools)
             kwargs["tool_choice"] = "auto"
 
         for attempt in range(self.max_retries + 1):
             try:
-                if stream:
-                    async for event in self._stream_response(client, kwargs):
+                async with self.rate_limiter or contextlib.nullcontext():
+                    if stream:
+                        async for event in self._stream_response(client, kwargs):
+                            yield event
+                    else:
+                        event = await self._non_stream_response(client, kwargs)
                         yield event
-                else:
-                    event = await self._non_stream_response(client, kwargs)
-                    yield event
                 return
             except RateLimitError as e:
                 if attempt < self.max_retries:
-                    wait_time = 2**attempt
+                    wait_time = retry_after(e) or 2**attempt
+                    if self.rate_limiter:
+                        self.rate_limiter.backoff(wait_time)
                     await asyncio.sleep(wait_time)
                 else:
                     yield StreamEvent(
@@ -116,13 +142,8 @@ class LLMClient:
         tool_calls : dict[int,dict[str, Any]] = {}
 
         async for chunk in response:
-            if hasattr(chunk, "usage") and chunk.usage:
-                usage = TokenUsage(
-                    prompt_tokens = chunk.usage.prompt_tokens,
-                    completion_tokens = chunk.usage.completion_tokens,
-                    total_tokens = chunk.usage.total_tokens,
-                    cached_tokens = chunk.usage.prompt_tokens_details.cached_tokens,
-                )
+            if getattr(chunk, "usage", None):
+                usage = _token_usage(chunk.usage)
 
             if not chunk.choices:
                 continue
@@ -162,16 +183,17 @@ class LLMClient:
                                     )
                                 )
 
-                        if tool_call_delta.function.arguments:
-                            tool_calls[idx]["arguments"] += tool_call_delta.function.arguments
-                            yield StreamEvent(
-                                type = StreamEventType.TOOL_CALL_DELTA,
-                                tool_call_detla = ToolCallDelta(
-                                    call_id = tool_calls[idx]['id'],
-                                    name = tool_calls[idx]['name'],
-                                    arguments_delta = tool_call_delta.function.arguments
-                                )
+                    # later chunks for the same index carry the rest of the arguments
+                    if tool_call_delta.function and tool_call_delta.function.arguments:
+                        tool_calls[idx]["arguments"] += tool_call_delta.function.arguments
+                        yield StreamEvent(
+                            type = StreamEventType.TOOL_CALL_DELTA,
+                            tool_call_detla = ToolCallDelta(
+                                call_id = tool_calls[idx]['id'],
+                                name = tool_calls[idx]['name'],
+                                arguments_delta = tool_call_delta.function.arguments
                             )
+                        )
             
         for idx,tc in tool_calls.items():
             yield StreamEvent(
@@ -219,12 +241,7 @@ class LLMClient:
                 )
 
         if response.usage:
-            usage = TokenUsage(
-                prompt_tokens = response.usage.prompt_tokens,
-                completion_tokens = response.usage.completion_tokens,
-                total_tokens = response.usage.total_tokens,
-                cached_tokens = response.usage.prompt_tokens_details.cached_tokens,
-            )
+            usage = _token_usage(response.usage)
         
         return StreamEvent(
             type = StreamEventType.MESSAGE_COMPLETE,
@@ -0,0 +1,58 @@
+from __future__ import annotations
+from typing import Optional
+import asyncio
+import time
+
+
+class RateLimiter:
+    """Request pacing shared by every LLMClient that holds it.
+
+    ``requests_per_minute`` spaces request starts evenly (0 disables it) and
+    ``max_in_flight`` caps concurrently open requests, streams included
+    (0 disables it). A 429 from the provider pushes the next slot back for
+    every holder, so concurrent agents back off together instead of each
+    retrying into the same limit.
+    """
+
+    def __init__(self, requests_per_minute : float = 0, max_in_flight : int = 0) -> None:
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        self._next_slot = 0.0
+
+    async def acquire(self) -> None:
+        if self._semaphore:
+            await self._semaphore.acquire()
+
+        now = time.monotonic()
+        start = max(now, self._next_slot)
+        self._next_slot = start + self.interval
+        if start > now:
+            try:
+                await asyncio.sleep(start - now)
+            except BaseException:
+                self.release()
+                raise
+
+    def release(self) -> None:
+        if self._semaphore:
+            self._semaphore.release()
+
+    def backoff(self, seconds : float) -> None:
+        self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+    async def __aenter__(self) -> RateLimiter:
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.release()
+
+
+def retry_after(error : Exception) -> Optional[float]:
+    """Seconds from a Retry-After header on an openai APIStatusError, if any."""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
@@ -1,13 +1,32 @@
+from __future__ import annotations
+from prompts.environment import get_environment_section
 from prompts.system import get_system_prompt
+from utils.tokens import get_token_counter
+from concurrent.futures import Future
 from dataclasses import dataclass,field
-from typing import Optional,Any
-from dotenv import load_dotenv
-import os
+from typing import Optional,Any,TYPE_CHECKING
+from pathlib import Path
+from utils.config import get_config
+import json
+import logging
+import sys
+import threading
 
-load_dotenv()
-model = os.getenv('MODEL')
+if TYPE_CHECKING:
+    from client.response import TokenUsage
 
-from utils.text import count_token
+config = get_config()
+model = config.model
+repo_map_tokens = config.repo_map_tokens
+context_window = config.context_window
+response_reserve_tokens = config.response_reserve_tokens
+# remaining_tokens only changes a decision (a tool's output budget) once it
+# falls below a couple of full-size tool results; until then estimates do
+exact_count_headroom = 2 * config.tool_output_tokens
+
+logger = logging.getLogger(__name__)
+
+COMPACTED_NOTE = "[tool output removed to save memory ({chars} chars); call the tool again if it is still needed]"
 
 @dataclass
 class messageItem:
@@ -16,6 +35,9 @@ class messageItem:
     tool_call_id : Optional[str] = None
     tool_calls : list[dict[str, Any]] = field(default_factory=list)
     token_count : Optional[int] = None
+    char_count : int = 0
+    exact_count : Optional[Future[int]] = field(default=None, repr=False)
+    compacted : bool = False
 
     def to_dict(self) -> dict[str, Any]:
         result : dict[str, Any] = {
@@ -33,32 +55,182 @@ class messageItem:
         
         return result
 
+def _build_environment(cwd : Path) -> Optional[str]:
+    try:
+        return get_environment_section(cwd)
+    except Exception:
+        logger.exception("Failed to build environment section")
+        return None
+
+def _build_repo_map(cwd : Path) -> Optional[str]:
+    if repo_map_tokens <= 0:
+        return None
+
+    from workspace.repo_map import get_repo_map
+
+    try:
+        return get_repo_map(cwd, model).render(repo_map_tokens) or None
+    except Exception:
+        logger.exception("Failed to build repository map")
+        return None
+
+def _item_text(item : messageItem) -> str:
+    text = item.content or ""
+    if item.tool_calls:
+        text += json.dumps(item.tool_calls)
+    return text
+
 class ContextManager:
-    def __init__(self) -> None:
-        self._system_prompt = get_system_prompt()
+    def __init__(self, cwd : Optional[Path] = None) -> None:
+        self.cwd = cwd or Path.cwd()
+        self._system_prompt : Optional[str] = None
+        self._prepared = False
+        self._prepare_lock = threading.Lock()
         self._messages : list[messageItem] = []     
         self._model = model 
+        self._counter = get_token_counter(model)
+        self._tool_chars = 0
 
-    def add_user_message(self, content : str) -> None:
-        item = messageItem(
-            role = 'user',
-            content = content,
-            token_count = count_token(content , self._model),
-        )
+        # prompt_tokens reported for the last request and how many messages it covered
+        self._reported_tokens : Optional[int] = None
+        self._reported_index = 0
+        self._requested_index = 0
+        self._requested_chars = 0
+
+    def prepare(self) -> None:
+        """Build the system prompt: environment section and repository map.
+
+        Both read the workspace, so this blocks; ``Agent`` starts it in a
+        worker thread on entry and waits for it before the first request.
+        Later calls return at once.
+        """
+        with self._prepare_lock:
+            if self._prepared:
+                return
+            self._system_prompt = get_system_prompt(
+                environment = _build_environment(self.cwd),
+                repo_map = _build_repo_map(self.cwd),
+            )
+            self._prepared = True
+
+    def set_tools(self, schemas : Optional[list[dict[str, Any]]]) -> None:
+        """Account for the tool schemas sent along with every request."""
+        self._tool_chars = len(json.dumps(schemas)) if schemas else 0
+
+    def _item_tokens(self, item : messageItem) -> int:
+        if item.exact_count is not None:
+            if not item.exact_count.done():
+                return self._counter.estimate_chars(item.char_count)
+            if item.exact_count.exception() is None:
+                item.token_count = item.exact_count.result()
+            item.exact_count = None
+
+        if self._counter.has_exact and item.token_count is not None:
+            return item.token_count
+        return self._counter.estimate_chars(item.char_count)
+
+    @property
+    def used_tokens(self) -> int:
+        """Provider-reported prompt size plus estimates for messages added since.
+
+        Estimates use the chars-per-token ratio calibrated from those reports.
+        Only once the window is nearly full are the unreported messages
+        counted exactly, in the background; the exact counts replace the
+        estimates when they finish.
+        """
+        if self._reported_tokens is not None:
+            start, used = self._reported_index, self._reported_tokens
+        else:
+            start = 0
+            used = self._counter.estimate_chars(len(self._system_prompt or "") + self._tool_chars)
+
+        unreported = self._messages[start:]
+        used += sum(self._item_tokens(item) for item in unreported)
+
+        if self._counter.has_exact and context_window - response_reserve_tokens - used < exact_count_headroom:
+            for item in unreported:
+                if item.token_count is None and item.exact_count is None:
+                    item.exact_count = self._counter.count_later(_item_text(item))
+        return used
+
+    @property
+    def remaining_tokens(self) -> int:
+        """Tokens left in the context window after keeping room for the reply."""
+        return max(0, context_window - response_reserve_tokens - self.used_tokens)
+
+    def record_usage(self, usage : Optional[TokenUsage]) -> None:
+        """Calibrate the estimator against the prompt_tokens of the last request."""
+        if usage is None or not usage.prompt_tokens:
+            return
 
+        self._counter.observe(self._requested_chars, usage.prompt_tokens)
+        self._reported_tokens = usage.prompt_tokens
+        self._reported_index = self._requested_index
+
+    def _append(self, item : messageItem) -> None:
+        item.char_count = len(_item_text(item))
         self._messages.append(item)
+
+    def add_user_message(self, content : str) -> None:
+        self._append(
+            messageItem(
+                role = 'user',
+                content = content,
+            )
+        )
     
     def add_assistant_message(self, content : str, tool_calls : Optional[list[dict[str, Any]]] = None) -> None:
-        item = messageItem(
-            role = 'assistant',
-            content = content or "",
-            token_count = count_token(content or "" , self._model),
-            tool_calls=tool_calls or []
+        self._append(
+            messageItem(
+                role = 'assistant',
+                content = content or "",
+                tool_calls=tool_calls or []
+            )
         )
-
-        self._messages.append(item)
     
+    def memory_usage(self) -> dict[str, int]:
+        """What the conversation holds on to, for /memory."""
+        tool_items = [item for item in self._messages if item.role == "tool"]
+        return {
+            "messages" : len(self._messages),
+            "tool_results" : len(tool_items),
+            "content_bytes" : sum(sys.getsizeof(item.content) for item in self._messages),
+            "tool_result_bytes" : sum(sys.getsizeof(item.content) for item in tool_items),
+            "system_prompt_bytes" : sys.getsizeof(self._system_prompt or ""),
+        }
+
+    def compact(self, keep_turns : int = 2) -> int:
+        """Replace tool results older than the last ``keep_turns`` user turns with a short note.
+
+        Returns the number of characters released. The conversation keeps its
+        shape (every tool call still has its result), so it stays valid to send.
+        """
+        user_indexes = [i for i, item in enumerate(self._messages) if item.role == "user"]
+        if len(user_indexes) <= keep_turns:
+            return 0
+
+        freed = 0
+        for item in self._messages[: user_indexes[-keep_turns]]:
+            if item.role != "tool" or item.compacted:
+                continue
+            note = COMPACTED_NOTE.format(chars=len(item.content))
+            if len(note) >= len(item.content):
+                continue
+
+            freed += len(item.content) - len(note)
+            item.content = note
+            item.compacted = True
+            item.exact_count = None
+            item.token_count = None
+            item.char_count = len(note)
+
+        if freed:
+            # the last reported prompt size covered the removed text
+            self._reported_tokens = None
+        return freed
+
     def get_messages(self) -> list[dict[str, Any]]:
+        self.prepare()
         messages = []
 
         if self._system_prompt:
@@ -71,15 +243,21 @@ class ContextManager:
         
         for item in self._messages:
             messages.append(item.to_dict())
+
+        self._requested_index = len(self._messages)
+        self._requested_chars = (
+            len(self._system_prompt or "")
+            + self._tool_chars
+            + sum(item.char_count for item in self._messages)
+        )
         
         return messages
     
     def add_tool_result(self, tool_call_id : str , content : str) -> None:
-        item = messageItem(
-            role="tool",
-            content=content,
-            tool_call_id=tool_call_id,
-            token_count=count_token(content, self._model),
+        self._append(
+            messageItem(
+                role="tool",
+                content=content,
+                tool_call_id=tool_call_id,
+            )
         )
-
-        self._messages.append(item)
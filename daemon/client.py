@@ -0,0 +1,114 @@
+"""Thin client for a running ``main.py --daemon``.
+
+    python daemon/client.py "explain utils/paths.py"
+    echo "continue" | python daemon/client.py --session review
+    python daemon/client.py --ping | --reset | --shutdown
+
+Assistant text streams to stdout and tool activity to stderr. Only the
+standard library is imported, so dispatch costs an interpreter start and a
+socket round trip.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Iterator, Optional
+import argparse
+import json
+import os
+import socket
+import sys
+
+if __package__ in (None, ""):
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from daemon.protocol import DEFAULT_SESSION, decode, encode, socket_path
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+def request(message : dict[str, Any], path : Optional[str] = None) -> Iterator[dict[str, Any]]:
+    """Send ``message`` and yield the daemon's replies until it hangs up."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(socket_path(path)))
+    except OSError as e:
+        sock.close()
+        raise DaemonUnavailable(f"No daemon at {socket_path(path)} ({e.strerror or e})") from None
+
+    with sock, sock.makefile("rb") as replies:
+        sock.sendall(encode(message))
+        for line in replies:
+            yield decode(line)
+
+
+def _render(event : dict[str, Any]) -> Optional[str]:
+    """Print one agent event; returns the final response on text_complete."""
+    kind, data = event.get("type"), event.get("data") or {}
+    if kind == "text_delta":
+        sys.stdout.write(data.get("content", ""))
+        sys.stdout.flush()
+    elif kind == "text_complete":
+        sys.stdout.write("\n")
+        return data.get("content")
+    elif kind == "tool_call_start":
+        arguments = json.dumps(data.get("arguments", {}), ensure_ascii=False)
+        print(f"> {data.get('name')} {arguments[:200]}", file=sys.stderr)
+    elif kind == "tool_call_complete":
+        status = "ok" if data.get("success") else f"failed: {data.get('error')}"
+        print(f"< {data.get('name')} {status}", file=sys.stderr)
+    elif kind == "agent_error":
+        print(f"Error: {data.get('error')}", file=sys.stderr)
+    return None
+
+
+def main(argv : Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Send a prompt to the ved-cli daemon")
+    parser.add_argument("prompt", nargs="?", help="Prompt text (default: read stdin)")
+    parser.add_argument("--session", default=DEFAULT_SESSION, help="Conversation to continue")
+    parser.add_argument("--socket", help="Daemon socket path")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--ping", action="store_true", help="Check that the daemon is up")
+    group.add_argument("--reset", action="store_true", help="Forget this directory's session")
+    group.add_argument("--shutdown", action="store_true", help="Stop the daemon")
+    args = parser.parse_args(argv)
+
+    cwd = os.getcwd()
+    if args.ping:
+        message = {"type" : "ping"}
+    elif args.reset:
+        message = {"type" : "reset", "cwd" : cwd, "session" : args.session}
+    elif args.shutdown:
+        message = {"type" : "shutdown"}
+    else:
+        prompt = args.prompt if args.prompt is not None else sys.stdin.read()
+        if not prompt.strip():
+            parser.error("empty prompt")
+        message = {"type" : "prompt", "cwd" : cwd, "prompt" : prompt, "session" : args.session}
+
+    final_response = None
+    try:
+        for reply in request(message, args.socket):
+            kind = reply.get("type")
+            if kind == "event":
+                final_response = _render(reply["event"]) or final_response
+            elif kind == "pong":
+                print(f"daemon pid {reply.get('pid')}, {reply.get('sessions')} sessions")
+            elif kind == "error":
+                print(f"Error: {reply.get('error')}", file=sys.stderr)
+                return 1
+            elif kind in ("ok", "done"):
+                break
+    except DaemonUnavailable as e:
+        print(f"{e}. Start one with: python main.py --daemon", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        return 130
+
+    if message["type"] == "prompt" and final_response is None:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Wire format shared by the daemon and its thin client.
+
+One JSON object per line over a Unix domain socket. The client sends a
+single request and reads replies until the server closes the connection:
+
+    {"type": "prompt", "cwd": "...", "prompt": "...", "session": "default"}
+      -> {"type": "event", "event": {"type": "text_delta", "data": {...}}} ...
+      -> {"type": "done"}
+    {"type": "ping"}      -> {"type": "pong", "pid": 123, "sessions": 2}
+    {"type": "reset", "cwd": "...", "session": "default"} -> {"type": "ok"}
+    {"type": "shutdown"}  -> {"type": "ok"}
+
+Errors are reported as {"type": "error", "error": "..."}. Only the standard
+library is imported here so the client starts fast.
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Optional
+import json
+import os
+import tempfile
+
+DEFAULT_SESSION = "default"
+MAX_LINE = 64 * 1024 * 1024
+
+
+def socket_path(path : Optional[str] = None) -> Path:
+    """$VED_DAEMON_SOCKET, else a per-user socket in the runtime or temp dir."""
+    path = path or os.getenv("VED_DAEMON_SOCKET")
+    if path:
+        return Path(path)
+
+    runtime = os.getenv("XDG_RUNTIME_DIR")
+    base = Path(runtime, "ved-cli") if runtime else Path(tempfile.gettempdir(), f"ved-cli-{os.getuid()}")
+    return base / "daemon.sock"
+
+
+def encode(message : dict[str, Any]) -> bytes:
+    # tool metadata may hold paths or other objects JSON has no type for
+    return json.dumps(message, default=str).encode() + b"\n"
+
+
+def decode(line : bytes) -> dict[str, Any]:
+    return json.loads(line)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+from dataclasses import dataclass,field
+from pathlib import Path
+from typing import Any,Optional
+from agent.agent import Agent
+from daemon.protocol import DEFAULT_SESSION,MAX_LINE,decode,encode,socket_path
+from utils.config import get_config
+from utils.tokens import warm_up_tokenizer
+import asyncio
+import logging
+import os
+import socket
+import stat
+import time
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = get_config().daemon_session_ttl
+REAP_INTERVAL = 60
+
+
+@dataclass
+class _Session:
+    agent : Agent
+    lock : asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_used : float = field(default_factory=time.monotonic)
+
+
+class DaemonServer:
+    """Keeps agents warm between CLI invocations.
+
+    Each (cwd, session name) pair owns one entered ``Agent``, so the
+    conversation, tokenizer, HTTP pool, tool registry and workspace indexes
+    outlive the client that created them. Prompts to the same session run one
+    at a time; different sessions run concurrently. Sessions idle for longer
+    than DAEMON_SESSION_TTL seconds are closed.
+    """
+
+    def __init__(self, path : Optional[str] = None) -> None:
+        self.path = socket_path(path)
+        # the default location is a directory of our own; a chosen one may be shared
+        self._private_dir = not (path or os.getenv("VED_DAEMON_SOCKET"))
+        self._sessions : dict[tuple[str, str], _Session] = {}
+        self._sessions_lock = asyncio.Lock()
+        self._starting : dict[tuple[str, str], asyncio.Lock] = {}
+        self._stop = asyncio.Event()
+
+    async def serve(self) -> None:
+        self._prepare_socket()
+        warm_up_tokenizer()
+        # created owner-only, so there is no window before the chmod
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self._handle, path=str(self.path), limit=MAX_LINE)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, 0o600)
+        logger.info(f"Daemon listening on {self.path}")
+
+        reaper = asyncio.create_task(self._reap_idle())
+        try:
+            async with server:
+                await self._stop.wait()
+        finally:
+            reaper.cancel()
+            for session in list(self._sessions.values()):
+                await self._close(session)
+            self._sessions.clear()
+            self.path.unlink(missing_ok=True)
+
+    def _prepare_socket(self) -> None:
+        # whoever can reach the socket can run shell commands as this user, so
+        # never bind in a directory someone else created or can write to
+        directory = self.path.parent
+        directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+        st = os.lstat(directory)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+            raise RuntimeError(f"Refusing to listen in {directory}: it is not a directory owned by you")
+        if self._private_dir and st.st_mode & 0o077:
+            raise RuntimeError(
+                f"Refusing to listen in {directory}: other users can access it (mode {stat.S_IMODE(st.st_mode):o}, expected 700)"
+            )
+        if not self.path.exists():
+            return
+
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(str(self.path))
+        except OSError:
+            self.path.unlink()  # left behind by a daemon that died
+        else:
+            raise RuntimeError(f"A daemon is already listening on {self.path}")
+        finally:
+            probe.close()
+
+    async def _handle(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter) -> None:
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            request = decode(line)
+            kind = request.get("type")
+
+            if kind == "prompt":
+                await self._prompt(request, writer)
+            elif kind == "ping":
+                await self._send(writer, {"type" : "pong", "pid" : os.getpid(), "sessions" : len(self._sessions)})
+            elif kind == "reset":
+                await self._reset(request)
+                await self._send(writer, {"type" : "ok"})
+            elif kind == "shutdown":
+                await self._send(writer, {"type" : "ok"})
+                self._stop.set()
+            else:
+                await self._send(writer, {"type" : "error", "error" : f"Unknown request type: {kind}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            logger.debug("Client disconnected")
+        except Exception as e:
+            logger.exception("Daemon request failed")
+            try:
+                await self._send(writer, {"type" : "error", "error" : str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _prompt(self, request : dict[str, Any], writer : asyncio.StreamWriter) -> None:
+        prompt = request.get("prompt")
+        if not prompt:
+            await self._send(writer, {"type" : "error", "error" : "Empty prompt"})
+            return
+
+        session = await self._session(request)
+        async with session.lock:
+            events = session.agent.run(prompt)
+            try:
+                async for event in events:
+                    # a client that went away raises here and ends the run
+                    await self._send(writer, {"type" : "event", "event" : event.to_dict()})
+            finally:
+                await events.aclose()
+                session.last_used = time.monotonic()
+        await self._send(writer, {"type" : "done"})
+
+    async def _session(self, request : dict[str, Any]) -> _Session:
+        key = _session_key(request)
+        async with self._sessions_lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                return session
+            starting = self._starting.setdefault(key, asyncio.Lock())
+
+        # a cold start (environment, repo map, watcher) holds only this key's
+        # lock, so other sessions, resets and the reaper carry on meanwhile
+        async with starting:
+            async with self._sessions_lock:
+                session = self._sessions.get(key)
+            if session is not None:
+                return session
+
+            try:
+                agent = await asyncio.to_thread(Agent, Path(key[0]))
+            except BaseException:
+                await self._forget_start(key, starting)
+                raise
+            try:
+                await agent.__aenter__()
+            except BaseException:
+                await self._close(_Session(agent))
+                await self._forget_start(key, starting)
+                raise
+
+            async with self._sessions_lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = self._sessions[key] = _Session(agent)
+                    agent = None
+                if self._starting.get(key) is starting:
+                    del self._starting[key]
+            if agent is not None:
+                # a retry under a newer start lock won the race after a failure
+                await self._close(_Session(agent))
+            return session
+
+    async def _forget_start(self, key : tuple[str, str], starting : asyncio.Lock) -> None:
+        async with self._sessions_lock:
+            if self._starting.get(key) is starting:
+                del self._starting[key]
+
+    async def _reset(self, request : dict[str, Any]) -> None:
+        async with self._sessions_lock:
+            session = self._sessions.pop(_session_key(request), None)
+        if session:
+            async with session.lock:
+                await self._close(session)
+
+    async def _reap_idle(self) -> None:
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            cutoff = time.monotonic() - SESSION_TTL
+            async with self._sessions_lock:
+                idle = [
+                    key for key, session in self._sessions.items()
+                    if session.last_used < cutoff and not session.lock.locked()
+                ]
+                closing = [self._sessions.pop(key) for key in idle]
+            for session in closing:
+                await self._close(session)
+
+    async def _close(self, session : _Session) -> None:
+        try:
+            await session.agent.__aexit__(None, None, None)
+        except Exception:
+            logger.exception("Failed to close daemon session")
+
+    async def _send(self, writer : asyncio.StreamWriter, message : dict[str, Any]) -> None:
+        writer.write(encode(message))
+        await writer.drain()
+
+
+def _session_key(request : dict[str, Any]) -> tuple[str, str]:
+    cwd = str(Path(request.get("cwd") or os.getcwd()).resolve())
+    return cwd, request.get("session") or DEFAULT_SESSION
+
+
+async def serve(path : Optional[str] = None) -> None:
+    await DaemonServer(path).serve()
@@ -1,45 +1,118 @@
+from __future__ import annotations
 import sys
-from typing import Optional
+from typing import Optional,TYPE_CHECKING
 import asyncio
 import click
 from pathlib import Path
-from agent.agent import Agent,AgentEventType
-from ui.tui import TUI,get_console
 
-console = get_console()
+# the agent, rich and openai are imported where a mode first needs them,
+# so --help and --profile-startup stay cheap
+if TYPE_CHECKING:
+    from agent.agent import Agent
 
 class CLI:
-    def __init__(self):
+    def __init__(self, output : str = "rich", memprofile : bool = False):
         self.agent: Agent | None =  None
-        self.tui = TUI(console)
+        self.output = output
+        if output == "rich":
+            from ui.tui import TUI,get_console
+
+            self.console = get_console()
+            self.tui = TUI(self.console)
+
+        self.profiler = None
+        if memprofile:
+            from utils.memory import MemoryProfiler
+
+            self.profiler = MemoryProfiler()
 
     async def run_single(self, message : str) -> Optional[str]:
+        from agent.agent import Agent
+        from utils.tokens import warm_up_tokenizer
+
+        warm_up_tokenizer()
         async with Agent() as agent:
             self.agent = agent
-            return await self._process_message(message)
+            self._start_profiler()
+            result = await self._process_message(message)
+            self._record_turn()
+            if self.profiler:
+                self._print_memory_report()
+            return result
     
     async def run_interactive(self) -> Optional[str]:
+        from agent.agent import Agent
+        from utils.tokens import warm_up_tokenizer
+
+        warm_up_tokenizer()
         self.tui.print_welcome(
             'Intializing claude bot',
             lines=[
                 f"model: gemini-2.5-flash",
                 f"cwd: {Path.cwd()}",
-                f"commands: /help /config /approval /model /exit"
+                f"commands: /help /config /approval /model /memory /expand /exit"
             ]
         )
         async with Agent() as agent:
             self.agent = agent
+            self._start_profiler()
             
             while True:
                 try:
-                    user_input = console.input("\n[user]>[/user] ").strip()
+                    user_input = self.console.input("\n[user]>[/user] ").strip()
+                    if user_input == "/exit":
+                        break
+                    if user_input == "/memory":
+                        self._print_memory_report()
+                        continue
+                    if user_input.split(" ", 1)[0] == "/expand":
+                        await self._expand(user_input[len("/expand"):].strip() or None)
+                        continue
                     await self._process_message(user_input)
+                    self._record_turn()
                 except KeyboardInterrupt:
-                    console.print("\n[dim]Use /exit to quit[/dim]")
+                    self.console.print("\n[dim]Use /exit to quit[/dim]")
                 except EOFError:
                     break
             
-            console.print("\n[dim]Bye from claude[/dim]")
+            self.console.print("\n[dim]Bye from claude[/dim]")
+
+    def _notice(self, text : str) -> None:
+        if self.output == "rich":
+            self.console.print(text, style="dim", markup=False, highlight=False)
+        else:
+            print(text, file=sys.stderr)
+
+    def _start_profiler(self) -> None:
+        # after start-up: tracing openai's import alone takes minutes, and
+        # what grows over a session is allocated per turn
+        if self.profiler:
+            self.profiler.start()
+
+    def _record_turn(self) -> None:
+        if not self.profiler:
+            return
+        from utils.memory import turn_summary
+
+        previous = self.profiler.samples[-1] if self.profiler.samples else None
+        sample = self.profiler.record_turn()
+        if sample:
+            self._notice(turn_summary(sample, previous))
+
+    def _print_memory_report(self) -> None:
+        from utils.memory import memory_report
+
+        owners = {"context" : self.agent.contextManager.memory_usage()}
+        if self.output == "rich":
+            owners["tui"] = self.tui.memory_usage()
+        self._notice(memory_report(owners, self.profiler))
+
+    async def _expand(self, call_id : Optional[str]) -> None:
+        panel = await asyncio.to_thread(self.tui.build_expanded, call_id)
+        if panel is None:
+            self.console.print(f"\n[dim]Nothing to expand{f' for {call_id}' if call_id else ''}[/dim]")
+            return
+        self.tui.print_renderable(panel)
 
     def _get_tool_kind(self, tool_name : str) -> Optional[str]:
         tool_kind = None
@@ -50,59 +123,168 @@ class CLI:
         tool_kind = tool.kind.value
         return tool_kind
 
+    async def _render_plain(self, message : str) -> Optional[str]:
+        from agent.event import AgentEventType
+        from ui.stream import get_renderer
+
+        renderer = get_renderer(self.output)
+        final_response : Optional[str] = None
+        try:
+            async for event in self.agent.run(message):
+                renderer.render(event)
+                if event.type == AgentEventType.AGENT_END:
+                    final_response = event.data.get("response")
+        finally:
+            renderer.close()
+
+        return final_response
+
     async def _process_message(self,message : Optional[str]) -> Optional[str]:
+        from agent.event import AgentEventType
+
         if not self.agent:
             return None
+
+        if self.output != "rich":
+            return await self._render_plain(message)
         
         assistant_streaming = False
         final_response : Optional[str] = None
 
-        async for event in self.agent.run(message):
-            if event.type == AgentEventType.TEXT_DELTA:
-                content = event.data.get("content" , "")
-                if not assistant_streaming:
-                    self.tui.begin_assistant()
-                    assistant_streaming = True
-                self.tui.stream_assistant_delta(content)
-            elif event.type == AgentEventType.TEXT_COMPLETE:
-                final_response = event.data.get("content")
-                if assistant_streaming:
-                    self.tui.end_assistant()
-                    assistant_streaming = False
-            elif event.type == AgentEventType.AGENT_ERROR:
-                error = event.data.get("error", "Unkown error occured")
-                console.print(f"\n[error]Error: {error}[/error]")
-            elif event.type == AgentEventType.TOOL_CALL_START:
-                tool_name = event.data.get("name", "unknown") 
-                tool_kind = self._get_tool_kind(tool_name)
-                self.tui.tool_call_start(
-                    event.data.get("call_id" or ""),
-                    tool_name,
-                    tool_kind,
-                    event.data.get("arguments", {})
-                )
-            elif event.type == AgentEventType.TOOL_CALL_COMPLETE:
-                tool_name = event.data.get("name", "unknown")
-                tool_kind = self._get_tool_kind(tool_name)
-                self.tui.tool_call_complete(
-                    event.data.get("call_id" or ""),
-                    tool_name,
-                    tool_kind,
-                    event.data.get("success",False),
-                    event.data.get("output",""),
-                    event.data.get("error"),
-                    event.data.get("metadata"),
-                    event.data.get("truncated", False),
-                )
+        # the agent runs ahead in its own task while a large panel is
+        # highlighted in a worker thread, so display never holds up the next
+        # request
+        events : asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._pump_events(message, events))
+        try:
+            while (event := await events.get()) is not None:
+                if event.type == AgentEventType.TEXT_DELTA:
+                    content = event.data.get("content" , "")
+                    if not assistant_streaming:
+                        self.tui.begin_assistant()
+                        assistant_streaming = True
+                    self.tui.stream_assistant_delta(content)
+                elif event.type == AgentEventType.TEXT_COMPLETE:
+                    final_response = event.data.get("content")
+                    if assistant_streaming:
+                        self.tui.end_assistant()
+                        assistant_streaming = False
+                elif event.type == AgentEventType.AGENT_ERROR:
+                    if assistant_streaming:
+                        self.tui.end_assistant()
+                        assistant_streaming = False
+                    error = event.data.get("error", "Unkown error occured")
+                    self.console.print(f"\n[error]Error: {error}[/error]")
+                elif event.type == AgentEventType.TOOL_CALL_START:
+                    tool_name = event.data.get("name", "unknown") 
+                    tool_kind = self._get_tool_kind(tool_name)
+                    self.tui.tool_call_start(
+                        event.data.get("call_id" or ""),
+                        tool_name,
+                        tool_kind,
+                        event.data.get("arguments", {})
+                    )
+                elif event.type == AgentEventType.TOOL_CALL_OUTPUT_DELTA:
+                    self.tui.tool_call_output_delta(
+                        event.data.get("call_id", ""),
+                        event.data.get("stream", "stdout"),
+                        event.data.get("content", ""),
+                    )
+                elif event.type == AgentEventType.TOOL_CALL_COMPLETE:
+                    tool_name = event.data.get("name", "unknown")
+                    tool_kind = self._get_tool_kind(tool_name)
+                    panel = await asyncio.to_thread(
+                        self.tui.build_tool_call_complete,
+                        event.data.get("call_id" or ""),
+                        tool_name,
+                        tool_kind,
+                        event.data.get("success",False),
+                        event.data.get("output",""),
+                        event.data.get("error"),
+                        event.data.get("metadata"),
+                        event.data.get("truncated", False),
+                    )
+                    self.tui.print_renderable(panel)
+            await producer
+        finally:
+            producer.cancel()
+            # an error or Ctrl-C mid-answer would leave Live redrawing under the prompt
+            if assistant_streaming:
+                self.tui.end_assistant()
 
         return final_response
 
+    async def _pump_events(self, message : Optional[str], events : asyncio.Queue) -> None:
+        try:
+            async for event in self.agent.run(message):
+                events.put_nowait(event)
+        finally:
+            events.put_nowait(None)
+
 @click.command()
 @click.argument("prompt", required = False)
+@click.option(
+    "--output",
+    type = click.Choice(["rich", "jsonl", "text"]),
+    default = "rich",
+    help = "rich: interactive rendering; jsonl: one JSON line per agent event; text: final answer only.",
+)
+@click.option("--batch", "batch_path", type = click.Path(exists = True, dir_okay = False, path_type = Path), help = "Run every prompt in a JSONL file; see agent/batch.py.")
+@click.option("--batch-output", type = click.Path(dir_okay = False, path_type = Path), help = "Results file for --batch (default: <input>.results.jsonl).")
+@click.option("--concurrency", type = click.IntRange(min = 1), default = 4, help = "Prompts --batch runs at once.")
+@click.option("--memprofile", is_flag = True, help = "Trace allocations with tracemalloc and report memory after every turn (slow).")
+@click.option("--profile-startup", is_flag = True, help = "Print an import-time and startup breakdown, then exit.")
+@click.option("--daemon", is_flag = True, help = "Serve prompts from daemon/client.py over a Unix socket.")
+@click.option("--socket", "socket_path", default = None, help = "Daemon socket path (default: $VED_DAEMON_SOCKET or a per-user path).")
 def main(
     prompt : Optional[str],
+    output : str,
+    batch_path : Optional[Path],
+    batch_output : Optional[Path],
+    concurrency : int,
+    memprofile : bool,
+    profile_startup : bool,
+    daemon : bool,
+    socket_path : Optional[str],
 ):  
-    cli = CLI()
+    if profile_startup:
+        from utils.startup import profile_startup as run_profile
+
+        click.echo(run_profile())
+        return
+
+    if daemon:
+        from daemon.server import serve
+
+        try:
+            asyncio.run(serve(socket_path))
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if batch_path:
+        from agent.batch import run_batch
+        from utils.tokens import warm_up_tokenizer
+
+        warm_up_tokenizer()
+        try:
+            summary = asyncio.run(run_batch(batch_path, batch_output, concurrency))
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(
+            f"{summary.succeeded} succeeded, {summary.failed} failed, "
+            f"{summary.skipped} already done ({summary.total} total)",
+            err = True,
+        )
+        sys.exit(1 if summary.failed else 0)
+
+    if output != "rich" and not prompt:
+        # the plain formats are for pipelines, which pass the prompt on stdin
+        prompt = sys.stdin.read().strip()
+        if not prompt:
+            raise click.UsageError(f"--output {output} needs a prompt argument or one on stdin")
+
+    cli = CLI(output, memprofile)
     if prompt:
         result = asyncio.run(cli.run_single(prompt))
         if result is None:
@@ -110,4 +292,5 @@ def main(
     else:
         asyncio.run(cli.run_interactive())
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
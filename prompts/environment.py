@@ -0,0 +1,273 @@
+from __future__ import annotations
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from utils.paths import cache_dir,find_git_root,guess_language
+from workspace.snapshot import KIND_DIR,KIND_FILE,get_snapshot
+import hashlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2
+# filled in after the cache lookup; see get_environment_section
+GIT_SLOT = "\x00git\x00"
+AGENTS_FILE = "AGENTS.md"
+MAX_AGENTS_BYTES = 16 * 1024
+MAX_TOP_LEVEL = 60
+MAX_LANGUAGES = 6
+GIT_TIMEOUT = 3.0
+# sessions started within this long of each other share one git status
+GIT_STATUS_TTL = 60.0
+
+_git_status : dict[Path, tuple[tuple, float, Optional[int]]] = {}
+_git_status_locks : dict[Path, threading.Lock] = {}
+_git_status_lock = threading.Lock()
+
+
+def _git_dir(repo_root : Path) -> Path:
+    git = repo_root / ".git"
+    if git.is_file():
+        content = git.read_text(encoding="utf-8", errors="replace").strip()
+        if content.startswith("gitdir:"):
+            return (repo_root / content[len("gitdir:"):].strip()).resolve()
+    return git
+
+
+def _read_head(git_dir : Path) -> tuple[str, Optional[str]]:
+    """Return the raw HEAD line and the commit it resolves to, if readable."""
+    try:
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:
+        return "", None
+
+    if not head.startswith("ref:"):
+        return head, head
+
+    ref = head[len("ref:"):].strip()
+    try:
+        return head, (git_dir / ref).read_text(encoding="utf-8").strip()
+    except OSError:
+        pass
+
+    try:
+        with open(git_dir / "packed-refs", encoding="utf-8") as f:
+            for line in f:
+                sha, _, name = line.strip().partition(" ")
+                if name == ref:
+                    return head, sha
+    except OSError:
+        pass
+
+    return head, None
+
+
+def _mtime_ns(path : Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _agents_chain(cwd : Path, repo_root : Optional[Path]) -> list[Path]:
+    """AGENTS.md files from the repository root (or cwd) down to cwd."""
+    top = repo_root or cwd
+    directories = [cwd]
+    directories.extend(parent for parent in cwd.parents if parent == top or top in parent.parents)
+    return [
+        directory / AGENTS_FILE
+        for directory in reversed(directories)
+        if (directory / AGENTS_FILE).is_file()
+    ]
+
+
+def _cache_key(cwd : Path, repo_root : Optional[Path], agents : list[Path]) -> str:
+    parts : dict[str, object] = {
+        "version" : CACHE_VERSION,
+        "cwd" : str(cwd),
+        "platform" : platform.platform(),
+        "agents" : [(str(path), _mtime_ns(path)) for path in agents],
+    }
+
+    # .git's mtime moves with every index.lock that git status creates
+    try:
+        parts["top_level"] = sorted(
+            (entry.name, entry.stat(follow_symlinks=False).st_mtime_ns)
+            for entry in os.scandir(cwd)
+            if entry.name != ".git"
+        )
+    except OSError:
+        parts["top_level"] = []
+    parts["cwd_mtime"] = _mtime_ns(cwd)
+
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def _git_summary(repo_root : Optional[Path], cwd : Path) -> str:
+    if repo_root is None:
+        return "not a git repository"
+
+    head, commit = _read_head(_git_dir(repo_root))
+    if head.startswith("ref:"):
+        branch = f"branch `{head.rsplit('/', 1)[-1]}`"
+    else:
+        branch = f"detached HEAD at `{head[:12]}`"
+    if commit is None:
+        branch += " (no commits yet)"
+
+    changes = _count_changes(repo_root, cwd, (head, commit))
+    if changes is None:
+        return branch
+    if not changes:
+        return f"{branch}, clean working tree"
+    return f"{branch}, {changes} uncommitted change{'s' if changes != 1 else ''}"
+
+
+def _count_changes(repo_root : Path, cwd : Path, head : tuple[str, Optional[str]]) -> Optional[int]:
+    """Number of entries ``git status`` reports, None if it failed.
+
+    The result is shared by every session in the process (sub-agents,
+    batch items, daemon sessions) for ``GIT_STATUS_TTL`` seconds, unless
+    HEAD or the index changed in the meantime; concurrent callers wait for
+    one run instead of each starting git.
+    """
+    key = (*head, _mtime_ns(_git_dir(repo_root) / "index"))
+    with _git_status_lock:
+        lock = _git_status_locks.setdefault(cwd, threading.Lock())
+
+    with lock:
+        cached = _git_status.get(cwd)
+        if cached is not None and cached[0] == key and time.monotonic() - cached[1] < GIT_STATUS_TTL:
+            return cached[2]
+
+        changes = None
+        try:
+            status = subprocess.run(
+                ["git", "--no-optional-locks", "status", "--porcelain"],
+                cwd = cwd,
+                capture_output = True,
+                text = True,
+                timeout = GIT_TIMEOUT,
+            )
+            if status.returncode == 0:
+                changes = sum(1 for line in status.stdout.splitlines() if line.strip())
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+        _git_status[cwd] = (key, time.monotonic(), changes)
+        return changes
+
+
+def _workspace_summary(cwd : Path) -> tuple[list[str], list[str]]:
+    snapshot, rel = get_snapshot(cwd)
+    snapshot.refresh(rel)
+
+    top_level = []
+    for entry in snapshot.iter_entries(rel, max_depth=1):
+        name = entry.path.rsplit("/", 1)[-1]
+        top_level.append(f"{name}/" if entry.kind == KIND_DIR else name)
+
+    sizes : Counter = Counter()
+    for entry in snapshot.iter_entries(rel):
+        if entry.kind == KIND_FILE:
+            language = guess_language(entry.path)
+            if language != "text":
+                sizes[language] += entry.size
+
+    total = sum(sizes.values())
+    languages = [
+        f"{language} {size * 100 // total}%"
+        for language, size in sorted(sizes.items(), key=lambda item: (-item[1], item[0]))[:MAX_LANGUAGES]
+        if total and size * 100 // total > 0
+    ]
+
+    return top_level, languages
+
+
+def _read_agents(path : Path) -> str:
+    with open(path, "rb") as f:
+        data = f.read(MAX_AGENTS_BYTES + 1)
+
+    text = data[:MAX_AGENTS_BYTES].decode("utf-8", errors="replace").rstrip()
+    if len(data) > MAX_AGENTS_BYTES:
+        text += f"\n...[truncated, read {path} for the rest]"
+    return text
+
+
+def _render(cwd : Path, repo_root : Optional[Path], agents : list[Path]) -> str:
+    top_level, languages = _workspace_summary(cwd)
+
+    lines = [
+        "# Environment",
+        "",
+        f"- Working directory: {cwd}",
+        f"- OS: {platform.system()} {platform.release()} ({platform.machine()})",
+        f"- Git: {GIT_SLOT}",
+    ]
+    if repo_root and repo_root != cwd:
+        lines.append(f"- Repository root: {repo_root}")
+    if languages:
+        lines.append(f"- Languages: {', '.join(languages)}")
+
+    lines.extend(["", "## Workspace (top level)", "", "```"])
+    lines.extend(top_level[:MAX_TOP_LEVEL])
+    if len(top_level) > MAX_TOP_LEVEL:
+        lines.append(f"... {len(top_level) - MAX_TOP_LEVEL} more entries")
+    lines.append("```")
+
+    for path in agents:
+        lines.extend([
+            "",
+            f"## {os.path.relpath(path, repo_root or cwd)}",
+            "",
+            _read_agents(path),
+        ])
+
+    return "\n".join(lines)
+
+
+def get_environment_section(cwd : Optional[Path] = None) -> str:
+    """Build the environment section of the system prompt.
+
+    The section is built once per session and stored on disk under a key
+    made of the mtimes of the top-level entries and of every AGENTS.md in
+    the chain, so a warm start only pays for a handful of stat calls. The
+    git line is not stored on disk, since no cheap key tracks edits to
+    nested files; ``git status`` runs once per process and is shared by
+    later sessions (see ``_count_changes``). Callers build the section in a
+    worker thread (``ContextManager.prepare``). Content never changes within
+    a session, which keeps the system prompt byte-stable for prompt caching.
+    """
+    cwd = (cwd or Path.cwd()).resolve()
+    repo_root = find_git_root(cwd)
+    agents = _agents_chain(cwd, repo_root)
+    key = _cache_key(cwd, repo_root, agents)
+
+    cache_file = None
+    try:
+        name = hashlib.sha256(str(cwd).encode()).hexdigest()[:32]
+        cache_file = cache_dir("environment") / f"{name}.json"
+        with open(cache_file, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["section"].replace(GIT_SLOT, _git_summary(repo_root, cwd))
+    except (OSError, ValueError, KeyError):
+        pass
+
+    section = _render(cwd, repo_root, agents)
+
+    if cache_file is not None:
+        try:
+            tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"key" : key, "section" : section}), encoding="utf-8")
+            os.replace(tmp, cache_file)
+        except OSError:
+            logger.debug("Could not write environment cache", exc_info=True)
+
+    return section.replace(GIT_SLOT, _git_summary(repo_root, cwd))
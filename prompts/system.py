@@ -1,13 +1,22 @@
-from datetime import datetime
-import platform
+from typing import Optional
 
 
-def get_system_prompt() -> str:
+def get_system_prompt(
+    environment : Optional[str] = None,
+    repo_map : Optional[str] = None,
+) -> str:
     parts = []
 
     # Identity and role
     parts.append(_get_identity_section())
+
     # Environment
+    if environment:
+        parts.append(environment)
+
+    # Repository map
+    if repo_map:
+        parts.append(_get_repo_map_section(repo_map))
 
     # AGENTS.md spec
     parts.append(_get_agents_md_section())
@@ -36,6 +45,15 @@ Your capabilities:
 You are pair programming with the user to help them accomplish their goals. You should be proactive, thorough and focused on delivering high-quality results."""
 
 
+def _get_repo_map_section(repo_map : str) -> str:
+    """Generate the repository map section."""
+    return f"""# Repository Map
+
+The most referenced definitions in this workspace, ranked by how often other files use them. Each entry shows its [start-end] lines, which can be passed to `read_file` as offset and limit. Use `outline` for files not listed here.
+
+{repo_map}"""
+
+
 def _get_agents_md_section() -> str:
     """Generate AGENTS.md spec section."""
     return """# AGENTS.md Specification
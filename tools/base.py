@@ -1,11 +1,17 @@
 from __future__ import annotations
 import abc
+import asyncio
+import threading
 from enum import Enum
 from pydantic import BaseModel,ValidationError
-from typing import Any,Optional
+from typing import Any,Callable,Optional
 from dataclasses import dataclass,field
 from pathlib import Path
 from pydantic.json_schema import model_json_schema
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from workspace.watcher import WorkspaceChange
 
 class ToolKind(str, Enum):
     READ = "read"
@@ -14,11 +20,43 @@ class ToolKind(str, Enum):
     NETWORK = "network"
     MEMORY = "memory"
     MCP = "mcp"
+    AGENT = "agent"
+
+class ExecutionProfile(str, Enum):
+    """Where ``ToolRegistry.invoke`` runs a tool.
+
+    ASYNC tools run ``execute`` on the event loop and must not block it.
+    BLOCKING_IO tools implement ``execute_sync``, which runs in a bounded
+    thread pool. CPU_BOUND tools implement ``execute_sync`` as well but run in
+    a worker process, so the tool and its invocation params must pickle.
+    """
+    ASYNC = "async"
+    BLOCKING_IO = "blocking_io"
+    CPU_BOUND = "cpu_bound"
+
+class OutputStrategy(str, Enum):
+    """Which part of an oversized result the registry keeps."""
+    HEAD = "head"
+    TAIL = "tail"
+    MIDDLE = "middle"
+
+OutputCallback = Callable[[str, str], None]
 
 @dataclass
 class ToolInvocation:
     cwd : Path
     params : dict[str, any]
+    on_output : Optional[OutputCallback] = None
+    cancel_event : Optional[threading.Event] = None
+
+    def emit_output(self, stream : str, content : str) -> None:
+        if self.on_output and content:
+            self.on_output(stream, content)
+
+    @property
+    def cancelled(self) -> bool:
+        """True once the caller gave up; long loops in ``execute_sync`` should stop."""
+        return self.cancel_event is not None and self.cancel_event.is_set()
 
 @dataclass
 class ToolResult:
@@ -74,6 +112,9 @@ class Tool(abc.ABC):
     name : str = "base_tool"
     desc : str = "Base Tool"
     kind : ToolKind = ToolKind.READ
+    profile : ExecutionProfile = ExecutionProfile.ASYNC
+    timeout : Optional[float] = None
+    output_strategy : Optional[OutputStrategy] = None
 
     def __init__(self) -> None:
         pass
@@ -82,9 +123,11 @@ class Tool(abc.ABC):
     def schema(self) -> dict[str, Any] | type['BaseModel']:
         raise NotImplementedError("Tool must define schema ie override this method")
         
-    @abc.abstractmethod
     async def execute(self, invocation : ToolInvocation) -> ToolResult:
-        pass
+        return await asyncio.to_thread(self.execute_sync, invocation)
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        raise NotImplementedError(f"Tool {self.name} must override execute or execute_sync")
 
     def validate_params(self, params : dict[str, Any]) -> list[str]:
         schema = self.schema
@@ -93,7 +136,7 @@ class Tool(abc.ABC):
                 schema(**params)
             except ValidationError as e:
                 errors = []
-                for error in e.errors:
+                for error in e.errors():
                     field = '.'.join(str(x) for x in error.get("loc",[]))
                     msg = error.get("msg", "Validation Error")
                     errors.append(f"Parameter '{field}' : {msg}")
@@ -112,6 +155,10 @@ class Tool(abc.ABC):
             ToolKind.MEMORY
         }
     
+    def on_workspace_change(self, change : WorkspaceChange) -> None:
+        """Drop any cached state that ``change`` may have made stale."""
+        pass
+
     async def get_confirmation(self, invocation : ToolInvocation) -> ToolInvocation | None:
         if not self.is_mutating(invocation.params):
             return None
@@ -0,0 +1,96 @@
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ExecutionProfile,ToolInvocation,ToolResult
+from tools.builtin.edit import changes_result
+from utils.paths import resolve_path
+from utils.patch import FileChange,PatchError,apply_hunks,commit_changes,parse_unified_diff,read_text
+from pathlib import Path
+
+class ApplyPatchParams(BaseModel):
+    patch : str = Field(
+        ...,
+        description = "Unified diff covering one or more files"
+    )
+
+class ApplyPatchTool(Tool):
+    name = "apply_patch"
+
+    description = (
+        "Apply a unified diff to one or more files. Each file section starts with "
+        "'--- a/<path>' and '+++ b/<path>' followed by '@@ -start,len +start,len @@' hunks. "
+        "Use '--- /dev/null' to create a file and '+++ /dev/null' to delete one. "
+        "Hunks are located by their context lines, so small line-number drift is tolerated. "
+        "The whole patch is applied atomically: if any hunk fails, no file is changed. "
+        "Returns the applied hunks only.\n"
+
+        "PARAMETERS:\n"
+        "- patch (required): The unified diff text\n"
+
+        "EXAMPLE:\n"
+        "--- a/src/app.py\n"
+        "+++ b/src/app.py\n"
+        "@@ -10,3 +10,3 @@\n"
+        " def main():\n"
+        "-    run(debug=True)\n"
+        "+    run(debug=False)\n"
+        "     return 0\n"
+    )
+
+    kind = ToolKind.WRITE
+
+    profile = ExecutionProfile.BLOCKING_IO
+
+    schema = ApplyPatchParams
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        params = ApplyPatchParams(**invocation.params)
+
+        try:
+            patches = parse_unified_diff(params.patch)
+        except PatchError as e:
+            return ToolResult.error_result(f"Invalid patch: {e}")
+
+        originals : dict[Path, str | None] = {}
+        contents : dict[Path, str | None] = {}
+
+        try:
+            for patch in patches:
+                target = patch.new_path or patch.old_path
+                if target is None:
+                    raise PatchError("File section without a path")
+
+                path = resolve_path(invocation.cwd, target)
+                if path not in contents:
+                    if patch.old_path is None:
+                        if path.exists():
+                            raise PatchError(f"{target}: cannot create, file already exists")
+                        originals[path] = None
+                        contents[path] = ""
+                    else:
+                        if not path.is_file():
+                            raise PatchError(f"{target}: file not found")
+                        originals[path] = contents[path] = read_text(path)
+
+                if patch.new_path is None:
+                    contents[path] = None
+                    continue
+
+                contents[path] = apply_hunks(contents[path] or "", patch.hunks, target)
+        except PatchError as e:
+            return ToolResult.error_result(f"Patch does not apply, no file was modified: {e}")
+        except UnicodeDecodeError as e:
+            return ToolResult.error_result(f"Patch target is not UTF-8 text: {e}")
+
+        changes = [
+            FileChange(path, originals[path], new)
+            for path, new in contents.items()
+            if new != originals[path]
+        ]
+        if not changes:
+            return ToolResult.error_result("Patch produced no changes")
+
+        try:
+            commit_changes(changes)
+        except OSError as e:
+            return ToolResult.error_result(f"Failed to write changes, no file was modified: {e}")
+
+        return changes_result(changes, invocation.cwd)
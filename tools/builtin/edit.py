@@ -0,0 +1,122 @@
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ExecutionProfile,ToolInvocation,ToolResult
+from utils.paths import resolve_path,display_path_rel_to_cwd
+from utils.patch import FileChange,PatchError,commit_changes,compact_diff,read_text,replace_once
+from pathlib import Path
+
+class EditOperation(BaseModel):
+    path : str = Field(
+        ...,
+        description = "Path of the file to edit (relative to the working directory or absolute path)"
+    )
+
+    old_string : str = Field(
+        ...,
+        description = "Exact text to replace, including enough surrounding lines to be unique"
+    )
+
+    new_string : str = Field(
+        ...,
+        description = "Replacement text"
+    )
+
+    replace_all : bool = Field(
+        False,
+        description = "Replace every occurrence instead of requiring a unique match"
+    )
+
+class EditParams(BaseModel):
+    edits : list[EditOperation] = Field(
+        ...,
+        min_length = 1,
+        description = "Search/replace operations, applied in order. Several may target the same file."
+    )
+
+def changes_result(changes : list[FileChange], cwd : Path) -> ToolResult:
+    """Describe applied changes as compact unified diffs instead of full files."""
+    diffs = []
+    for change in changes:
+        rel = display_path_rel_to_cwd(str(change.path), cwd)
+        if change.new is None:
+            diffs.append(f"Deleted {rel}")
+        elif change.old is None:
+            lines = len(change.new.splitlines())
+            diffs.append(f"Created {rel} ({lines} lines)")
+        else:
+            diffs.append(compact_diff(rel, change.old, change.new))
+
+    return ToolResult.success_result(
+        output = "\n\n".join(diffs),
+        metadata = {
+            "paths" : [str(change.path) for change in changes],
+        },
+    )
+
+class EditTool(Tool):
+    name = "edit"
+
+    description = (
+        "Edit files by replacing exact text. Each operation replaces old_string with new_string "
+        "in one file; old_string must match exactly once unless replace_all is set. "
+        "All operations are validated before anything is written and are applied atomically: "
+        "if any operation fails, no file is changed. "
+        "Returns a unified diff of the changed lines only, so there is no need to re-read the file.\n"
+
+        "PARAMETERS:\n"
+        "- edits (required): List of {path, old_string, new_string, replace_all}\n"
+
+        "BEST PRACTICES:\n"
+        "- Read the file first and copy old_string verbatim, including indentation\n"
+        "- Include 2-3 lines of context to make old_string unique\n"
+        "- Use apply_patch for large or multi-hunk changes and write_file for new files"
+    )
+
+    kind = ToolKind.WRITE
+
+    profile = ExecutionProfile.BLOCKING_IO
+
+    schema = EditParams
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        params = EditParams(**invocation.params)
+
+        originals : dict[Path, str] = {}
+        contents : dict[Path, str] = {}
+
+        for index, edit in enumerate(params.edits, start=1):
+            path = resolve_path(invocation.cwd, edit.path)
+
+            if path not in contents:
+                if not path.is_file():
+                    return ToolResult.error_result(f"Edit {index}: file not found: {path}")
+                try:
+                    originals[path] = contents[path] = read_text(path)
+                except UnicodeDecodeError:
+                    return ToolResult.error_result(f"Edit {index}: {path} is not UTF-8 text")
+                except OSError as e:
+                    return ToolResult.error_result(f"Edit {index}: failed to read {path}: {e}")
+
+            try:
+                contents[path] = replace_once(
+                    contents[path],
+                    edit.old_string,
+                    edit.new_string,
+                    edit.replace_all,
+                )
+            except PatchError as e:
+                return ToolResult.error_result(f"Edit {index} ({edit.path}): {e}")
+
+        changes = [
+            FileChange(path, originals[path], new)
+            for path, new in contents.items()
+            if new != originals[path]
+        ]
+        if not changes:
+            return ToolResult.error_result("Edits produced no changes")
+
+        try:
+            commit_changes(changes)
+        except OSError as e:
+            return ToolResult.error_result(f"Failed to write changes, no file was modified: {e}")
+
+        return changes_result(changes, invocation.cwd)
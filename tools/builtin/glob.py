@@ -0,0 +1,118 @@
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ExecutionProfile,ToolInvocation,ToolResult
+from utils.paths import resolve_path,compile_glob,glob_base,display_path_rel_to_cwd
+from workspace.snapshot import get_snapshot,KIND_DIR
+from typing import Optional
+
+class GlobParams(BaseModel):
+    pattern : str = Field(
+        ...,
+        description = "Glob pattern relative to path, e.g. '**/*.py' or 'src/*.ts'"
+    )
+
+    path : str = Field(
+        ".",
+        description = "Directory to search from (relative to the working directory or absolute path)"
+    )
+
+    include_dirs : bool = Field(
+        False,
+        description = "Also return directories that match the pattern"
+    )
+
+    max_results : Optional[int] = Field(
+        None,
+        ge = 1,
+        description = "Maximum number of paths to return"
+    )
+
+class GlobTool(Tool):
+    name = "glob"
+
+    description = (
+        "Find files whose path matches a glob pattern. "
+        "Supports '*', '?', '[abc]' and '**' (any number of directories). "
+        "Patterns are matched against paths relative to the search directory, "
+        "so '*.py' only matches top-level files while '**/*.py' matches at any depth. "
+        "Results come from a cached workspace snapshot and are sorted by path.\n"
+
+        "PARAMETERS:\n"
+        "- pattern (required): Glob pattern\n"
+        "- path (optional): Directory to search from. Default: working directory\n"
+        "- include_dirs (optional): Include matching directories. Default: false\n"
+        "- max_results (optional): Cap on returned paths. Default: 500"
+    )
+
+    kind = ToolKind.READ
+
+    profile = ExecutionProfile.BLOCKING_IO
+
+    schema = GlobParams
+
+    MAX_RESULTS = 500
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        params = GlobParams(**invocation.params)
+        path = resolve_path(invocation.cwd, params.path)
+
+        if not path.is_dir():
+            return ToolResult.error_result(f"Path is not a directory: {path}")
+
+        pattern = params.pattern.removeprefix("./")
+        max_results = params.max_results or self.MAX_RESULTS
+
+        try:
+            regex = compile_glob(pattern)
+            snapshot, rel = get_snapshot(path)
+
+            base = glob_base(pattern)
+            start = "/".join(p for p in (rel, base) if p)
+            max_depth = None
+            if "**" not in pattern:
+                max_depth = pattern.count("/") + 1 - (base.count("/") + 1 if base else 0)
+
+            snapshot.refresh(start)
+
+            prefix_len = len(rel) + 1 if rel else 0
+            matches = []
+            total = 0
+            for entry in snapshot.iter_entries(start, max_depth=max_depth):
+                if entry.kind == KIND_DIR and not params.include_dirs:
+                    continue
+                if not regex.match(entry.path[prefix_len:]):
+                    continue
+
+                total += 1
+                if len(matches) < max_results:
+                    matches.append(
+                        display_path_rel_to_cwd(
+                            str(snapshot.root / entry.path), invocation.cwd
+                        )
+                    )
+
+        except Exception as e:
+            return ToolResult.error_result(f"Glob failed: {e}")
+
+        if not matches:
+            return ToolResult.success_result(
+                f"No paths match '{params.pattern}'",
+                metadata = {
+                    "matches" : 0,
+                }
+            )
+
+        matches.sort()
+        truncated = total > len(matches)
+        output = "\n".join(matches)
+        if truncated:
+            output += f"\n... {total - len(matches)} more matches not shown"
+
+        return ToolResult.success_result(
+            output = output,
+            truncated = truncated,
+            metadata = {
+                "pattern" : params.pattern,
+                "matches" : total,
+                "shown" : len(matches),
+            },
+        )
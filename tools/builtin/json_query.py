@@ -0,0 +1,155 @@
+from __future__ import annotations
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ExecutionProfile,ToolInvocation,ToolResult
+from utils.json_stream import ANY,DESCEND,JsonStream,JsonStreamError,Shape,build_value,format_path,parse_selector,select,summarize_value
+from utils.paths import resolve_path,display_path_rel_to_cwd
+from tools.shaping import TOOL_OUTPUT_TOKENS
+from utils.text import format_size
+from typing import Literal
+from pathlib import Path
+import json
+
+class JsonQueryParams(BaseModel):
+    path : str = Field(
+        ...,
+        description = "JSON or JSONL file to query (relative to the working directory or absolute path)"
+    )
+
+    selector : str = Field(
+        "$",
+        description = "JSONPath-like ('$.items[*].id', '$..name') or JSON pointer ('/items/0') selector"
+    )
+
+    mode : Literal["values", "summary"] = Field(
+        "values",
+        description = "'values' returns the matched subtrees, 'summary' their structure (keys, types, lengths)"
+    )
+
+    max_matches : int = Field(
+        20,
+        ge = 1,
+        le = 10000,
+        description = "Maximum number of matches to return (values) or aggregate (summary)"
+    )
+
+    max_depth : int = Field(
+        4,
+        ge = 1,
+        le = 20,
+        description = "Summary mode: how many levels of nesting to describe"
+    )
+
+class JsonQueryTool(Tool):
+    name = "json_query"
+
+    description = (
+        "Query large JSON or JSONL files without loading them whole. The file is tokenized "
+        "as a stream, subtrees that cannot match the selector are skipped, and reading stops "
+        "once enough matches are found, so memory use does not depend on file size.\n"
+
+        "SELECTORS:\n"
+        "- '$' the whole document, '$.config.name', \"$['odd key']\", '$.items[0]'\n"
+        "- '$.items[*].id' every element, '$..error' any depth\n"
+        "- JSON pointer: '/items/0/id'\n"
+
+        "PARAMETERS:\n"
+        "- path (required): JSON or JSONL file\n"
+        "- selector (optional): Default '$'\n"
+        "- mode (optional): 'values' (default) or 'summary'\n"
+        "- max_matches (optional): Default 20 for values\n"
+        "- max_depth (optional): Summary nesting depth. Default: 4\n"
+
+        "BEST PRACTICES:\n"
+        "- Start with mode='summary' to learn the structure, then select what you need"
+    )
+
+    kind = ToolKind.READ
+
+    profile = ExecutionProfile.CPU_BOUND
+
+    schema = JsonQueryParams
+
+    timeout = 300
+
+    MULTI_DOCUMENT_SUFFIXES = (".jsonl", ".ndjson")
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        params = JsonQueryParams(**invocation.params)
+        path = resolve_path(invocation.cwd, params.path)
+
+        if not path.is_file():
+            return ToolResult.error_result(f"File not found: {path}")
+
+        try:
+            segments = parse_selector(params.selector)
+        except ValueError as e:
+            return ToolResult.error_result(f"Invalid selector: {e}")
+
+        try:
+            output, matches, truncated = self._run(path, segments, params)
+        except JsonStreamError as e:
+            return ToolResult.error_result(f"Failed to parse {path.name}: {e}")
+        except (OSError, UnicodeDecodeError) as e:
+            return ToolResult.error_result(f"Failed to read {path}: {e}")
+
+        label = display_path_rel_to_cwd(str(path), invocation.cwd)
+        return ToolResult.success_result(
+            f"{label} ({format_size(path.stat().st_size)}), selector {params.selector}\n\n{output}",
+            truncated = truncated,
+            metadata = {
+                "path" : str(path),
+                "selector" : params.selector,
+                "matches" : matches,
+            },
+        )
+
+    def _run(self, path : Path, segments : list, params : JsonQueryParams) -> tuple[str, int, bool]:
+        # stop building values past what any budget could keep; the registry
+        # cuts the rest to the turn's share
+        budget = TOOL_OUTPUT_TOKENS * 4
+        max_matches = params.max_matches
+        multi_document = path.suffix.lower() in self.MULTI_DOCUMENT_SUFFIXES
+        if not multi_document and not any(
+            segment is ANY or segment is DESCEND for segment in segments
+        ):
+            max_matches = 1
+
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            stream = JsonStream(f)
+            if params.mode == "summary":
+                shape = Shape()
+                matches = 0
+                for _, kind, value in select(stream, segments, max_matches):
+                    summarize_value(stream, kind, value, shape)
+                    matches += 1
+                if not matches:
+                    return "No matches", 0, False
+
+                lines : list[str] = []
+                shape.render("$" if not segments else "match", 0, params.max_depth, lines)
+                header = f"Structure of {matches} match{'es' if matches != 1 else ''}:"
+                return header + "\n" + "\n".join(lines), matches, False
+
+            sections = []
+            truncated = False
+            for match_path, kind, value in select(stream, segments, max_matches):
+                line = stream.document_line
+                remaining = max(256, budget - sum(len(s) for s in sections))
+                value, cut = build_value(stream, kind, value, remaining)
+                truncated = truncated or cut
+                label = format_path(match_path)
+                if multi_document:
+                    label = f"line {line}: {label}"
+                sections.append(
+                    f"{label}\n{json.dumps(value, indent=2, ensure_ascii=False)}"
+                )
+
+        matches = len(sections)
+        if not matches:
+            return "No matches", 0, False
+
+        if matches == max_matches > 1:
+            sections.append(f"...[stopped after {matches} matches, there may be more]")
+            truncated = True
+
+        return "\n\n".join(sections), matches, truncated
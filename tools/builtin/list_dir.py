@@ -0,0 +1,109 @@
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ExecutionProfile,ToolInvocation,ToolResult
+from utils.paths import resolve_path
+from utils.text import format_size
+from workspace.snapshot import get_snapshot
+from typing import Optional
+
+class ListDirParams(BaseModel):
+    path : str = Field(
+        ".",
+        description = "Directory to list (relative to the working directory or absolute path)"
+    )
+
+    depth : int = Field(
+        2,
+        ge = 1,
+        le = 10,
+        description = "How many directory levels to descend (1 lists only direct children)"
+    )
+
+    max_entries : Optional[int] = Field(
+        None,
+        ge = 1,
+        description = "Maximum number of entries to return"
+    )
+
+class ListDirTool(Tool):
+    name = "list_dir"
+
+    description = (
+        "List the contents of a directory as an indented tree. "
+        "Directories end with '/', files show their size. "
+        "Version control folders, virtualenvs, caches and .gitignore'd paths are skipped. "
+        "Results come from a cached workspace snapshot that is refreshed incrementally, "
+        "so repeated listings are cheap.\n"
+
+        "PARAMETERS:\n"
+        "- path (optional): Directory to list. Default: working directory\n"
+        "- depth (optional): Levels to descend. Default: 2\n"
+        "- max_entries (optional): Cap on returned entries. Default: 500"
+    )
+
+    kind = ToolKind.READ
+
+    profile = ExecutionProfile.BLOCKING_IO
+
+    schema = ListDirParams
+
+    MAX_ENTRIES = 500
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        params = ListDirParams(**invocation.params)
+        path = resolve_path(invocation.cwd, params.path)
+
+        if not path.exists():
+            return ToolResult.error_result(f"Path not found: {path}")
+
+        if not path.is_dir():
+            return ToolResult.error_result(f"Path is not a directory: {path}")
+
+        max_entries = params.max_entries or self.MAX_ENTRIES
+
+        try:
+            snapshot, rel = get_snapshot(path)
+            snapshot.refresh(rel)
+
+            lines = []
+            total = 0
+            base_depth = rel.count("/") + 1 if rel else 0
+
+            for entry in snapshot.iter_entries(rel, max_depth=params.depth):
+                total += 1
+                if len(lines) >= max_entries:
+                    continue
+
+                indent = "  " * (entry.path.count("/") - base_depth)
+                name = entry.path.rsplit("/", 1)[-1]
+                if entry.is_dir:
+                    lines.append(f"{indent}{name}/")
+                else:
+                    lines.append(f"{indent}{name}  ({format_size(entry.size)})")
+
+        except Exception as e:
+            return ToolResult.error_result(f"Failed to list directory: {e}")
+
+        if not lines:
+            return ToolResult.success_result(
+                "Directory is empty.",
+                metadata = {
+                    "path" : str(path),
+                    "entries" : 0,
+                }
+            )
+
+        truncated = total > len(lines)
+        output = "\n".join(lines)
+        if truncated:
+            output += f"\n... {total - len(lines)} more entries not shown"
+
+        return ToolResult.success_result(
+            output = output,
+            truncated = truncated,
+            metadata = {
+                "path" : str(path),
+                "entries" : total,
+                "shown" : len(lines),
+                "complete" : snapshot.complete,
+            },
+        )
@@ -0,0 +1,156 @@
+from __future__ import annotations
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ExecutionProfile,ToolInvocation,ToolResult
+from tools.runtime import tool_runtime
+from utils.paths import resolve_path,display_path_rel_to_cwd,guess_language,compile_glob
+from workspace.outline import FileOutline,SUPPORTED_LANGUAGES,outline_cache
+from workspace.snapshot import get_snapshot,KIND_FILE
+from typing import Optional,TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from workspace.watcher import WorkspaceChange
+
+class OutlineParams(BaseModel):
+    path : str = Field(
+        ...,
+        description = "File or directory to outline (relative to the working directory or absolute path)"
+    )
+
+    pattern : Optional[str] = Field(
+        None,
+        description = "For directories: only outline files matching this glob, e.g. '**/*.py'"
+    )
+
+    max_files : Optional[int] = Field(
+        None,
+        ge = 1,
+        description = "For directories: maximum number of files to outline"
+    )
+
+def render_outline(outline : FileOutline, label : str) -> str:
+    header = f"{label} ({outline.language}, {outline.total_lines} lines)"
+    if outline.error:
+        header += f" [{outline.error}]"
+
+    lines = [header]
+    for symbol in outline.symbols:
+        indent = "  " * (symbol.depth + 1)
+        lines.append(f"{indent}{symbol.signature}  [{symbol.start}-{symbol.end}]")
+
+    if not outline.symbols:
+        lines.append("  (no symbols found)")
+
+    return "\n".join(lines)
+
+class OutlineTool(Tool):
+    name = "outline"
+
+    description = (
+        "Show the structure of source files without reading them: classes, functions, methods "
+        "and their signatures with [start-end] line ranges. "
+        "Python is parsed exactly; other languages (JS/TS, Rust, Go, Java, Kotlin, Swift, C/C++, "
+        "shell, SQL, Markdown headings, TOML/YAML keys, CSS) use pattern matching. "
+        "Given a directory, every supported file below it is outlined. "
+        "Follow up with read_file(path, offset=start, limit=end-start+1) to read just the part you need.\n"
+
+        "PARAMETERS:\n"
+        "- path (required): File or directory\n"
+        "- pattern (optional): Glob filter for directories, e.g. 'src/**/*.ts'\n"
+        "- max_files (optional): Cap on outlined files for directories. Default: 200"
+    )
+
+    kind = ToolKind.READ
+
+    profile = ExecutionProfile.BLOCKING_IO
+
+    schema = OutlineParams
+
+    timeout = 120
+
+    MAX_FILES = 200
+    PROCESS_POOL_MIN_FILES = 32
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        params = OutlineParams(**invocation.params)
+        path = resolve_path(invocation.cwd, params.path)
+
+        if not path.exists():
+            return ToolResult.error_result(f"Path not found: {path}")
+
+        if path.is_file():
+            language = guess_language(path)
+            if language not in SUPPORTED_LANGUAGES:
+                return ToolResult.error_result(
+                    f"Outline is not supported for {path.name}; use read_file instead"
+                )
+
+            outline = outline_cache.get(path)
+            return ToolResult.success_result(
+                render_outline(outline, display_path_rel_to_cwd(str(path), invocation.cwd)),
+                metadata = {
+                    "path" : str(path),
+                    "symbols" : len(outline.symbols),
+                },
+            )
+
+        max_files = params.max_files or self.MAX_FILES
+        regex = compile_glob(params.pattern.removeprefix("./")) if params.pattern else None
+
+        snapshot, rel = get_snapshot(path)
+        snapshot.refresh(rel)
+        prefix_len = len(rel) + 1 if rel else 0
+
+        files = []
+        total = 0
+        for entry in snapshot.iter_entries(rel):
+            if entry.kind != KIND_FILE or guess_language(entry.path) not in SUPPORTED_LANGUAGES:
+                continue
+            if regex and not regex.match(entry.path[prefix_len:]):
+                continue
+            total += 1
+            if len(files) < max_files:
+                files.append(snapshot.root / entry.path)
+
+        if invocation.cancelled:
+            return ToolResult.error_result("Outline cancelled")
+
+        if not files:
+            return ToolResult.success_result(
+                "No supported source files found",
+                metadata = {
+                    "files" : 0,
+                },
+            )
+
+        outlines = outline_cache.get_many(files, self._parse_many)
+
+        output = "\n\n".join(
+            render_outline(outline, display_path_rel_to_cwd(outline.path, invocation.cwd))
+            for outline in outlines
+        )
+
+        truncated = total > len(files)
+        if truncated:
+            output += f"\n\n... {total - len(files)} more files not outlined"
+
+        return ToolResult.success_result(
+            output = output,
+            truncated = truncated,
+            metadata = {
+                "path" : str(path),
+                "files" : total,
+                "shown" : len(files),
+                "symbols" : sum(len(outline.symbols) for outline in outlines),
+            },
+        )
+
+    def _parse_many(self, fn, paths : list[str], languages : list[str]) -> list:
+        if len(paths) < self.PROCESS_POOL_MIN_FILES:
+            return list(map(fn, paths, languages))
+
+        # a cold tree: spread the misses over the worker processes in chunks
+        chunksize = max(1, len(paths) // (tool_runtime.cpu_workers * 4))
+        return tool_runtime.map_cpu(fn, paths, languages, chunksize = chunksize)
+
+    def on_workspace_change(self, change : WorkspaceChange) -> None:
+        outline_cache.invalidate(None if change.overflow else list(change.paths))
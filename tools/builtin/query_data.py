@@ -0,0 +1,158 @@
+from __future__ import annotations
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ExecutionProfile,ToolInvocation,ToolResult
+from utils.paths import resolve_path,display_path_rel_to_cwd
+from utils.text import format_size
+from workspace.tables import LoadedTable,QueryError,quote_identifier,table_alias,table_format,table_store
+from typing import Any,Optional,TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from workspace.watcher import WorkspaceChange
+
+class QueryDataParams(BaseModel):
+    files : list[str] = Field(
+        ...,
+        min_length = 1,
+        max_length = 8,
+        description = "CSV, TSV or JSONL files to query (relative to the working directory or absolute paths)"
+    )
+
+    query : Optional[str] = Field(
+        None,
+        description = "SQLite SELECT statement. Omit to get each table's columns, row count and sample rows"
+    )
+
+    limit : int = Field(
+        50,
+        ge = 1,
+        le = 1000,
+        description = "Maximum number of rows to return"
+    )
+
+    timeout : int = Field(
+        60,
+        ge = 1,
+        le = 600,
+        description = "Query timeout in seconds"
+    )
+
+class QueryDataTool(Tool):
+    name = "query_data"
+
+    description = (
+        "Run SQL over large CSV, TSV or JSONL files. Each file is streamed into a SQLite table "
+        "named after its file stem (e.g. 'sales-2024.csv' -> sales_2024); the table is kept "
+        "until the file changes, so follow-up queries are fast. "
+        "Columns use NUMERIC affinity: numeric-looking values are stored as numbers, empty "
+        "cells are NULL, nested JSON values are stored as JSON text (use json_extract). "
+        "JSONL tables get a _line column with the source line number. "
+        "Only SELECT (including WITH) is allowed.\n"
+
+        "PARAMETERS:\n"
+        "- files (required): Data files to load\n"
+        "- query (optional): SELECT statement; omit to inspect the schema first\n"
+        "- limit (optional): Maximum rows returned. Default: 50\n"
+        "- timeout (optional): Seconds before the query is aborted. Default: 60\n"
+
+        "BEST PRACTICES:\n"
+        "- Inspect the schema first, then aggregate (COUNT, SUM, GROUP BY) instead of "
+        "selecting raw rows\n"
+        "- Prefer this over read_file for any data file larger than a few hundred lines"
+    )
+
+    kind = ToolKind.READ
+
+    profile = ExecutionProfile.BLOCKING_IO
+
+    schema = QueryDataParams
+
+    MAX_CELL_CHARS = 200
+    SAMPLE_ROWS = 5
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        params = QueryDataParams(**invocation.params)
+
+        aliases : dict[str, LoadedTable] = {}
+        for name in params.files:
+            path = resolve_path(invocation.cwd, name)
+            if not path.is_file():
+                return ToolResult.error_result(f"File not found: {path}")
+            if table_format(path) is None:
+                return ToolResult.error_result(
+                    f"Unsupported file type: {path.name} (expected .csv, .tsv, .jsonl or .ndjson)"
+                )
+
+            try:
+                loaded = table_store.load(path)
+            except (QueryError, OSError) as e:
+                return ToolResult.error_result(f"Failed to load {path}: {e}")
+            aliases[table_alias(path, set(aliases))] = loaded
+
+        try:
+            if params.query is None:
+                output = self._describe(aliases, invocation)
+                truncated = False
+            else:
+                columns, rows, truncated = table_store.query(
+                    params.query,
+                    aliases,
+                    params.limit,
+                    params.timeout,
+                )
+                output = self._format_rows(columns, rows)
+                if truncated:
+                    output += f"\n...[more rows available, showing first {params.limit}]"
+        except QueryError as e:
+            return ToolResult.error_result(f"Query failed: {e}")
+
+        return ToolResult.success_result(
+            output = output,
+            truncated = truncated,
+            metadata = {
+                "tables" : {
+                    alias : {
+                        "path" : loaded.path,
+                        "rows" : loaded.rows,
+                        "columns" : len(loaded.columns),
+                    }
+                    for alias, loaded in aliases.items()
+                },
+            },
+        )
+
+    def _describe(self, aliases : dict[str, LoadedTable], invocation : ToolInvocation) -> str:
+        sections = []
+        for alias, loaded in aliases.items():
+            size = format_size(loaded.identity[2])
+            label = display_path_rel_to_cwd(loaded.path, invocation.cwd)
+            columns, rows, _ = table_store.query(
+                f"SELECT * FROM {quote_identifier(alias)} LIMIT {self.SAMPLE_ROWS}",
+                aliases,
+                self.SAMPLE_ROWS,
+                30,
+            )
+            sections.append(
+                f"Table {alias} <- {label} ({size}, {loaded.rows} rows, loaded in {loaded.load_seconds:.1f}s)\n"
+                f"Columns: {', '.join(loaded.columns)}\n"
+                f"Sample:\n{self._format_rows(columns, rows)}"
+            )
+        return "\n\n".join(sections)
+
+    def _format_rows(self, columns : list[str], rows : list[tuple]) -> str:
+        if not rows:
+            return "\t".join(columns) + "\n(no rows)"
+
+        def cell(value : Any) -> str:
+            if value is None:
+                return "NULL"
+            text = str(value).replace("\t", " ").replace("\n", "\\n")
+            if len(text) > self.MAX_CELL_CHARS:
+                text = text[: self.MAX_CELL_CHARS] + "..."
+            return text
+
+        lines = ["\t".join(columns)]
+        lines.extend("\t".join(cell(value) for value in row) for row in rows)
+        return "\n".join(lines)
+
+    def on_workspace_change(self, change : WorkspaceChange) -> None:
+        table_store.invalidate(None if change.overflow else list(change.paths))
@@ -1,13 +1,10 @@
 from pydantic import BaseModel,Field
-from tools.base import Tool,ToolKind,ToolInvocation,ToolResult
+from tools.base import Tool,ToolKind,ExecutionProfile,ToolInvocation,ToolResult
+from utils.compressed import ArchiveError,TAR,ZIP,detect_compression,list_members,read_window,split_archive_path
 from utils.paths import resolve_path,is_binary_file
-from utils.text import count_token,truncate_text
+from utils.text import format_size
 from typing import Optional
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-model = os.getenv('MODEL')
+from pathlib import Path
 
 class ReadFileParams(BaseModel):
     path : str = Field(
@@ -40,6 +37,9 @@ class ReadFileTool(Tool):
         "- Configuration files: .conf, .cfg, .ini, .env\n"
         "- Documentation: .rst, .tex\n"
         "- Any UTF-8 encoded text file\n"
+        "- Compressed text (.gz, .bz2, .xz) is decompressed on the fly\n"
+        "- Archive members (.zip, .tar, .tar.gz, ...) as 'archive.zip!path/inside.txt'; "
+        "reading the archive itself lists its members\n"
         
         "PARAMETERS:\n"
         "- filepath (required): Absolute or relative path to the file to read\n"
@@ -80,27 +80,31 @@ class ReadFileTool(Tool):
     
     kind = ToolKind.READ
 
+    profile = ExecutionProfile.BLOCKING_IO
+
     schema = ReadFileParams
 
-    MAX_FILE_SIZE = 1024*1024*10
-    MAX_FILE_TOKENS = 30000
+    timeout = 120
 
-    async def execute(self, invocation : ToolInvocation) -> ToolResult:
-        params = ReadFileParams(**invocation.params)
-        path = resolve_path(invocation.cwd, params.path)
+    MAX_FILE_SIZE = 1024*1024*10
+    MAX_STREAM_LINES = 2000
+    MAX_LISTED_MEMBERS = 200
 
+    @classmethod
+    def check_file(cls, path : Path) -> Optional[str]:
+        """Return why ``path`` cannot be read as text, or None if it can."""
         if not path.exists():
-            return ToolResult.error_result(f"Path not found: {path}")
+            return f"Path not found: {path}"
         
         if not path.is_file():
-            return ToolResult.error_result(f"Path is not a file: {path}")
+            return f"Path is not a file: {path}"
 
         file_size = path.stat().st_size
 
-        if file_size > self.MAX_FILE_SIZE:
-            return ToolResult.error_result(
+        if file_size > cls.MAX_FILE_SIZE:
+            return (
                 f"File too large ({file_size / (1024*1024):.1f}MB). "
-                f"Maximum is {self.MAX_FILE_SIZE / (1024*1024):.0f}MB."
+                f"Maximum is {cls.MAX_FILE_SIZE / (1024*1024):.0f}MB."
             )
         
         if is_binary_file(path):
@@ -108,18 +112,28 @@ class ReadFileTool(Tool):
             size_str = (
                 f"{file_size_mb:.2f}MB" if file_size_mb >= 1 else f"{file_size} bytes"
             )
-            return ToolResult.error_result(
+            return (
                 f"Cannot read binary file: {path.name} ({size_str}) "
                 f"This tool only reads text files."
             )
+
+        return None
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        params = ReadFileParams(**invocation.params)
+        path = resolve_path(invocation.cwd, params.path)
+
+        archive, member = split_archive_path(path)
+        compression = detect_compression(archive) if archive.is_file() else None
+        if member is not None or compression is not None:
+            return self._read_compressed(archive, compression, member, params)
+
+        error = self.check_file(path)
+        if error:
+            return ToolResult.error_result(error)
         
         try:
-            try:
-                content = path.read_text(encoding='utf-8')
-            except UnicodeDecodeError:
-                content = path.read_text(encoding='latin-1')
-
-            lines = content.splitlines()
+            lines = read_lines(path)
             total_lines = len(lines)
 
             if total_lines == 0:
@@ -130,32 +144,10 @@ class ReadFileTool(Tool):
                     }
                 )
             
-            start_idx = max(0,params.offset - 1)
+            start_idx, end_idx = line_window(total_lines, params.offset, params.limit)
 
-            if params.limit is not None:
-                end_idx = min(start_idx + params.limit,total_lines)
-            else:
-                end_idx = total_lines
-            
-            selected_lines = lines[start_idx : end_idx]
+            output = format_lines(lines[start_idx : end_idx], start_idx + 1)
 
-            formatted_lines = []
-
-            for i, line in enumerate(selected_lines, start=start_idx + 1):
-                formatted_lines.append(f"{i:6}|{line}")
-
-            output = "\n".join(formatted_lines)
-            token_count = count_token(output,model)
-            truncated = False
-
-            if token_count > self.MAX_FILE_TOKENS:
-                output = truncate_text(
-                    output,
-                    self.MAX_FILE_TOKENS,
-                    suffix = f"Truncated {total_lines} total lines"
-                ) 
-                truncated = True
-            
             metadata_lines = []
             if start_idx > 0 or end_idx < total_lines:
                 metadata_lines.append(
@@ -168,7 +160,6 @@ class ReadFileTool(Tool):
             
             return ToolResult.success_result(
                 output=output,
-                truncated=truncated,
                 metadata={
                     "path": str(path),
                     "total_lines": total_lines,
@@ -180,6 +171,106 @@ class ReadFileTool(Tool):
         except Exception as e:
             return ToolResult.error_result(f"Failed to read file: {e}")
 
+    def _read_compressed(
+        self,
+        archive : Path,
+        compression : Optional[str],
+        member : Optional[str],
+        params : ReadFileParams,
+    ) -> ToolResult:
+        """Read a window of a compressed file or archive member without unpacking it."""
+        if member is not None and compression not in (ZIP, TAR):
+            return ToolResult.error_result(f"{archive.name} is not a zip or tar archive")
 
+        try:
+            if compression in (ZIP, TAR) and member is None:
+                members = list_members(archive, compression)
+                if len(members) != 1:
+                    return self._list_archive(archive, members)
+                member = members[0].name
+
+            window = read_window(
+                archive,
+                compression,
+                member,
+                params.offset,
+                params.limit or self.MAX_STREAM_LINES,
+            )
+        except ArchiveError as e:
+            return ToolResult.error_result(str(e))
+
+        label = f"{archive}!{member}" if member else str(archive)
+        if not window.lines:
+            if params.offset > 1:
+                return ToolResult.error_result(f"Offset {params.offset} is past the end of {label}")
+            return ToolResult.success_result(
+                "File is empty nothing to read.",
+                metadata = {
+                    "path" : label,
+                    "lines" : 0,
+                },
+            )
+
+        end_line = window.start + len(window.lines) - 1
+        output = format_lines(window.lines, window.start)
+        truncated = window.total is None
+
+        if window.total is None:
+            header = f"Showing lines {window.start}-{end_line}, more lines follow"
+        elif window.start > 1:
+            header = f"Showing lines {window.start}-{end_line} of {window.total}"
+        else:
+            header = None
 
+        return ToolResult.success_result(
+            output = f"{header}\n\n{output}" if header else output,
+            truncated = truncated,
+            metadata = {
+                "path" : label,
+                "compression" : compression,
+                "total_lines" : window.total,
+                "shown_start" : window.start,
+                "shown_end" : end_line,
+            },
+        )
 
+    def _list_archive(self, archive : Path, members : list) -> ToolResult:
+        lines = [
+            f"{member.name} ({format_size(member.size)})"
+            for member in members[: self.MAX_LISTED_MEMBERS]
+        ]
+        if len(members) > self.MAX_LISTED_MEMBERS:
+            lines.append(f"... {len(members) - self.MAX_LISTED_MEMBERS} more members")
+
+        return ToolResult.success_result(
+            f"{archive.name} contains {len(members)} files. "
+            f"Read one with read_file('{archive.name}!<member>').\n\n" + "\n".join(lines),
+            metadata = {
+                "path" : str(archive),
+                "members" : len(members),
+            },
+        )
+
+
+def read_lines(path : Path) -> list[str]:
+    try:
+        content = path.read_text(encoding='utf-8')
+    except UnicodeDecodeError:
+        content = path.read_text(encoding='latin-1')
+
+    return content.splitlines()
+
+def line_window(total_lines : int, offset : int, limit : Optional[int]) -> tuple[int, int]:
+    start_idx = max(0, offset - 1)
+
+    if limit is not None:
+        end_idx = min(start_idx + limit, total_lines)
+    else:
+        end_idx = total_lines
+
+    return start_idx, end_idx
+
+def format_lines(lines : list[str], start_line : int) -> str:
+    return "\n".join(
+        f"{i:6}|{line}" for i, line in enumerate(lines, start=start_line)
+    )
@@ -0,0 +1,177 @@
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ToolInvocation,ToolResult
+from tools.builtin.read_file import ReadFileTool,format_lines,line_window,read_lines
+from tools.shaping import TOOL_OUTPUT_TOKENS
+from utils.paths import resolve_path,display_path_rel_to_cwd
+from utils.text import count_token,truncate_text
+from dataclasses import dataclass
+from typing import Optional
+from pathlib import Path
+from utils.config import get_config
+import asyncio
+
+model = get_config().model
+
+class FileRange(BaseModel):
+    path : str = Field(
+        ...,
+        description = "Path of the file to read (relative to the working directory or absolute path)"
+    )
+
+    offset : int = Field(
+        1,
+        ge = 1,
+        description = "Line number to start reading from (1 based)"
+    )
+
+    limit : Optional[int] = Field(
+        None,
+        ge = 1,
+        description = "Maximum number of lines to read. If not given read entire file"
+    )
+
+class ReadManyParams(BaseModel):
+    files : list[FileRange] = Field(
+        ...,
+        min_length = 1,
+        max_length = 50,
+        description = "Files (optionally with line ranges) to read"
+    )
+
+    max_tokens : Optional[int] = Field(
+        None,
+        ge = 100,
+        description = "Total token budget shared by all files"
+    )
+
+@dataclass
+class _Chunk:
+    label : str
+    body : str
+    tokens : int
+    error : Optional[str] = None
+    path : Optional[Path] = None
+
+    def header(self) -> str:
+        if self.error:
+            return f"==> {self.label} <==\nError: {self.error}"
+        return f"==> {self.label} <==\n"
+
+class ReadManyTool(Tool):
+    name = "read_many"
+
+    description = (
+        "Read several text files (or line ranges of them) in one call. "
+        "Files are read concurrently and returned together, each under a "
+        "'==> path <==' header, with the same '<line_number>|<content>' format as read_file. "
+        "One token budget is shared by all files: small files are returned whole and only the "
+        "largest ones are cut short when the budget runs out.\n"
+
+        "PARAMETERS:\n"
+        "- files (required): List of {path, offset, limit}\n"
+        "- max_tokens (optional): Total budget for all files. Default: 30000\n"
+
+        "BEST PRACTICES:\n"
+        "- Prefer this over several read_file calls when you already know which files you need\n"
+        "- Use read_file with offset/limit for a single large file"
+    )
+
+    kind = ToolKind.READ
+
+    schema = ReadManyParams
+
+    MAX_TOTAL_TOKENS = TOOL_OUTPUT_TOKENS
+
+    async def execute(self, invocation : ToolInvocation) -> ToolResult:
+        params = ReadManyParams(**invocation.params)
+        budget = params.max_tokens or self.MAX_TOTAL_TOKENS
+
+        chunks = await asyncio.gather(
+            *(
+                asyncio.to_thread(self._read_one, invocation.cwd, file_range)
+                for file_range in params.files
+            )
+        )
+
+        readable = [chunk for chunk in chunks if chunk.error is None]
+        # headers, errors and the blank lines between sections come out of
+        # the budget before the file bodies share the rest
+        overhead = sum(count_token(chunk.header(), model) + 1 for chunk in chunks)
+        shares = _allocate(
+            [chunk.tokens for chunk in readable],
+            budget - overhead,
+        )
+
+        truncated = False
+        for chunk, share in zip(readable, shares):
+            if chunk.tokens > share:
+                chunk.body = truncate_text(
+                    chunk.body,
+                    share,
+                    model,
+                    suffix = "\n...[truncated to fit the shared token budget]",
+                )
+                truncated = True
+
+        output = "\n\n".join(chunk.header() + chunk.body for chunk in chunks)
+        metadata = {
+            "files" : len(chunks),
+            "failed" : len(chunks) - len(readable),
+            "paths" : [str(chunk.path) for chunk in readable],
+        }
+
+        if not readable:
+            return ToolResult.error_result(
+                "None of the files could be read",
+                output = output,
+                metadata = metadata,
+            )
+
+        return ToolResult.success_result(
+            output = output,
+            truncated = truncated,
+            metadata = metadata,
+        )
+
+    def _read_one(self, cwd : Path, file_range : FileRange) -> _Chunk:
+        path = resolve_path(cwd, file_range.path)
+        label = display_path_rel_to_cwd(str(path), cwd)
+
+        error = ReadFileTool.check_file(path)
+        if error:
+            return _Chunk(label, "", 0, error=error)
+
+        try:
+            lines = read_lines(path)
+        except Exception as e:
+            return _Chunk(label, "", 0, error=f"Failed to read file: {e}")
+
+        total_lines = len(lines)
+        if total_lines == 0:
+            return _Chunk(label, "(empty file)", 3, path=path)
+
+        start_idx, end_idx = line_window(total_lines, file_range.offset, file_range.limit)
+        if start_idx > 0 or end_idx < total_lines:
+            label = f"{label} (lines {start_idx + 1}-{end_idx} of {total_lines})"
+
+        body = format_lines(lines[start_idx : end_idx], start_idx + 1)
+        return _Chunk(label, body, count_token(body, model), path=path)
+
+
+def _allocate(needs : list[int], budget : int) -> list[int]:
+    """Split ``budget`` so the smallest needs are met in full first.
+
+    Files are visited from smallest to largest and each receives at most an
+    equal share of what is left, so whatever the small files don't use flows
+    to the larger ones and only the largest files are truncated.
+    """
+    shares = [0] * len(needs)
+    remaining = max(0, budget)
+    order = sorted(range(len(needs)), key=lambda i: needs[i])
+
+    for position, index in enumerate(order):
+        fair_share = remaining // (len(order) - position)
+        shares[index] = min(needs[index], fair_share)
+        remaining -= shares[index]
+
+    return shares
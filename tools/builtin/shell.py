@@ -0,0 +1,211 @@
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ToolInvocation,ToolResult
+from utils.paths import resolve_path
+from utils.text import HeadTailBuffer
+from typing import Optional
+import asyncio
+import codecs
+import os
+import shutil
+import signal
+
+class ShellParams(BaseModel):
+    command : str = Field(
+        ...,
+        description = "Shell command to run"
+    )
+
+    timeout : int = Field(
+        120,
+        ge = 1,
+        le = 600,
+        description = "Seconds to wait before the command is killed"
+    )
+
+    cwd : Optional[str] = Field(
+        None,
+        description = "Directory to run the command in (relative to the working directory or absolute path)"
+    )
+
+class _ExitProtocol(asyncio.subprocess.SubprocessStreamProtocol):
+    """Stream protocol that also signals when the process itself exits.
+
+    ``Process.wait()`` only returns once the pipes are closed as well, which
+    a background job started by the command can delay indefinitely.
+    """
+
+    def __init__(self, limit : int, loop : asyncio.AbstractEventLoop) -> None:
+        super().__init__(limit=limit, loop=loop)
+        self.exited = asyncio.Event()
+
+    def process_exited(self) -> None:
+        super().process_exited()
+        self.exited.set()
+
+class ShellTool(Tool):
+    name = "shell"
+
+    description = (
+        "Run a shell command and return its combined stdout/stderr and exit code. "
+        "Output is streamed to the user while the command runs. "
+        "Very long output keeps only its beginning and end, so prefer commands with "
+        "focused output (e.g. pipe through head, grep or tail).\n"
+
+        "PARAMETERS:\n"
+        "- command (required): Command line, interpreted by bash (or sh)\n"
+        "- timeout (optional): Seconds before the command and its children are killed. Default: 120, max: 600\n"
+        "- cwd (optional): Directory to run in. Default: working directory\n"
+
+        "LIMITATIONS:\n"
+        "- Commands run non-interactively with no stdin; do not start editors, pagers or prompts\n"
+        "- Background processes (cmd &) keep running after the command exits, but their later "
+        "output is not captured; on timeout they are killed together with the command"
+    )
+
+    kind = ToolKind.SHELL
+
+    schema = ShellParams
+
+    HEAD_BYTES = 64 * 1024
+    TAIL_BYTES = 64 * 1024
+    READ_CHUNK = 64 * 1024
+    KILL_GRACE = 2.0
+    DRAIN_GRACE = 0.5
+
+    # pumps left reading pipes a background job still holds, until it exits
+    _detached : set[asyncio.Task] = set()
+
+    async def execute(self, invocation : ToolInvocation) -> ToolResult:
+        params = ShellParams(**invocation.params)
+        cwd = resolve_path(invocation.cwd, params.cwd) if params.cwd else invocation.cwd
+
+        if not cwd.is_dir():
+            return ToolResult.error_result(f"Working directory not found: {cwd}")
+
+        shell = shutil.which("bash") or "/bin/sh"
+        env = dict(os.environ, PAGER="cat", GIT_PAGER="cat")
+        buffer = HeadTailBuffer(self.HEAD_BYTES, self.TAIL_BYTES)
+
+        loop = asyncio.get_running_loop()
+        try:
+            transport, protocol = await loop.subprocess_exec(
+                lambda: _ExitProtocol(self.READ_CHUNK, loop),
+                shell,
+                "-c",
+                params.command,
+                cwd=str(cwd),
+                env=env,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True,
+            )
+        except OSError as e:
+            return ToolResult.error_result(f"Failed to start command: {e}")
+        process = asyncio.subprocess.Process(transport, protocol, loop)
+        exited = protocol.exited
+
+        capturing = True
+
+        async def pump(stream : asyncio.StreamReader, name : str) -> None:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            while True:
+                chunk = await stream.read(self.READ_CHUNK)
+                if not capturing:
+                    # keep reading so a detached background job never blocks
+                    if not chunk:
+                        return
+                    continue
+                if not chunk:
+                    invocation.emit_output(name, decoder.decode(b"", final=True))
+                    return
+                buffer.write(chunk)
+                invocation.emit_output(name, decoder.decode(chunk))
+
+        pumps = [
+            asyncio.create_task(pump(process.stdout, "stdout")),
+            asyncio.create_task(pump(process.stderr, "stderr")),
+        ]
+
+        try:
+            # the command is done when the shell exits, even if a background
+            # job it started still holds the pipes
+            try:
+                await asyncio.wait_for(exited.wait(), timeout=params.timeout)
+                timed_out = False
+            except asyncio.TimeoutError:
+                timed_out = True
+                await self._kill(process, exited)
+
+            _, pending = await asyncio.wait(pumps, timeout=self.DRAIN_GRACE)
+        except asyncio.CancelledError:
+            await asyncio.shield(self._kill(process, exited))
+            for task in pumps:
+                task.cancel()
+            raise
+
+        detached = bool(pending)
+        if detached:
+            capturing = False
+            for task in pending:
+                self._detached.add(task)
+                task.add_done_callback(self._detached.discard)
+
+        output = self._format_output(buffer)
+        if detached:
+            output += "\n[background processes are still running; their later output is not captured]"
+        # the registry keeps head and tail within the turn's budget (ToolKind.SHELL)
+        truncated = buffer.dropped > 0
+
+        metadata = {
+            "command" : params.command,
+            "cwd" : str(cwd),
+            "exit_code" : process.returncode,
+            "output_bytes" : buffer.total,
+            "timed_out" : timed_out,
+            "detached" : detached,
+        }
+
+        if timed_out:
+            return ToolResult.error_result(
+                f"Command timed out after {params.timeout}s and was killed",
+                output = output,
+                truncated = truncated,
+                metadata = metadata,
+            )
+
+        if process.returncode != 0:
+            return ToolResult.error_result(
+                f"Command exited with code {process.returncode}",
+                output = output,
+                truncated = truncated,
+                metadata = metadata,
+            )
+
+        return ToolResult.success_result(
+            output = output or "(no output)",
+            truncated = truncated,
+            metadata = metadata,
+        )
+
+    def _format_output(self, buffer : HeadTailBuffer) -> str:
+        if not buffer.dropped:
+            return (buffer.head() + buffer.tail()).decode("utf-8", errors="replace")
+
+        return (
+            buffer.head().decode("utf-8", errors="replace")
+            + f"\n...[{buffer.dropped} bytes of output omitted]...\n"
+            + buffer.tail().decode("utf-8", errors="replace")
+        )
+
+    async def _kill(self, process : asyncio.subprocess.Process, exited : asyncio.Event) -> None:
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                return
+
+            try:
+                await asyncio.wait_for(exited.wait(), timeout=self.KILL_GRACE)
+            except asyncio.TimeoutError:
+                pass
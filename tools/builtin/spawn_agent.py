@@ -0,0 +1,187 @@
+from __future__ import annotations
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ToolInvocation,ToolResult
+from tools.runtime import tool_runtime
+from utils.config import get_config
+from utils.text import count_token,truncate_text
+from dataclasses import dataclass,field
+from typing import Any,Optional,TYPE_CHECKING
+import asyncio
+import logging
+import time
+
+if TYPE_CHECKING:
+    from client.llm_client import LLMClient
+    from tools.registry import ToolRegistry
+    from workspace.watcher import WorkspaceWatcher
+
+logger = logging.getLogger(__name__)
+
+model = get_config().model
+
+SUBAGENT_PROMPT = (
+    "You are a sub-agent working for another agent, with read-only tools. "
+    "Investigate the task below on your own, then reply with a short report: "
+    "what you found, with file paths and line numbers, and nothing else. "
+    "Your reply is all the other agent will see.\n\n"
+    "Task: {task}"
+)
+
+class SpawnAgentParams(BaseModel):
+    tasks : list[str] = Field(
+        ...,
+        min_length = 1,
+        max_length = 8,
+        description = "Self-contained instructions, one per sub-agent; all of them run at once"
+    )
+
+    max_turns : Optional[int] = Field(
+        None,
+        ge = 1,
+        le = 30,
+        description = "Requests each sub-agent may make before it has to answer"
+    )
+
+@dataclass
+class _TaskResult:
+    task : str
+    response : Optional[str] = None
+    errors : list[str] = field(default_factory = list)
+    tool_calls : int = 0
+    usage : Optional[dict[str, Any]] = None
+    duration_ms : int = 0
+
+class SpawnAgentTool(Tool):
+    name = "spawn_agent"
+
+    description = (
+        "Run sub-agents in parallel, each on its own task with a fresh, isolated conversation "
+        "and read-only tools (read_file, read_many, list_dir, glob, outline, query_data, json_query). "
+        "Only each sub-agent's final report comes back, so broad investigations do not fill "
+        "this conversation with file contents.\n"
+
+        "PARAMETERS:\n"
+        "- tasks (required): One instruction per sub-agent, at most 8\n"
+        "- max_turns (optional): Request limit per sub-agent. Default: 8\n"
+
+        "BEST PRACTICES:\n"
+        "- Give each task everything it needs; sub-agents do not see this conversation\n"
+        "- Split wide questions into independent tasks so they run concurrently\n"
+        "- Use read_file, glob and outline directly for narrow lookups"
+    )
+
+    kind = ToolKind.AGENT
+
+    schema = SpawnAgentParams
+
+    def __init__(
+        self,
+        registry : ToolRegistry,
+        client : LLMClient,
+        watcher : Optional[WorkspaceWatcher] = None,
+    ) -> None:
+        super().__init__()
+        # sub-agents reuse the parent's client (connection pool and rate
+        # limiter), watcher and tool instances (their caches)
+        self.registry = registry
+        self.client = client
+        self.watcher = watcher
+
+    async def execute(self, invocation : ToolInvocation) -> ToolResult:
+        params = SpawnAgentParams(**invocation.params)
+        config = get_config()
+        max_turns = params.max_turns or config.subagent_max_turns
+
+        results = await asyncio.gather(*(
+            self._run_task(index, task, invocation, max_turns)
+            for index, task in enumerate(params.tasks, start=1)
+        ))
+
+        # counting and cutting long reports is tokenizer work; keep it off the loop
+        sections = await asyncio.gather(*(
+            tool_runtime.run_blocking(_condense, index, result, config.subagent_result_tokens)
+            for index, result in enumerate(results, start=1)
+        ))
+
+        tasks_metadata = [
+            {
+                "task" : result.task,
+                "success" : result.response is not None,
+                "tool_calls" : result.tool_calls,
+                "duration_ms" : result.duration_ms,
+                "usage" : result.usage,
+            }
+            for result in results
+        ]
+        output = "\n\n".join(sections)
+        if not any(result.response is not None for result in results):
+            return ToolResult.error_result(
+                "No sub-agent produced a report",
+                output = output,
+                metadata = {"tasks" : tasks_metadata},
+            )
+
+        return ToolResult.success_result(
+            output,
+            metadata = {"tasks" : tasks_metadata},
+        )
+
+    async def _run_task(
+        self,
+        index : int,
+        task : str,
+        invocation : ToolInvocation,
+        max_turns : int,
+    ) -> _TaskResult:
+        from agent.agent import Agent
+        from agent.event import AgentEventType
+
+        result = _TaskResult(task)
+        start = time.perf_counter()
+        try:
+            # building the context reads the workspace; keep it off the loop
+            agent = await asyncio.to_thread(
+                Agent,
+                invocation.cwd,
+                self.client,
+                self.watcher,
+                self.registry.read_only(),
+                max_turns,
+            )
+            async with agent:
+                async for event in agent.run(SUBAGENT_PROMPT.format(task=task)):
+                    if event.type == AgentEventType.TOOL_CALL_START:
+                        result.tool_calls += 1
+                        target = event.data.get("arguments", {}).get("path", "")
+                        invocation.emit_output("stdout", f"[{index}] {event.data.get('name')} {target}".rstrip() + "\n")
+                    elif event.type == AgentEventType.AGENT_ERROR:
+                        result.errors.append(event.data.get("error") or "Unknown error")
+                    elif event.type == AgentEventType.AGENT_END:
+                        result.response = event.data.get("response")
+                        result.usage = event.data.get("usage")
+        except Exception as e:
+            logger.exception(f"Sub-agent {index} failed")
+            result.errors.append(str(e))
+
+        result.duration_ms = int((time.perf_counter() - start) * 1000)
+        invocation.emit_output("stdout", f"[{index}] done in {result.duration_ms / 1000:.1f}s\n")
+        return result
+
+def _condense(index : int, result : _TaskResult, max_tokens : int) -> str:
+    lines = result.task.strip().splitlines()
+    header = f"## Sub-agent {index}: {lines[0][:100] if lines else ''}"
+    stats = f"({result.tool_calls} tool calls, {result.duration_ms / 1000:.1f}s)"
+
+    if result.response is None:
+        error = "; ".join(result.errors) or "finished without a report"
+        return f"{header}\n{stats}\nFailed: {error}"
+
+    report = result.response
+    if count_token(report, model) > max_tokens:
+        report = truncate_text(
+            report,
+            max_tokens,
+            model,
+            suffix = "\n...[report truncated]",
+        )
+    return f"{header}\n{stats}\n{report}"
@@ -0,0 +1,76 @@
+from pydantic import BaseModel,Field
+from tools.base import Tool,ToolKind,ExecutionProfile,ToolInvocation,ToolResult
+from tools.builtin.edit import changes_result
+from utils.paths import resolve_path
+from utils.patch import FileChange,commit_changes,read_text
+
+class WriteFileParams(BaseModel):
+    path : str = Field(
+        ...,
+        description = "Path of the file to write (relative to the working directory or absolute path)"
+    )
+
+    content : str = Field(
+        ...,
+        description = "Full content of the file"
+    )
+
+class WriteFileTool(Tool):
+    name = "write_file"
+
+    description = (
+        "Create a file or overwrite it with the given content. Parent directories are created "
+        "as needed and the file is replaced atomically. "
+        "For new files only a short confirmation is returned; for existing files a unified diff "
+        "of what changed is returned.\n"
+
+        "PARAMETERS:\n"
+        "- path (required): File to write\n"
+        "- content (required): Complete new content\n"
+
+        "BEST PRACTICES:\n"
+        "- Prefer edit or apply_patch for changes to existing files\n"
+        "- Existing binary (non UTF-8) files are never overwritten"
+    )
+
+    kind = ToolKind.WRITE
+
+    profile = ExecutionProfile.BLOCKING_IO
+
+    schema = WriteFileParams
+
+    def execute_sync(self, invocation : ToolInvocation) -> ToolResult:
+        params = WriteFileParams(**invocation.params)
+        path = resolve_path(invocation.cwd, params.path)
+
+        if path.is_dir():
+            return ToolResult.error_result(f"Path is a directory: {path}")
+
+        old = None
+        if path.exists():
+            # a diff against a file that could not be read would pass the
+            # overwrite off as a creation
+            try:
+                old = read_text(path)
+            except UnicodeDecodeError:
+                return ToolResult.error_result(
+                    f"Refusing to overwrite {path}: it is binary or not UTF-8 text. "
+                    "Delete it with shell first if it really should be replaced"
+                )
+            except OSError as e:
+                return ToolResult.error_result(f"Failed to read existing file {path}: {e}")
+
+        if old == params.content:
+            return ToolResult.success_result(
+                f"{params.path} already has this content",
+                metadata = {
+                    "paths" : [str(path)],
+                },
+            )
+
+        try:
+            commit_changes([FileChange(path, old, params.content)])
+        except OSError as e:
+            return ToolResult.error_result(f"Failed to write {path}: {e}")
+
+        return changes_result([FileChange(path, old, params.content)], invocation.cwd)
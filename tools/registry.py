@@ -1,25 +1,56 @@
 from __future__ import annotations
-from tools.base import Tool,ToolResult,ToolInvocation
+from tools.base import Tool,ToolKind,ToolResult,ToolInvocation,OutputCallback
+from tools.runtime import tool_runtime
+from tools.shaping import TOOL_OUTPUT_TOKENS,fits_without_counting,shape_result,strategy_for
 from tools.builtin.read_file import ReadFileTool 
-from typing import Any
+from tools.builtin.read_many import ReadManyTool
+from tools.builtin.list_dir import ListDirTool
+from tools.builtin.glob import GlobTool
+from tools.builtin.outline import OutlineTool
+from tools.builtin.query_data import QueryDataTool
+from tools.builtin.json_query import JsonQueryTool
+from tools.builtin.shell import ShellTool
+from tools.builtin.edit import EditTool
+from tools.builtin.write_file import WriteFileTool
+from tools.builtin.apply_patch import ApplyPatchTool
+from typing import Any,Callable,Optional,TYPE_CHECKING
 from pathlib import Path
 import logging
 
+if TYPE_CHECKING:
+    from workspace.watcher import WorkspaceChange,WorkspaceWatcher
+
 logger = logging.getLogger(__name__)
 
 
 class ToolRegistry:
     def __init__(self):
         self._tools : dict[str, Tool] = {}
+        self._watcher : Optional[WorkspaceWatcher] = None
+        self._schemas : Optional[list[dict[str, Any]]] = None
+
+    def attach_watcher(self, watcher : WorkspaceWatcher) -> Callable[[], None]:
+        """Forward ``watcher`` changes to every tool; returns the unsubscribe hook."""
+        self._watcher = watcher
+        return watcher.subscribe(self.on_workspace_change)
+
+    def on_workspace_change(self, change : WorkspaceChange) -> None:
+        for tool in self._tools.values():
+            try:
+                tool.on_workspace_change(change)
+            except Exception:
+                logger.exception(f"Tool {tool.name} failed to handle workspace change")
     
     def register(self, tool : Tool) -> None:
         if tool.name in self._tools:
             logger.warning(f"Overwriting existing tool: {tool.name}")
         self._tools[tool.name] = tool
+        self._schemas = None
     
     def unregister(self, name : str) -> bool:
         if name in self._tools:
             del self._tools[name]
+            self._schemas = None
             return True
         
         return False
@@ -37,8 +68,22 @@ class ToolRegistry:
         
         return tools
     
+    def read_only(self) -> ToolRegistry:
+        """A registry of this one's READ tools, sharing the instances and their caches.
+
+        The instances stay subscribed through this registry, so the copy needs
+        no watcher of its own.
+        """
+        registry = ToolRegistry()
+        for tool in self.get_tools():
+            if tool.kind == ToolKind.READ:
+                registry.register(tool)
+        return registry
+
     def get_schemas(self) -> list[dict[str, Any]]:
-        return [tool.to_openai_schema() for tool in self.get_tools()]
+        if self._schemas is None:
+            self._schemas = [tool.to_openai_schema() for tool in self.get_tools()]
+        return self._schemas
     
     
     async def invoke(
@@ -46,14 +91,18 @@ class ToolRegistry:
         name: str,
         params: dict[str, Any],
         cwd: Path,
+        on_output: Optional[OutputCallback] = None,
+        max_tokens: Optional[int] = None,
     ) -> ToolResult:
-        
+        """Run ``name`` and shape its output to ``max_tokens`` (default TOOL_OUTPUT_TOKENS)."""
+
         tool = self.get(name)
         if tool is None:
             result = ToolResult.error_result(
                 f"Unknown tool: {name}",
                 metadata={"tool_name": name},
             )
+            return result
 
 
         validation_errors = tool.validate_params(params)
@@ -65,28 +114,62 @@ class ToolRegistry:
                     "validation_errors": validation_errors,
                 },
             )
+            return result
 
         invocation = ToolInvocation(
             cwd = cwd,
-            params=params
+            params=params,
+            on_output=on_output,
         )
         
         try:
-            result = await tool.execute(invocation)
+            result = await tool_runtime.run(tool, invocation)
         except Exception as e:
             logger.exception(f"Tool {name} raised unexpected error")
             result = ToolResult.error_result(
                 f"Internal error: {str(e)}",
                 metadata={
-                    "tool_name",
-                    name,
+                    "tool_name": name,
                 },
             )
+
+        if self._watcher and tool.is_mutating(params):
+            await self._watcher.sync(_written_paths(result, cwd))
+
+        max_tokens = max_tokens or TOOL_OUTPUT_TOKENS
+        if not fits_without_counting(result.output, max_tokens):
+            result = await tool_runtime.run_blocking(
+                shape_result, result, strategy_for(tool), max_tokens,
+            )
+
         return result
-    
+
+def _written_paths(result : ToolResult, cwd : Path) -> Optional[list[Path]]:
+    """Paths a mutating tool reported in its metadata, or None if unknown."""
+    metadata = result.metadata if isinstance(result.metadata, dict) else {}
+    paths = metadata.get("paths")
+    if paths is None and isinstance(metadata.get("path"), str):
+        paths = [metadata["path"]]
+    if paths is None:
+        return None
+
+    return [cwd / p for p in paths]
+
 def create_default_registry() -> ToolRegistry:
     registry = ToolRegistry()
-    BUILT_IN_TOOLS = [ReadFileTool]
+    BUILT_IN_TOOLS = [
+        ReadFileTool,
+        ReadManyTool,
+        ListDirTool,
+        GlobTool,
+        OutlineTool,
+        QueryDataTool,
+        JsonQueryTool,
+        ShellTool,
+        EditTool,
+        WriteFileTool,
+        ApplyPatchTool,
+    ]
 
     for tool_class in BUILT_IN_TOOLS:
         registry.register(tool_class())
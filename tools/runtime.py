@@ -0,0 +1,209 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor,ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
+from tools.base import ExecutionProfile,Tool,ToolInvocation,ToolResult,OutputCallback
+from utils.config import get_config
+from typing import Any,Callable,Iterable,Optional
+import asyncio
+import logging
+import multiprocessing
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+IO_WORKERS = get_config().tool_io_workers
+CPU_WORKERS = get_config().tool_cpu_workers
+
+
+def _execute_in_process(tool : Tool, invocation : ToolInvocation) -> ToolResult:
+    return tool.execute_sync(invocation)
+
+
+def _threadsafe_output(
+    loop : asyncio.AbstractEventLoop,
+    on_output : Optional[OutputCallback],
+) -> Optional[OutputCallback]:
+    if on_output is None:
+        return None
+
+    def emit(stream : str, content : str) -> None:
+        loop.call_soon_threadsafe(on_output, stream, content)
+
+    return emit
+
+
+def _mp_context() -> multiprocessing.context.BaseContext:
+    # fork would copy the watcher and pool threads' locks into the child;
+    # forkserver gives clean workers without spawn's cost per worker
+    return multiprocessing.get_context("forkserver" if sys.platform.startswith("linux") else "spawn")
+
+
+def _terminate(pool : ProcessPoolExecutor) -> None:
+    # ProcessPoolExecutor cannot stop a task that is already running,
+    # so the only way to abandon one is to kill the workers.
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait = False, cancel_futures = True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+class ToolRuntime:
+    """Runs tools according to their ``ExecutionProfile``.
+
+    Blocking tools share one bounded thread pool so a burst of tool calls
+    cannot pile up threads. Threads cannot be interrupted, so a cancelled
+    thread run sets ``invocation.cancel_event`` and is left to finish on its
+    own.
+
+    A CPU-bound tool call runs in a single-worker process of its own, kept
+    warm for the next call afterwards, so a call that times out or is
+    cancelled is stopped by terminating just that worker. ``map_cpu`` uses a
+    separate shared pool that cancellation never touches. Both start their
+    processes the first time they are needed.
+    """
+
+    def __init__(self, io_workers : int = IO_WORKERS, cpu_workers : int = CPU_WORKERS) -> None:
+        self.io_workers = max(1, io_workers)
+        self.cpu_workers = max(1, cpu_workers)
+        self._thread_pool : Optional[ThreadPoolExecutor] = None
+        self._process_pool : Optional[ProcessPoolExecutor] = None
+        self._idle_workers : list[ProcessPoolExecutor] = []
+        self._lock = threading.Lock()
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers = self.io_workers,
+                    thread_name_prefix = "tool-io",
+                )
+            return self._thread_pool
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers = self.cpu_workers,
+                    mp_context = _mp_context(),
+                )
+            return self._process_pool
+
+    def _acquire_worker(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._idle_workers:
+                return self._idle_workers.pop()
+        return ProcessPoolExecutor(max_workers = 1, mp_context = _mp_context())
+
+    def _release_worker(self, worker : ProcessPoolExecutor) -> None:
+        with self._lock:
+            if len(self._idle_workers) < self.cpu_workers:
+                self._idle_workers.append(worker)
+                return
+        worker.shutdown(wait = False)
+
+    async def run(self, tool : Tool, invocation : ToolInvocation) -> ToolResult:
+        if tool.profile == ExecutionProfile.BLOCKING_IO:
+            running = self._run_in_thread(tool, invocation)
+        elif tool.profile == ExecutionProfile.CPU_BOUND:
+            running = self._run_in_process(tool, invocation)
+        else:
+            running = tool.execute(invocation)
+
+        if tool.timeout is None:
+            return await running
+
+        try:
+            return await asyncio.wait_for(running, tool.timeout)
+        except asyncio.TimeoutError:
+            return ToolResult.error_result(
+                f"Tool {tool.name} timed out after {tool.timeout:g}s",
+                metadata = {
+                    "tool_name" : tool.name,
+                    "timeout" : tool.timeout,
+                },
+            )
+
+    async def _run_in_thread(self, tool : Tool, invocation : ToolInvocation) -> ToolResult:
+        loop = asyncio.get_running_loop()
+        invocation = replace(
+            invocation,
+            on_output = _threadsafe_output(loop, invocation.on_output),
+            cancel_event = invocation.cancel_event or threading.Event(),
+        )
+
+        try:
+            return await loop.run_in_executor(self.thread_pool, tool.execute_sync, invocation)
+        except asyncio.CancelledError:
+            invocation.cancel_event.set()
+            raise
+
+    async def _run_in_process(self, tool : Tool, invocation : ToolInvocation) -> ToolResult:
+        loop = asyncio.get_running_loop()
+        worker = self._acquire_worker()
+        invocation = replace(invocation, on_output = None, cancel_event = None)
+
+        reusable = False
+        try:
+            result = await loop.run_in_executor(worker, _execute_in_process, tool, invocation)
+            reusable = True
+            return result
+        except BrokenProcessPool:
+            return ToolResult.error_result(
+                f"Tool {tool.name} worker process died",
+                metadata = {
+                    "tool_name" : tool.name,
+                },
+            )
+        except Exception:
+            # raised by the tool itself; the worker is fine
+            reusable = True
+            raise
+        finally:
+            if reusable:
+                self._release_worker(worker)
+            else:
+                _terminate(worker)
+
+    async def run_blocking(self, fn : Callable[..., Any], *args : Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, fn, *args)
+
+    def map_cpu(self, fn : Callable[..., Any], *iterables : Iterable[Any], chunksize : int = 1) -> list[Any]:
+        """``map`` over the process pool, for blocking tools with a CPU-heavy inner loop.
+
+        Meant to be called from a worker thread; ``fn`` must be a module-level
+        function. Falls back to an in-thread ``map`` when the pool is unusable.
+        """
+        pool = self.process_pool
+        try:
+            return list(pool.map(fn, *iterables, chunksize = chunksize))
+        except (BrokenProcessPool, RuntimeError, OSError) as e:
+            logger.warning(f"Process pool unavailable, running in thread: {e}")
+            self._reset_process_pool(pool)
+            return list(map(fn, *iterables))
+
+    def _reset_process_pool(self, pool : ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._process_pool is pool:
+                self._process_pool = None
+        _terminate(pool)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            thread_pool, self._thread_pool = self._thread_pool, None
+            process_pool = self._process_pool
+            workers, self._idle_workers = self._idle_workers, []
+        if thread_pool is not None:
+            thread_pool.shutdown(wait = False, cancel_futures = True)
+        if process_pool is not None:
+            self._reset_process_pool(process_pool)
+        for worker in workers:
+            _terminate(worker)
+
+
+tool_runtime = ToolRuntime()
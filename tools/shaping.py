@@ -0,0 +1,105 @@
+from __future__ import annotations
+from dataclasses import replace
+from tools.base import OutputStrategy,Tool,ToolKind,ToolResult
+from utils.tokens import get_token_counter
+from typing import Optional
+from utils.config import get_config
+
+model = get_config().model
+
+TOOL_OUTPUT_TOKENS = get_config().tool_output_tokens
+MIN_OUTPUT_TOKENS = 1000
+MARKER_TOKENS = 48
+
+STRATEGY_BY_KIND = {
+    ToolKind.READ : OutputStrategy.HEAD,
+    ToolKind.WRITE : OutputStrategy.HEAD,
+    ToolKind.SHELL : OutputStrategy.MIDDLE,
+    ToolKind.NETWORK : OutputStrategy.HEAD,
+    ToolKind.MEMORY : OutputStrategy.TAIL,
+    ToolKind.MCP : OutputStrategy.MIDDLE,
+    ToolKind.AGENT : OutputStrategy.HEAD,
+}
+
+
+def output_budget(remaining_tokens : Optional[int], pending_calls : int = 1) -> int:
+    """Tokens one tool result may take: an even share of what is left of the
+    context window, capped at TOOL_OUTPUT_TOKENS."""
+    if remaining_tokens is None:
+        return TOOL_OUTPUT_TOKENS
+
+    share = remaining_tokens // max(1, pending_calls)
+    return max(MIN_OUTPUT_TOKENS, min(TOOL_OUTPUT_TOKENS, share))
+
+
+def strategy_for(tool : Tool) -> OutputStrategy:
+    return tool.output_strategy or STRATEGY_BY_KIND.get(tool.kind, OutputStrategy.HEAD)
+
+
+def fits_without_counting(text : str, max_tokens : int) -> bool:
+    # a token is never shorter than one UTF-8 byte, i.e. a quarter character
+    return len(text) * 4 <= max_tokens
+
+
+def shape_result(result : ToolResult, strategy : OutputStrategy, max_tokens : int) -> ToolResult:
+    """Cut ``result.output`` down to ``max_tokens``.
+
+    Once the model's exact tokenizer is loaded the text is encoded once and
+    the kept spans are decoded from that token list; otherwise it is cut by
+    characters at the calibrated chars-per-token ratio. Spans are trimmed to
+    whole lines, an elision marker says how much was dropped, and the
+    original size goes into the result's metadata.
+    """
+    text = result.output
+    if not text or fits_without_counting(text, max_tokens):
+        return result
+
+    counter = get_token_counter(model)
+    encoder = counter.encoder()
+    if encoder is not None:
+        units, decode, scale = encoder.encode_ordinary(text), encoder.decode, 1.0
+        total = len(units)
+    else:
+        # no exact tokenizer (yet): cut by characters at the calibrated ratio
+        units, decode, scale = text, str, counter.chars_per_token
+        total = counter.estimate(text)
+
+    if total <= max_tokens:
+        return result
+
+    keep = int(max(1, max_tokens - MARKER_TOKENS) * scale)
+    if strategy == OutputStrategy.HEAD:
+        head, tail = _head(decode(units[:keep])), ""
+    elif strategy == OutputStrategy.TAIL:
+        head, tail = "", _tail(decode(units[-keep:]))
+    else:
+        head = _head(decode(units[: keep // 2]))
+        tail = _tail(decode(units[-(keep - keep // 2) :]))
+
+    total_lines = text.count("\n") + 1
+    kept_lines = (head.count("\n") + 1 if head else 0) + (tail.count("\n") + 1 if tail else 0)
+    marker = (
+        f"...[{total_lines - kept_lines} of {total_lines} lines elided, "
+        f"output was {total} tokens; narrow the request to see more]..."
+    )
+    output = "\n".join(part for part in (head, marker, tail) if part)
+
+    metadata = dict(result.metadata) if isinstance(result.metadata, dict) else {}
+    metadata.update({
+        "original_tokens" : total,
+        "original_chars" : len(text),
+        "output_budget" : max_tokens,
+    })
+    return replace(result, output = output, truncated = True, metadata = metadata)
+
+
+def _head(text : str) -> str:
+    """Drop the partial line a token cut leaves at the end."""
+    cut = text.rfind("\n")
+    return text[:cut] if cut > len(text) // 2 else text
+
+
+def _tail(text : str) -> str:
+    """Drop the partial line a token cut leaves at the start."""
+    cut = text.find("\n")
+    return text[cut + 1 :] if -1 < cut < len(text) // 2 else text
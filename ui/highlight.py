@@ -0,0 +1,81 @@
+from __future__ import annotations
+from collections import OrderedDict
+from rich.console import Console,ConsoleOptions,RenderResult
+from rich.segment import Segment
+from rich.syntax import Syntax
+from typing import Optional
+import threading
+
+MAX_ENTRIES = 64
+
+
+class RenderedLines:
+    """Segments rendered ahead of time; printing them does no highlighting."""
+
+    def __init__(self, lines : list[list[Segment]]) -> None:
+        self.lines = lines
+
+    def __rich_console__(self, console : Console, options : ConsoleOptions) -> RenderResult:
+        newline = Segment.line()
+        for line in self.lines:
+            yield from line
+            yield newline
+
+
+class HighlightCache:
+    """Highlighted code keyed by (path, line range, lexer, width, content).
+
+    Lexing and rendering a few thousand lines takes pygments seconds; the
+    result is kept so the same view (a re-read, or /expand after the
+    collapsed panel) costs nothing the second time. Safe to use from worker
+    threads.
+    """
+
+    def __init__(self, max_entries : int = MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries : OrderedDict[tuple, RenderedLines] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(
+        self,
+        console : Console,
+        code : str,
+        lexer : str,
+        width : int,
+        start_line : int = 1,
+        line_numbers : bool = True,
+        path : Optional[str] = None,
+    ) -> RenderedLines:
+        end_line = start_line + code.count("\n")
+        key = (path, start_line, end_line, lexer, line_numbers, width, hash(code))
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                return cached
+
+        syntax = Syntax(
+            code,
+            lexer,
+            theme="monokai",
+            line_numbers=line_numbers,
+            start_line=start_line,
+            word_wrap=False,
+        )
+        rendered = RenderedLines(console.render_lines(syntax, console.options.update(width=width), pad=False))
+
+        with self._lock:
+            self._entries[key] = rendered
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+highlight_cache = HighlightCache()
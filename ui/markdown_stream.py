@@ -0,0 +1,130 @@
+from __future__ import annotations
+from rich.console import Console,ConsoleOptions,RenderResult
+from rich.live import Live
+from rich.markdown import Markdown
+from typing import Optional
+import threading
+
+FENCES = ("```", "~~~")
+# the live tail shows at most this many trailing lines; the whole block is
+# printed once it is finished
+MAX_TAIL_LINES = 40
+
+
+def scan_blocks(
+    text : str,
+    start : int = 0,
+    fence : Optional[str] = None,
+) -> tuple[int, int, Optional[str]]:
+    """Scan the complete lines of ``text`` from ``start``, inside ``fence`` if given.
+
+    Returns the end of the last finished block (0 if none), the position up
+    to which lines were scanned and the opening line of the fence still open
+    there, so the next call only looks at new lines. A block is finished
+    once a blank line follows it outside a code fence, or once its closing
+    fence has arrived. Finished blocks cannot change as more text streams
+    in, so they are rendered once.
+    """
+    boundary = 0
+    position = start
+    while (end := text.find("\n", position)) != -1:
+        stripped = text[position:end].strip()
+        position = end + 1
+        if fence:
+            if stripped.startswith(fence[:3]) and stripped.strip(fence[0]) == "":
+                fence = None
+                boundary = position
+        elif stripped.startswith(FENCES):
+            fence = stripped
+        elif not stripped:
+            boundary = position
+    return boundary, position, fence
+
+
+def split_complete_blocks(text : str) -> tuple[str, str]:
+    """Split streamed markdown into finished blocks and the unfinished tail."""
+    boundary, _, _ = scan_blocks(text)
+    return text[:boundary], text[boundary:]
+
+
+class _Tail:
+    """Live renderable for the unfinished block, parsed at most once per frame.
+
+    Only the last ``MAX_TAIL_LINES`` lines are parsed, so a long code fence
+    costs the same per frame however far it has grown.
+    """
+
+    def __init__(self, code_theme : str) -> None:
+        self.code_theme = code_theme
+        self.text = ""
+        self.fence : Optional[str] = None
+        self._markdown : Optional[Markdown] = None
+        self._lock = threading.Lock()
+
+    def set(self, text : str, fence : Optional[str]) -> None:
+        with self._lock:
+            self.text = text
+            self.fence = fence
+            self._markdown = None
+
+    def _view(self) -> str:
+        lines = self.text.rsplit("\n", MAX_TAIL_LINES)
+        if len(lines) <= MAX_TAIL_LINES:
+            return self.text
+        view = "\n".join(lines[1:])
+        # reopen the fence the cut dropped so the lines still render as code
+        return f"{self.fence}\n{view}" if self.fence else view
+
+    def __rich_console__(self, console : Console, options : ConsoleOptions) -> RenderResult:
+        # runs on Live's refresh thread, not per delta
+        with self._lock:
+            if self._markdown is None:
+                self._markdown = Markdown(self._view(), code_theme=self.code_theme)
+            markdown = self._markdown
+        yield markdown
+
+
+class MarkdownStream:
+    """Incremental markdown for streamed assistant text.
+
+    Finished blocks are printed above the live region once; only the tail
+    of the trailing unfinished block is re-parsed, and only when Live
+    redraws it, at most ``fps`` times a second. Lines are scanned for block
+    boundaries once each, so per-delta and per-frame cost stay bounded
+    rather than growing with every token.
+    """
+
+    def __init__(self, console : Console, fps : float = 10, code_theme : str = "monokai") -> None:
+        self.console = console
+        self.code_theme = code_theme
+        self._pending = ""
+        self._scanned = 0
+        self._fence : Optional[str] = None
+        self._tail = _Tail(code_theme)
+        self._live = Live(
+            self._tail,
+            console=console,
+            auto_refresh=True,
+            refresh_per_second=fps,
+            transient=True,
+        )
+        self._live.start()
+
+    def feed(self, content : str) -> None:
+        self._pending += content
+        if "\n" in content:
+            boundary, self._scanned, self._fence = scan_blocks(self._pending, self._scanned, self._fence)
+            if boundary:
+                complete, self._pending = self._pending[:boundary], self._pending[boundary:]
+                self._scanned -= boundary
+                if complete.strip():
+                    self._live.console.print(Markdown(complete, code_theme=self.code_theme))
+        self._tail.set(self._pending, self._fence)
+
+    def close(self) -> None:
+        self._live.stop()
+        if self._pending.strip():
+            self.console.print(Markdown(self._pending, code_theme=self.code_theme))
+        self._pending = ""
+        self._scanned = 0
+        self._fence = None
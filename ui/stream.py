@@ -0,0 +1,74 @@
+"""Plain renderers for ``--output jsonl`` and ``--output text``.
+
+Neither imports rich: they are meant for pipes and CI, where panels and
+syntax highlighting are wasted work and get in the way of parsing.
+"""
+from __future__ import annotations
+from typing import BinaryIO,Optional,TextIO
+from agent.event import AgentEvent,AgentEventType
+import json
+import sys
+
+
+class JsonlRenderer:
+    """One compact JSON object per AgentEvent, newline terminated.
+
+    Lines go through a private buffer that is flushed once it passes
+    ``buffer_size`` bytes or when a non-delta event arrives, so a stream of
+    text deltas costs a handful of writes while consumers still see tool
+    calls and the end of a run as they happen.
+    """
+
+    def __init__(self, stream : Optional[BinaryIO] = None, buffer_size : int = 64 * 1024) -> None:
+        self.stream = stream or sys.stdout.buffer
+        self.buffer_size = buffer_size
+        self._buffer = bytearray()
+        self._encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=str)
+
+    def render(self, event : AgentEvent) -> None:
+        self._buffer += self._encoder.encode(event.to_dict()).encode()
+        self._buffer += b"\n"
+        if len(self._buffer) >= self.buffer_size or event.type not in (
+            AgentEventType.TEXT_DELTA,
+            AgentEventType.TOOL_CALL_OUTPUT_DELTA,
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self.stream.write(self._buffer)
+            self._buffer.clear()
+        self.stream.flush()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class TextRenderer:
+    """Only the final answer on stdout; errors go to stderr."""
+
+    def __init__(self, stream : Optional[TextIO] = None, errors : Optional[TextIO] = None) -> None:
+        self.stream = stream or sys.stdout
+        self.errors = errors or sys.stderr
+        self._response : Optional[str] = None
+
+    def render(self, event : AgentEvent) -> None:
+        if event.type == AgentEventType.AGENT_END:
+            self._response = event.data.get("response")
+        elif event.type == AgentEventType.AGENT_ERROR:
+            print(f"Error: {event.data.get('error')}", file=self.errors)
+
+    def close(self) -> None:
+        if self._response is not None:
+            self.stream.write(self._response)
+            if not self._response.endswith("\n"):
+                self.stream.write("\n")
+        self.stream.flush()
+
+
+def get_renderer(output : str) -> JsonlRenderer | TextRenderer:
+    if output == "jsonl":
+        return JsonlRenderer()
+    if output == "text":
+        return TextRenderer()
+    raise ValueError(f"No plain renderer for output format: {output}")
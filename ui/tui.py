@@ -5,16 +5,20 @@ from rich.text import Text
 from rich.panel import Panel
 from rich.table import Table
 from rich import box
-from rich.syntax import Syntax
 from rich.console import Group
 
-from typing import Optional,Any
+from collections import OrderedDict
+from typing import Optional,Any,NamedTuple
 from pathlib import Path
-from utils.paths import display_path_rel_to_cwd
-from utils.text import truncate_text
+from ui.highlight import RenderedLines,highlight_cache
+from ui.markdown_stream import MarkdownStream
+from utils.config import get_config
+from utils.paths import display_path_rel_to_cwd,guess_language
 
 import re
 
+_READ_FILE_HEADER = re.compile(r"^Showing lines [^\n]*\n\n")
+
 AGENT_THEME = Theme(
     {
         # General
@@ -37,6 +41,7 @@ AGENT_THEME = Theme(
         "tool.network": "bright_blue",
         "tool.memory": "green",
         "tool.mcp": "bright_cyan",
+        "tool.agent": "bright_green",
         # Code / blocks
         "code": "white",
     }
@@ -44,6 +49,16 @@ AGENT_THEME = Theme(
 
 _console : Optional[Console] = None
 
+
+class _CodeView(NamedTuple):
+    """Everything needed to re-render a collapsed code block in full."""
+    title : Text
+    path : Optional[str]
+    code : str
+    language : str
+    start_line : int
+    line_numbers : bool
+
 def get_console() -> Console:
     global _console
     if _console is None:
@@ -52,29 +67,72 @@ def get_console() -> Console:
     return _console
 
 class TUI:
+    MAX_LIVE_OUTPUT_CHARS = 32 * 1024
+    STREAM_FPS = 10
+    # collapsed outputs kept for /expand; each holds the full tool output
+    MAX_EXPANDABLE = 8
 
     def __init__(self, console : Optional[Console]) -> None:
         self.console = console or get_console()
         self._assistant_stream_open = False
+        self._markdown_stream : Optional[MarkdownStream] = None
         self._tool_args_by_call_id : dict[str, dict[str, Any]] = {}
+        self._live_output_chars : dict[str, int] = {}
+        self._expandable : OrderedDict[str, _CodeView] = OrderedDict()
+        config = get_config()
+        self.viewport_head = max(1, config.tui_viewport_head)
+        self.viewport_tail = max(0, config.tui_viewport_tail)
         self.cwd = Path.cwd()
 
+    def memory_usage(self) -> dict[str, int]:
+        """Per-call state still held, for /memory."""
+        return {
+            "pending_tool_calls" : len(self._tool_args_by_call_id),
+            "live_output_streams" : len(self._live_output_chars),
+            "expandable_outputs" : len(self._expandable),
+            "highlight_cache_entries" : len(highlight_cache),
+        }
+
     def begin_assistant(self) -> None:
+        self._close_markdown_stream()  # a stream left open by an interrupted turn
         self.console.print()
         self.console.print(Rule(Text("Assistant", style="assistant")))
         self._assistant_stream_open = True
+        if self.console.is_terminal:
+            self._markdown_stream = MarkdownStream(self.console, self.STREAM_FPS)
     
     def end_assistant(self) -> None:
-        if self._assistant_stream_open:
-            self.console.print()
+        if self._markdown_stream:
+            self._close_markdown_stream()
+        elif self._assistant_stream_open:
+            self.console.file.write("\n")
+            self.console.file.flush()
         self._assistant_stream_open = False
 
     def stream_assistant_delta(self, content : str) -> None:
-        self.console.print(content, end="", markup=False)
+        if self._markdown_stream:
+            self._markdown_stream.feed(content)
+        else:
+            # not a terminal: pass the text through untouched
+            self.console.file.write(content)
+
+    def _close_markdown_stream(self) -> None:
+        if self._markdown_stream:
+            self._markdown_stream.close()
+            self._markdown_stream = None
     
     def _ordered_args(self, tool_name: str, args: dict[str, Any]) -> list[tuple]:
         _PREFERRED_ORDER = {
             "read_file": ["path", "offset", "limit"],
+            "list_dir": ["path", "depth", "max_entries"],
+            "glob": ["pattern", "path", "include_dirs", "max_results"],
+            "outline": ["path", "pattern", "max_files"],
+            "query_data": ["files", "query", "limit", "timeout"],
+            "json_query": ["path", "selector", "mode", "max_matches", "max_depth"],
+            "shell": ["command", "cwd", "timeout"],
+            "write_file": ["path", "content"],
+            "read_many": ["files", "max_tokens"],
+            "spawn_agent": ["tasks", "max_turns"],
         }
 
         preferred = _PREFERRED_ORDER.get(tool_name, [])
@@ -101,62 +159,102 @@ class TUI:
 
         return table
 
-    def _extract_read_file_code(self, text: str) -> Optional[tuple[int,str]]:
+    def _extract_read_file_code(self, text: str) -> Optional[tuple[int,str,str]]:
+        """Start line, code and any trailing note (e.g. the shaper's elision marker)."""
         body = text
-        header_match = re.match(r"^Showing lines (\d+)-(\d+) of (\d+)\n\n", text)
+        header_match = _READ_FILE_HEADER.match(text)
 
         if header_match:
             body = text[header_match.end() :]
 
         code_lines: list[str] = []
         start_line: int | None = None
-
-        for line in body.splitlines():
-            m = re.match(r"^\s*(\d+)\|(.*)$", line)
-            if not m:
-                return None
-            line_no = int(m.group(1))
+        lines = body.splitlines()
+        trailer = ""
+
+        # "   12|code": split on the first bar rather than a regex per line
+        for index, line in enumerate(lines):
+            number, bar, code = line.partition("|")
+            number = number.strip()
+            if not bar or not number.isdigit():
+                # the first unnumbered line starts a note appended after the code
+                trailer = "\n".join(lines[index:]).strip()
+                break
             if start_line is None:
-                start_line = line_no
-            code_lines.append(m.group(2))
+                start_line = int(number)
+            code_lines.append(code)
 
         if start_line is None:
             return None
 
-        return start_line, "\n".join(code_lines)
+        return start_line, "\n".join(code_lines), trailer
 
     def _guess_language(self, path: Optional[str]) -> str:
-        if not path:
-            return "text"
-        suffix = Path(path).suffix.lower()
-        return {
-            ".py": "python",
-            ".js": "javascript",
-            ".jsx": "jsx",
-            ".ts": "typescript",
-            ".tsx": "tsx",
-            ".json": "json",
-            ".toml": "toml",
-            ".yaml": "yaml",
-            ".yml": "yaml",
-            ".md": "markdown",
-            ".sh": "bash",
-            ".bash": "bash",
-            ".zsh": "bash",
-            ".rs": "rust",
-            ".go": "go",
-            ".java": "java",
-            ".kt": "kotlin",
-            ".swift": "swift",
-            ".c": "c",
-            ".h": "c",
-            ".cpp": "cpp",
-            ".hpp": "cpp",
-            ".css": "css",
-            ".html": "html",
-            ".xml": "xml",
-            ".sql": "sql",
-        }.get(suffix, "text")
+        return guess_language(path)
+
+    def _code_width(self) -> int:
+        # inside a panel: two border columns and two columns of padding each side
+        return max(20, self.console.width - 6)
+
+    def _highlight(self, view : _CodeView, code : str, start_line : int) -> RenderedLines:
+        return highlight_cache.render(
+            self.console,
+            code,
+            view.language,
+            self._code_width(),
+            start_line=start_line,
+            line_numbers=view.line_numbers,
+            path=view.path,
+        )
+
+    def _code_viewport(self, call_id : str, view : _CodeView) -> list:
+        """Highlight the first and last lines of a long block, not all of it.
+
+        Lexing is the slow part of a panel, and costs per line shown. Blocks
+        longer than the viewport are remembered (the most recent
+        ``MAX_EXPANDABLE``) so ``build_expanded`` can render them in full.
+        """
+        lines = view.code.split("\n")
+        head, tail = self.viewport_head, self.viewport_tail
+        if len(lines) <= head + tail:
+            return [self._highlight(view, view.code, view.start_line)]
+
+        self._expandable[call_id] = view
+        self._expandable.move_to_end(call_id)
+        while len(self._expandable) > self.MAX_EXPANDABLE:
+            self._expandable.popitem(last=False)
+
+        hidden = len(lines) - head - tail
+        blocks = [
+            self._highlight(view, "\n".join(lines[:head]), view.start_line),
+            Text(f"… {hidden} more lines · /expand {call_id}", style="muted"),
+        ]
+        if tail:
+            blocks.append(self._highlight(view, "\n".join(lines[-tail:]), view.start_line + len(lines) - tail))
+        return blocks
+
+    def build_expanded(self, call_id : Optional[str] = None) -> Optional[Panel]:
+        """The full output of a collapsed block, the latest one by default."""
+        if call_id is None:
+            if not self._expandable:
+                return None
+            call_id = next(reversed(self._expandable))
+        view = self._expandable.get(call_id.lstrip("#"))
+        if view is None:
+            return None
+
+        return Panel(
+            self._highlight(view, view.code, view.start_line),
+            title=view.title,
+            title_align="left",
+            border_style="border",
+            box=box.ROUNDED,
+            padding=(1, 2),
+        )
+
+    def print_renderable(self, renderable : Any) -> None:
+        self.console.print()
+        self.console.print(renderable)
     
     def print_welcome(self, title: str, lines: list[str]) -> None:
         body = "\n".join(lines)
@@ -216,6 +314,24 @@ class TUI:
         self.console.print()
         self.console.print(panel)
 
+    def tool_call_output_delta(self, call_id : str, stream : str, content : str) -> None:
+        shown = self._live_output_chars.get(call_id, 0)
+        if shown >= self.MAX_LIVE_OUTPUT_CHARS:
+            return
+
+        content = content[: self.MAX_LIVE_OUTPUT_CHARS - shown]
+        shown += len(content)
+        self._live_output_chars[call_id] = shown
+
+        self.console.print(
+            content,
+            end="",
+            markup=False,
+            style="warning" if stream == "stderr" else "muted",
+        )
+        if shown >= self.MAX_LIVE_OUTPUT_CHARS:
+            self.console.print("\n[dim]... live output limited, command still running[/dim]")
+
     def tool_call_complete(
             self, 
             call_id : str, 
@@ -227,6 +343,30 @@ class TUI:
             metadata : Optional[dict[str, Any]],
             truncated : bool,
         ) -> None:
+        self.print_renderable(
+            self.build_tool_call_complete(call_id, name, tool_kind, success, output, error, metadata, truncated)
+        )
+
+    def build_tool_call_complete(
+            self, 
+            call_id : str, 
+            name : str, 
+            tool_kind : Optional[str],
+            success : bool,
+            output : str,
+            error : Optional[str],
+            metadata : Optional[dict[str, Any]],
+            truncated : bool,
+        ) -> Panel:
+        """The finished-call panel, highlighted ahead of printing.
+
+        Does no I/O, so it can run in a worker thread while the event loop
+        carries on with the next request.
+        """
+
+        # per-call state is only needed while the call is running
+        self._tool_args_by_call_id.pop(call_id, None)
+        self._live_output_chars.pop(call_id, None)
 
         border_style = f"tool.{tool_kind}" if tool_kind else "tool"
         status_icon = "✓" if success else "✗"
@@ -245,8 +385,9 @@ class TUI:
             primary_path = metadata.get("path")
 
         if name == "read_file" and success:
-            if primary_path:
-                start_line, code = self._extract_read_file_code(output)
+            extracted = self._extract_read_file_code(output) if primary_path else None
+            if extracted:
+                start_line, code, trailer = extracted
 
                 shown_start = metadata.get("shown_start")
                 shown_end = metadata.get("shown_end")
@@ -263,35 +404,42 @@ class TUI:
 
                 header = "".join(header_parts)
                 blocks.append(Text(header, style="muted"))
-                blocks.append(
-                    Syntax(
-                        code,
-                        pl,
-                        theme="monokai",
-                        line_numbers=True,
-                        start_line=start_line,
-                        word_wrap=False,
-                    )
+                blocks.extend(
+                    self._code_viewport(call_id, _CodeView(title, primary_path, code, pl, start_line, True))
                 )
+                if trailer:
+                    blocks.append(Text(trailer, style="muted"))
             else:
-                output_display = truncate_text(
-                    output,
-                    "",
-                    240,
-                )
-                blocks.append(
-                    Syntax(
-                        output_display,
-                        "text",
-                        theme="monokai",
-                        word_wrap=False,
-                    )
+                blocks.extend(
+                    self._code_viewport(call_id, _CodeView(title, None, output, "text", 1, False))
                 )
+        elif name in ("list_dir", "glob", "outline", "query_data", "json_query") and success:
+            blocks.extend(
+                self._code_viewport(call_id, _CodeView(title, None, output, "text", 1, False))
+            )
+        elif name == "read_many":
+            headers = [
+                line[4:-4] for line in output.splitlines() if line.startswith("==> ")
+            ]
+            blocks.append(Text("\n".join(headers), style="muted"))
+        elif name == "spawn_agent":
+            blocks.append(Text(output, style="code"))
+        elif name in ("edit", "write_file", "apply_patch") and success:
+            blocks.extend(
+                self._code_viewport(call_id, _CodeView(title, primary_path, output, "diff", 1, False))
+            )
+        elif name == "shell" and isinstance(metadata, dict):
+            status = f"exit code {metadata.get('exit_code')}"
+            if metadata.get("timed_out"):
+                status = "timed out"
+            blocks.append(Text(status, style="muted"))
+            if error:
+                blocks.append(Text(error, style="error"))
 
         if truncated:
             blocks.append(Text('tool output was truncated', style='warning'))
 
-        panel = Panel(
+        return Panel(
                 Group(*blocks),
                 title=title,
                 title_align="left",
@@ -300,5 +448,3 @@ class TUI:
                 box=box.ROUNDED,
                 padding=(1, 2),
         )
-        self.console.print()
-        self.console.print(panel)
\ No newline at end of file
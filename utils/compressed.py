@@ -0,0 +1,343 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Iterator, Optional
+import bisect
+import bz2
+import lzma
+import tarfile
+import threading
+import zipfile
+import zlib
+
+GZIP = "gzip"
+BZIP2 = "bzip2"
+XZ = "xz"
+ZIP = "zip"
+TAR = "tar"
+
+ARCHIVE_SEPARATOR = "!"
+
+_MAGIC = (
+    (b"\x1f\x8b", GZIP),
+    (b"BZh", BZIP2),
+    (b"\xfd7zXZ\x00", XZ),
+    (b"PK\x03\x04", ZIP),
+    (b"PK\x05\x06", ZIP),
+)
+_TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+READ_SIZE = 256 * 1024
+CHECKPOINT_INTERVAL = 4 * 1024 * 1024
+MAX_INDEXED_FILES = 8
+BINARY_SNIFF_BYTES = 8192
+# longer lines are cut here, so newline-free content is never held whole
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class ArchiveError(Exception):
+    pass
+
+
+_DECOMPRESS_ERRORS = (OSError, EOFError, zlib.error, lzma.LZMAError, zipfile.BadZipFile, tarfile.TarError)
+
+
+def detect_compression(path : Path) -> Optional[str]:
+    """Identify gzip, bzip2, xz and zip files by their magic bytes."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(8)
+    except OSError:
+        return None
+
+    if is_tar(path):
+        return TAR
+    for magic, name in _MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def is_tar(path : Path) -> bool:
+    return path.name.lower().endswith(_TAR_SUFFIXES)
+
+
+def split_archive_path(path : Path) -> tuple[Path, Optional[str]]:
+    """Split ``archive.zip!inner/file`` into the archive and member path.
+
+    The split only happens when the full path does not exist and the part
+    before the separator is an existing file.
+    """
+    text = str(path)
+    if ARCHIVE_SEPARATOR not in text or path.exists():
+        return path, None
+
+    index = text.find(ARCHIVE_SEPARATOR)
+    while index != -1:
+        archive = Path(text[:index])
+        if archive.is_file():
+            return archive, text[index + 1 :].lstrip("/")
+        index = text.find(ARCHIVE_SEPARATOR, index + 1)
+
+    return path, None
+
+
+@dataclass
+class MemberInfo:
+    name : str
+    size : int
+
+
+def list_members(path : Path, kind : str) -> list[MemberInfo]:
+    try:
+        if kind == ZIP:
+            with zipfile.ZipFile(path) as archive:
+                return [
+                    MemberInfo(info.filename, info.file_size)
+                    for info in archive.infolist()
+                    if not info.is_dir()
+                ]
+
+        with tarfile.open(path, "r:*") as archive:
+            return [
+                MemberInfo(info.name, info.size)
+                for info in archive
+                if info.isfile()
+            ]
+    except _DECOMPRESS_ERRORS as e:
+        raise ArchiveError(f"Failed to read {path.name}: {e}") from None
+
+
+@dataclass
+class _Checkpoint:
+    line : int
+    raw_offset : int
+    decompressor : "zlib._Decompress"
+    pending : bytes
+    skipping : bool = False
+
+
+@dataclass
+class _GzipIndex:
+    identity : tuple[int, int, int, int]
+    lines : list[int] = field(default_factory=list)
+    checkpoints : list[_Checkpoint] = field(default_factory=list)
+
+    def nearest(self, line : int) -> Optional[_Checkpoint]:
+        position = bisect.bisect_right(self.lines, line) - 1
+        return self.checkpoints[position] if position >= 0 else None
+
+    def add(self, checkpoint : _Checkpoint) -> None:
+        position = bisect.bisect_left(self.lines, checkpoint.line)
+        if position < len(self.lines) and self.lines[position] == checkpoint.line:
+            return
+        self.lines.insert(position, checkpoint.line)
+        self.checkpoints.insert(position, checkpoint)
+
+
+_indexes : OrderedDict[str, _GzipIndex] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _gzip_index(path : Path) -> _GzipIndex:
+    st = path.stat()
+    identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    key = str(path.resolve())
+
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or index.identity != identity:
+            index = _indexes[key] = _GzipIndex(identity)
+        _indexes.move_to_end(key)
+        while len(_indexes) > MAX_INDEXED_FILES:
+            _indexes.popitem(last=False)
+        return index
+
+
+def _gzip_lines(path : Path, first_line : int) -> Iterator[tuple[int, bytes]]:
+    """Yield ``(line_number, line)`` from ``first_line`` on.
+
+    Every few MB of compressed input a copy of the inflate state is stored
+    in a per-file index, so a later read that starts deep into the file
+    resumes from the nearest checkpoint instead of the beginning.
+    """
+    index = _gzip_index(path)
+    checkpoint = index.nearest(first_line)
+
+    with open(path, "rb") as raw:
+        if checkpoint:
+            raw.seek(checkpoint.raw_offset)
+            decompressor = checkpoint.decompressor.copy()
+            pending = checkpoint.pending
+            skipping = checkpoint.skipping
+            line_number = checkpoint.line
+        else:
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            pending = b""
+            skipping = False
+            line_number = 1
+        next_checkpoint = raw.tell() + CHECKPOINT_INTERVAL
+
+        while True:
+            chunk = raw.read(READ_SIZE)
+            if not chunk:
+                break
+
+            # inflate at most READ_SIZE at a time; a small chunk can expand a lot
+            while True:
+                if decompressor.eof:
+                    if not chunk:
+                        break
+                    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                data = decompressor.decompress(chunk, READ_SIZE)
+                chunk = decompressor.unused_data if decompressor.eof else decompressor.unconsumed_tail
+                output_full = len(data) == READ_SIZE
+
+                if skipping:
+                    # rest of a line already yielded in truncated form
+                    cut = data.find(b"\n")
+                    if cut != -1:
+                        data = data[cut + 1 :]
+                        skipping = False
+                        line_number += 1
+                    else:
+                        data = b""
+
+                pending += data
+                if b"\n" in data:
+                    lines = pending.split(b"\n")
+                    pending = lines.pop()
+                    if line_number + len(lines) <= first_line:
+                        line_number += len(lines)
+                    else:
+                        for line in lines:
+                            if line_number >= first_line:
+                                yield line_number, line
+                            line_number += 1
+
+                if len(pending) > MAX_LINE_BYTES:
+                    if line_number >= first_line:
+                        yield line_number, _cut_line(pending)
+                    pending = b""
+                    skipping = True
+
+                if not chunk and not output_full and not decompressor.eof:
+                    break
+
+            if raw.tell() >= next_checkpoint:
+                index.add(_Checkpoint(line_number, raw.tell(), decompressor.copy(), pending, skipping))
+                next_checkpoint = raw.tell() + CHECKPOINT_INTERVAL
+
+        if pending and not skipping and line_number >= first_line:
+            yield line_number, pending
+
+
+def _cut_line(line : bytes) -> bytes:
+    """``line`` cut to MAX_LINE_BYTES, without splitting a UTF-8 character."""
+    cut = MAX_LINE_BYTES
+    while cut > 0 and line[cut] & 0xC0 == 0x80:
+        cut -= 1
+    return line[:cut]
+
+
+def _stream_lines(stream : IO[bytes], first_line : int) -> Iterator[tuple[int, bytes]]:
+    line_number = 0
+    while line := stream.readline(MAX_LINE_BYTES + 1):
+        line_number += 1
+        if len(line) > MAX_LINE_BYTES and not line.endswith(b"\n"):
+            line = _cut_line(line)
+            while (rest := stream.readline(MAX_LINE_BYTES)) and not rest.endswith(b"\n"):
+                pass
+        if line_number >= first_line:
+            yield line_number, line.rstrip(b"\n")
+
+
+def _open_member(path : Path, kind : str, member : str) -> tuple[IO[bytes], object]:
+    if kind == ZIP:
+        archive = zipfile.ZipFile(path)
+        try:
+            return archive.open(member), archive
+        except KeyError:
+            archive.close()
+            raise ArchiveError(f"No member named {member!r} in {path.name}") from None
+
+    archive = tarfile.open(path, "r:*")
+    try:
+        stream = archive.extractfile(member)
+    except KeyError:
+        archive.close()
+        raise ArchiveError(f"No member named {member!r} in {path.name}") from None
+    if stream is None:
+        archive.close()
+        raise ArchiveError(f"{member!r} in {path.name} is not a regular file")
+    return stream, archive
+
+
+@dataclass
+class LineWindow:
+    lines : list[str]
+    start : int
+    total : Optional[int]
+
+
+def _decode(line : bytes) -> str:
+    line = line.rstrip(b"\r")
+    try:
+        return line.decode("utf-8")
+    except UnicodeDecodeError:
+        return line.decode("latin-1")
+
+
+def read_window(
+    path : Path,
+    kind : str,
+    member : Optional[str],
+    offset : int,
+    limit : int,
+) -> LineWindow:
+    """Decompress ``path`` (or one archive member) as a stream and keep lines
+    ``offset`` .. ``offset + limit - 1``.
+
+    Reading stops right after the window; ``total`` is only known when the
+    window reaches the end of the content.
+    """
+    closers : list[object] = []
+    try:
+        if member is not None:
+            stream, archive = _open_member(path, kind, member)
+            closers.extend([stream, archive])
+            lines = _stream_lines(stream, offset)
+        elif kind == GZIP:
+            lines = _gzip_lines(path, offset)
+        elif kind == BZIP2:
+            stream = bz2.open(path, "rb")
+            closers.append(stream)
+            lines = _stream_lines(stream, offset)
+        elif kind == XZ:
+            stream = lzma.open(path, "rb")
+            closers.append(stream)
+            lines = _stream_lines(stream, offset)
+        else:
+            raise ArchiveError(f"{path.name} is an archive; address a member as {path.name}!<member>")
+        closers.insert(0, lines)
+
+        window : list[str] = []
+        sniffed = False
+        last = 0 if offset == 1 else None
+        for line_number, line in lines:
+            if not sniffed:
+                if b"\x00" in line[:BINARY_SNIFF_BYTES]:
+                    raise ArchiveError("decompressed content is binary")
+                sniffed = True
+            if len(window) >= limit:
+                return LineWindow(window, offset, None)
+            window.append(_decode(line))
+            last = line_number
+
+        return LineWindow(window, offset, last)
+    except _DECOMPRESS_ERRORS as e:
+        raise ArchiveError(f"Failed to decompress {path.name}: {e}") from None
+    finally:
+        for closer in closers:
+            closer.close()
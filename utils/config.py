@@ -0,0 +1,54 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+import os
+
+
+@dataclass(frozen=True)
+class Config:
+    model : Optional[str]
+    api_key : Optional[str]
+    base_url : str
+    repo_map_tokens : int
+    context_window : int
+    response_reserve_tokens : int
+    tool_output_tokens : int
+    tool_io_workers : int
+    tool_cpu_workers : int
+    tokenizer_load_timeout : float
+    daemon_session_ttl : float
+    llm_requests_per_minute : float
+    memory_soft_limit_mb : float
+    tui_viewport_head : int
+    tui_viewport_tail : int
+    subagent_max_turns : int
+    subagent_result_tokens : int
+
+
+@lru_cache(maxsize=None)
+def get_config() -> Config:
+    """Read .env (without overriding the real environment) and the settings, once per process."""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    cpus = os.cpu_count() or 1
+    return Config(
+        model = os.getenv('MODEL'),
+        api_key = os.getenv('OPENROUTER_API_KEY'),
+        base_url = os.getenv('LLM_BASE_URL', 'https://openrouter.ai/api/v1'),
+        repo_map_tokens = int(os.getenv('REPO_MAP_TOKENS', '1024')),
+        context_window = int(os.getenv('CONTEXT_WINDOW', '128000')),
+        response_reserve_tokens = int(os.getenv('RESPONSE_RESERVE_TOKENS', '8192')),
+        tool_output_tokens = int(os.getenv('TOOL_OUTPUT_TOKENS', '25000')),
+        tool_io_workers = int(os.getenv('TOOL_IO_WORKERS', str(min(32, cpus + 4)))),
+        tool_cpu_workers = int(os.getenv('TOOL_CPU_WORKERS', str(cpus))),
+        tokenizer_load_timeout = float(os.getenv('TOKENIZER_LOAD_TIMEOUT', '10')),
+        daemon_session_ttl = float(os.getenv('DAEMON_SESSION_TTL', str(4 * 3600))),
+        llm_requests_per_minute = float(os.getenv('LLM_REQUESTS_PER_MINUTE', '0')),
+        memory_soft_limit_mb = float(os.getenv('MEMORY_SOFT_LIMIT_MB', '0')),
+        tui_viewport_head = int(os.getenv('TUI_VIEWPORT_HEAD', '40')),
+        tui_viewport_tail = int(os.getenv('TUI_VIEWPORT_TAIL', '10')),
+        subagent_max_turns = int(os.getenv('SUBAGENT_MAX_TURNS', '8')),
+        subagent_result_tokens = int(os.getenv('SUBAGENT_RESULT_TOKENS', '1500')),
+    )
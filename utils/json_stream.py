@@ -0,0 +1,596 @@
+from __future__ import annotations
+from collections import Counter
+from typing import Any, Iterator, Optional, TextIO, Union
+import json
+import re
+
+CHUNK_SIZE = 1 << 16
+MAX_TOKEN_CHARS = 64 * 1024 * 1024
+_LOOKAHEAD = 64
+SAMPLE_ITEMS = 1000
+
+START_MAP = "start_map"
+END_MAP = "end_map"
+START_ARRAY = "start_array"
+END_ARRAY = "end_array"
+VALUE = "value"
+
+_TOKEN = re.compile(
+    r"[ \t\n\r]*(?:"
+    r"([{}\[\]:,])"
+    r"|\"([^\"\\]*(?:\\.[^\"\\]*)*)\""
+    r"|(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)"
+    r"|(true|false|null)"
+    r")",
+    re.S,
+)
+_BRACKETS = re.compile(r"(\"[^\"\\]*(?:\\.[^\"\\]*)*\")|([{\[])|([}\]])|((?!))|(\")")
+_COUNT = re.compile(r"(\"[^\"\\]*(?:\\.[^\"\\]*)*\")|([{\[])|([}\]])|(,)|(\")")
+_WHITESPACE = re.compile(r"[ \t\n\r]*\Z")
+_LITERALS = {"true" : True, "false" : False, "null" : None}
+
+_OBJECT_KEY = 0
+_OBJECT_VALUE = 1
+_OBJECT_NEXT = 2
+_ARRAY_VALUE = 3
+_ARRAY_NEXT = 4
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+class JsonStream:
+    """Incremental JSON event reader over a text file.
+
+    Only the current chunk and the stack of open containers are held in
+    memory. ``path`` is the location of the value the last start/value
+    event belongs to: keys for objects, indices for arrays.
+    ``document_line`` is the line the current top-level value starts on,
+    which tells JSONL records apart.
+    """
+
+    def __init__(self, f : TextIO, chunk_size : int = CHUNK_SIZE) -> None:
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._states : list[int] = []
+        self._pending : Optional[int] = None
+        self.path : list[Union[str, int]] = []
+        self.offset = 0
+        self.document_line = 0
+        self._newlines = 0
+        self._counted = 0
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+
+        self.offset += self._pos
+        self._newlines += self._buf.count("\n", self._counted, self._pos)
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        self._counted = 0
+        if len(self._buf) > MAX_TOKEN_CHARS:
+            raise JsonStreamError(f"token larger than {MAX_TOKEN_CHARS} characters at offset {self.offset}")
+        return True
+
+    def _token(self) -> Optional[tuple[str, Any]]:
+        while True:
+            if len(self._buf) - self._pos < _LOOKAHEAD and self._fill():
+                continue
+            match = _TOKEN.match(self._buf, self._pos)
+            if match is None or (match.end() == len(self._buf) and not self._eof):
+                if self._fill():
+                    continue
+                if match is None:
+                    if _WHITESPACE.match(self._buf, self._pos):
+                        self._pos = len(self._buf)
+                        return None
+                    raise JsonStreamError(
+                        f"invalid JSON at offset {self.offset + self._pos}: "
+                        f"{self._buf[self._pos:self._pos + 20]!r}"
+                    )
+            self._pos = match.end()
+
+            group = match.lastindex
+            if group == 1:
+                return match.group(1), None
+            if group == 2:
+                string = match.group(2)
+                if "\\" in string:
+                    string = json.loads(f'"{string}"')
+                return "string", string
+            if group == 3:
+                number = match.group(3)
+                if "." in number or "e" in number or "E" in number:
+                    return "value", float(number)
+                return "value", int(number)
+            return "value", _LITERALS[match.group(4)]
+
+    def _push(self) -> None:
+        if self._pending == _OBJECT_KEY:
+            self.path.append("")
+        else:
+            self.path.append(0)
+        self._states.append(self._pending)
+        self._pending = None
+
+    def _finish_value(self) -> None:
+        if self._states:
+            state = self._states[-1]
+            self._states[-1] = _OBJECT_NEXT if state == _OBJECT_VALUE else _ARRAY_NEXT
+
+    def next_event(self) -> Optional[tuple[str, Any]]:
+        if self._pending is not None:
+            self._push()
+
+        while True:
+            token = self._token()
+            if token is None:
+                if self._states:
+                    raise JsonStreamError("unexpected end of document")
+                return None
+            kind, value = token
+            state = self._states[-1] if self._states else None
+
+            if state == _OBJECT_KEY:
+                if kind == "}":
+                    return self._close(END_MAP)
+                if kind != "string":
+                    raise JsonStreamError(f"expected object key at offset {self.offset + self._pos}")
+                self.path[-1] = value
+                if self._token() != (":", None):
+                    raise JsonStreamError(f"expected ':' at offset {self.offset + self._pos}")
+                self._states[-1] = _OBJECT_VALUE
+                continue
+
+            if kind == ",":
+                if state == _OBJECT_NEXT:
+                    self._states[-1] = _OBJECT_KEY
+                elif state == _ARRAY_NEXT:
+                    self.path[-1] += 1
+                    self._states[-1] = _ARRAY_VALUE
+                else:
+                    raise JsonStreamError(f"unexpected ',' at offset {self.offset + self._pos}")
+                continue
+
+            if kind == "}":
+                if state != _OBJECT_NEXT:
+                    raise JsonStreamError(f"unexpected '}}' at offset {self.offset + self._pos}")
+                return self._close(END_MAP)
+
+            if kind == "]":
+                if state not in (_ARRAY_NEXT, _ARRAY_VALUE):
+                    raise JsonStreamError(f"unexpected ']' at offset {self.offset + self._pos}")
+                return self._close(END_ARRAY)
+
+            if kind == ":" or state in (_OBJECT_NEXT, _ARRAY_NEXT):
+                raise JsonStreamError(f"unexpected {kind!r} at offset {self.offset + self._pos}")
+
+            if state is None:
+                # newlines are counted only up to each top-level value, once
+                self._newlines += self._buf.count("\n", self._counted, self._pos)
+                self._counted = self._pos
+                self.document_line = self._newlines + 1
+
+            if kind == "{":
+                self._pending = _OBJECT_KEY
+                return START_MAP, None
+            if kind == "[":
+                self._pending = _ARRAY_VALUE
+                return START_ARRAY, None
+
+            self._finish_value()
+            return VALUE, value
+
+    def _close(self, event : str) -> tuple[str, Any]:
+        self._states.pop()
+        self.path.pop()
+        self._finish_value()
+        return event, None
+
+    def events(self) -> Iterator[tuple[str, Any]]:
+        while (event := self.next_event()) is not None:
+            yield event
+
+    def skip_container(self, count_items : bool = False) -> int:
+        """Skip to the end of the innermost open container.
+
+        Right after a start event this skips that whole container, otherwise
+        the rest of the container the last event was in. Only strings and
+        brackets are visited, so skipping is much faster than reading
+        events. With ``count_items`` the number of values skipped after the
+        last one read is returned.
+        """
+        if self._pending is not None:
+            self._pending = None
+            pop = False
+        else:
+            pop = True
+
+        pattern = _COUNT if count_items else _BRACKETS
+        depth = 0
+        items = 0
+        done = False
+        while not done:
+            for match in pattern.finditer(self._buf, self._pos):
+                group = match.lastindex
+                if group == 1:
+                    continue
+                if group == 2:
+                    depth += 1
+                elif group == 3:
+                    if depth == 0:
+                        self._pos = match.end()
+                        done = True
+                        break
+                    depth -= 1
+                elif group == 4:
+                    if depth == 0:
+                        items += 1
+                else:
+                    self._pos = match.start()
+                    break
+            else:
+                self._pos = len(self._buf)
+
+            if not done and not self._fill():
+                raise JsonStreamError("unexpected end of document")
+
+        if pop:
+            self._states.pop()
+            self.path.pop()
+        self._finish_value()
+        return items
+
+
+ANY = object()
+DESCEND = object()
+Segment = Union[str, int, object]
+
+_PATH_TOKEN = re.compile(
+    r"\.\.|\.(\*|[^.\[]+)|\[\s*(\*|-?\d+|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")\s*\]"
+)
+
+
+def parse_selector(selector : str) -> list[Segment]:
+    """Parse a JSON pointer (``/a/0/b``) or JSONPath-like (``$.a[0].b``) selector.
+
+    Supported JSONPath parts are ``.key``, ``['key']``, ``[3]``, ``*``/``[*]``
+    and ``..`` for recursive descent.
+    """
+    selector = selector.strip()
+    if selector in ("", "$", "/"):
+        return []
+
+    if selector.startswith("/"):
+        segments : list[Segment] = []
+        for part in selector[1:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            segments.append(int(part) if part.isdigit() else part)
+        return segments
+
+    if selector.startswith("$"):
+        selector = selector[1:]
+    elif not selector.startswith((".", "[")):
+        selector = "." + selector
+
+    segments = []
+    position = 0
+    while position < len(selector):
+        match = _PATH_TOKEN.match(selector, position)
+        if match is None:
+            raise ValueError(f"invalid selector near {selector[position:]!r}")
+        position = match.end()
+
+        token = match.group(0)
+        name = match.group(1) or match.group(2)
+        if token == "..":
+            segments.append(DESCEND)
+            if position < len(selector) and selector[position] not in ".[":
+                selector = selector[:position] + "." + selector[position:]
+        elif name == "*":
+            segments.append(ANY)
+        elif match.group(2) and name[0] in "'\"":
+            segments.append(name[1:-1].replace(f"\\{name[0]}", name[0]))
+        elif match.group(2):
+            segments.append(int(name))
+        else:
+            segments.append(name)
+
+    return segments
+
+
+NO_MATCH = 0
+PARTIAL = 1
+FULL = 2
+
+
+def match_path(path : list[Union[str, int]], segments : list[Segment], i : int = 0, j : int = 0) -> int:
+    """FULL if ``path`` matches ``segments``, PARTIAL if a deeper path could."""
+    while True:
+        if j == len(segments):
+            return FULL if i == len(path) else NO_MATCH
+        if i == len(path):
+            return PARTIAL
+
+        segment = segments[j]
+        if segment is DESCEND:
+            best = PARTIAL
+            for k in range(i, len(path) + 1):
+                best = max(best, match_path(path, segments, k, j + 1))
+                if best == FULL:
+                    break
+            return best
+
+        element = path[i]
+        if not (
+            segment is ANY
+            or segment == element
+            or (isinstance(segment, int) and str(segment) == element)
+        ):
+            return NO_MATCH
+        i += 1
+        j += 1
+
+
+def format_path(path : list[Union[str, int]]) -> str:
+    parts = ["$"]
+    for element in path:
+        if isinstance(element, int):
+            parts.append(f"[{element}]")
+        elif element.isidentifier():
+            parts.append(f".{element}")
+        else:
+            parts.append(f"[{json.dumps(element)}]")
+    return "".join(parts)
+
+
+def select(
+    stream : JsonStream,
+    segments : list[Segment],
+    max_matches : int,
+) -> Iterator[tuple[list[Union[str, int]], str, Any]]:
+    """Yield ``(path, event, value)`` at the start of every matching value.
+
+    The consumer must read the matched value from ``stream`` (or skip it)
+    before asking for the next match. Subtrees that cannot contain a match
+    are skipped without being tokenized.
+    """
+    found = 0
+    open_events = (START_MAP, START_ARRAY)
+    exact = not any(segment is ANY or segment is DESCEND for segment in segments)
+
+    while (event := stream.next_event()) is not None:
+        kind, value = event
+        if kind in (END_MAP, END_ARRAY):
+            continue
+
+        path = stream.path
+        state = match_path(path, segments)
+        if state == FULL:
+            yield list(path), kind, value
+            found += 1
+            if found >= max_matches:
+                return
+        elif state == NO_MATCH:
+            if kind in open_events:
+                stream.skip_container()
+            if (
+                exact
+                and path
+                and len(path) <= len(segments)
+                and isinstance(path[-1], int)
+                and isinstance(segments[len(path) - 1], int)
+                and path[-1] > segments[len(path) - 1]
+            ):
+                stream.skip_container()
+
+
+_TRUNCATED = "...[truncated]"
+
+
+def build_value(stream : JsonStream, kind : str, value : Any, budget : int) -> tuple[Any, bool]:
+    """Materialize the value that starts with ``kind``, within ``budget`` characters.
+
+    Once the budget is used up the rest of every open container is skipped
+    and replaced by a ``...[truncated]`` marker.
+    """
+    if kind == VALUE:
+        return value, False
+
+    root : Union[dict, list] = {} if kind == START_MAP else []
+    stack : list[Union[dict, list]] = [root]
+    used = 2
+    truncated = False
+
+    while stack:
+        event = stream.next_event()
+        if event is None:
+            raise JsonStreamError("unexpected end of document")
+        kind, value = event
+
+        if kind in (END_MAP, END_ARRAY):
+            stack.pop()
+            continue
+
+        container = stack[-1]
+        key = stream.path[-1]
+
+        if used > budget:
+            truncated = True
+            if kind in (START_MAP, START_ARRAY):
+                stream.skip_container()
+            stream.skip_container()
+            if isinstance(container, dict):
+                container["..."] = _TRUNCATED
+            else:
+                container.append(_TRUNCATED)
+            stack.pop()
+            continue
+
+        if kind == VALUE:
+            child = value
+            used += len(str(value)) + 4
+        else:
+            child = {} if kind == START_MAP else []
+            used += 4
+
+        if isinstance(container, dict):
+            container[key] = child
+            used += len(key) + 4
+        else:
+            container.append(child)
+
+        if kind != VALUE:
+            stack.append(child)
+
+    return root, truncated
+
+
+def _type_name(value : Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    return "string"
+
+
+class Shape:
+    """Aggregated structure of every value seen at one position."""
+
+    MAX_KEYS = 100
+
+    __slots__ = ("types", "keys", "items", "lengths", "example", "dropped_keys", "sampled")
+
+    def __init__(self) -> None:
+        self.types : Counter = Counter()
+        self.keys : dict[str, Shape] = {}
+        self.items : Optional[Shape] = None
+        self.lengths : list[int] = []
+        self.example : Optional[Any] = None
+        self.dropped_keys = 0
+        self.sampled = False
+
+    def child(self, key : Union[str, int]) -> Optional[Shape]:
+        if isinstance(key, int):
+            if self.items is None:
+                self.items = Shape()
+            return self.items
+
+        shape = self.keys.get(key)
+        if shape is None:
+            if len(self.keys) >= self.MAX_KEYS:
+                self.dropped_keys += 1
+                return None
+            shape = self.keys[key] = Shape()
+        return shape
+
+    def note_length(self, length : int) -> None:
+        if not self.lengths:
+            self.lengths = [length, length]
+        else:
+            self.lengths = [min(self.lengths[0], length), max(self.lengths[1], length)]
+
+    def render(self, label : str, depth : int, max_depth : int, lines : list[str]) -> None:
+        total = sum(self.types.values())
+        kinds = []
+        for name, count in self.types.most_common():
+            if name in ("object", "array") and self.lengths:
+                low, high = self.lengths
+                size = f"{low}" if low == high else f"{low}..{high}"
+                unit = "keys" if name == "object" else "items"
+                name = f"{name}[{size} {unit}]" if name == "array" else f"{name}({size} {unit})"
+            kinds.append(name if count == total else f"{name} x{count}")
+
+        line = f"{'  ' * depth}{label}: {' | '.join(kinds)}"
+        if self.sampled:
+            line += f" (first {SAMPLE_ITEMS} items sampled)"
+        if self.example is not None:
+            line += f"  e.g. {json.dumps(self.example, ensure_ascii=False)}"
+        lines.append(line)
+
+        if depth >= max_depth:
+            if self.keys or self.items:
+                lines.append(f"{'  ' * (depth + 1)}...")
+            return
+
+        for key, shape in self.keys.items():
+            shape.render(f".{key}" if key.isidentifier() else f"[{json.dumps(key)}]", depth + 1, max_depth, lines)
+        if self.dropped_keys:
+            lines.append(f"{'  ' * (depth + 1)}... {self.dropped_keys} more keys")
+        if self.items is not None:
+            self.items.render("[*]", depth + 1, max_depth, lines)
+
+
+def summarize_value(
+    stream : JsonStream,
+    kind : str,
+    value : Any,
+    shape : Shape,
+    sample_items : int = SAMPLE_ITEMS,
+) -> None:
+    """Fold the value that starts with ``kind`` into ``shape``.
+
+    Only the first ``sample_items`` elements of each array are inspected;
+    the rest are skipped and just counted.
+    """
+    _record(shape, kind, value)
+    if kind == VALUE:
+        return
+
+    stack : list[list] = [[shape, 0]]
+    while stack:
+        event = stream.next_event()
+        if event is None:
+            raise JsonStreamError("unexpected end of document")
+        kind, value = event
+
+        if kind in (END_MAP, END_ARRAY):
+            parent, count = stack.pop()
+            parent.note_length(count)
+        else:
+            parent = stack[-1][0]
+            child = parent.child(stream.path[-1])
+            if child is not None:
+                _record(child, kind, value)
+            if kind != VALUE:
+                if child is not None:
+                    stack.append([child, 0])
+                    continue
+                stream.skip_container()
+
+        if not stack:
+            break
+
+        entry = stack[-1]
+        entry[1] += 1
+        if entry[1] >= sample_items and isinstance(stream.path[-1], int):
+            entry[0].sampled = True
+            entry[0].note_length(entry[1] + stream.skip_container(count_items=True))
+            stack.pop()
+            if stack:
+                stack[-1][1] += 1
+
+
+def _record(shape : Shape, kind : str, value : Any) -> None:
+    if kind == START_MAP:
+        shape.types["object"] += 1
+    elif kind == START_ARRAY:
+        shape.types["array"] += 1
+    else:
+        shape.types[_type_name(value)] += 1
+        if shape.example is None and value is not None:
+            shape.example = value[:40] if isinstance(value, str) else value
@@ -0,0 +1,203 @@
+"""Memory accounting for long sessions.
+
+``MemoryProfiler`` takes a tracemalloc snapshot after every turn and keeps
+only a summary of it: traced bytes grouped by the subsystem that allocated
+them, and the allocation sites that grew the most since the previous turn.
+Allocation site is not ownership: a file read by a tool is allocated under
+tools/ even though the context is what keeps it alive. That is why reports
+also include the owners' own counts (``ContextManager.memory_usage`` and
+``TUI.memory_usage``).
+
+tracemalloc slows allocation-heavy code noticeably, so it only runs with
+``--memprofile``; RSS and the owner counts are always available.
+"""
+from __future__ import annotations
+from dataclasses import dataclass,field
+from pathlib import Path
+from typing import Optional
+from utils.config import get_config
+from utils.text import format_size
+import os
+import resource
+import sys
+import tracemalloc
+
+ROOT = Path(__file__).resolve().parent.parent
+
+TRACE_FRAMES = 10
+TOP_SITES = 10
+
+# innermost matching frame wins; repo directories first, then libraries
+# the subsystem drives
+_SUBSYSTEMS = (
+    ("context", ("context/", "prompts/")),
+    ("tui", ("ui/", "/rich/")),
+    ("client", ("client/", "/openai/", "/httpx", "/httpcore/", "/h11/", "/anyio/", "/ssl.py")),
+    ("tools", ("tools/",)),
+    ("caches", ("workspace/", "utils/", "/tiktoken/")),
+    ("agent", ("agent/", "daemon/")),
+)
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size, or the peak where only that is available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    try:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except (AttributeError, ValueError):
+        return None
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def over_soft_limit() -> bool:
+    limit = get_config().memory_soft_limit_mb
+    if limit <= 0:
+        return False
+    rss = rss_bytes()
+    return rss is not None and rss > limit * 1024 * 1024
+
+
+def _relative(filename : str) -> str:
+    try:
+        return str(Path(filename).relative_to(ROOT))
+    except ValueError:
+        parts = Path(filename).parts
+        return "/".join(parts[-2:])
+
+
+def _subsystem(traceback : tracemalloc.Traceback) -> str:
+    root = ROOT.as_posix() + "/"
+    for frame in reversed(traceback):
+        path = Path(frame.filename).as_posix()
+        relative = path[len(root):] if path.startswith(root) else None
+        for name, markers in _SUBSYSTEMS:
+            for marker in markers:
+                # "/pkg/" markers name libraries, the rest repo directories
+                if marker.startswith("/") and marker in path:
+                    return name
+                if relative is not None and relative.startswith(marker):
+                    return name
+    return "other"
+
+
+@dataclass
+class TurnSample:
+    turn : int
+    rss : Optional[int]
+    traced : int
+    by_subsystem : dict[str, int]
+    growth : list[tuple[str, int, int]] = field(default_factory=list)
+
+
+class MemoryProfiler:
+    def __init__(self, frames : int = TRACE_FRAMES, top : int = TOP_SITES) -> None:
+        self.frames = frames
+        self.top = top
+        self.samples : list[TurnSample] = []
+        self._previous : Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self) -> None:
+        self._previous = None
+        tracemalloc.stop()
+
+    def record_turn(self) -> Optional[TurnSample]:
+        if not tracemalloc.is_tracing():
+            return None
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+        by_subsystem : dict[str, int] = {}
+        for stat in snapshot.statistics("traceback"):
+            name = _subsystem(stat.traceback)
+            by_subsystem[name] = by_subsystem.get(name, 0) + stat.size
+
+        growth = []
+        if self._previous is not None:
+            for diff in snapshot.compare_to(self._previous, "lineno")[: self.top]:
+                frame = diff.traceback[-1]
+                growth.append((f"{_relative(frame.filename)}:{frame.lineno}", diff.size_diff, diff.count_diff))
+        # keep one snapshot; older ones would be a leak of their own
+        self._previous = snapshot
+
+        sample = TurnSample(
+            turn = len(self.samples) + 1,
+            rss = rss_bytes(),
+            traced = sum(by_subsystem.values()),
+            by_subsystem = dict(sorted(by_subsystem.items(), key=lambda item: -item[1])),
+            growth = growth,
+        )
+        self.samples.append(sample)
+        return sample
+
+    def top_sites(self, limit : Optional[int] = None) -> list[tuple[str, int, int]]:
+        """Largest live allocation sites in the latest snapshot."""
+        if self._previous is None:
+            return []
+        return [
+            (f"{_relative(stat.traceback[-1].filename)}:{stat.traceback[-1].lineno}", stat.size, stat.count)
+            for stat in self._previous.statistics("lineno")[: limit or self.top]
+        ]
+
+
+def turn_summary(sample : TurnSample, previous : Optional[TurnSample] = None) -> str:
+    delta = sample.traced - previous.traced if previous else 0
+    parts = ", ".join(f"{name} {format_size(size)}" for name, size in list(sample.by_subsystem.items())[:5])
+    rss = format_size(sample.rss) if sample.rss is not None else "?"
+    return f"turn {sample.turn}: rss {rss}, traced {format_size(sample.traced)} ({delta:+,} B) | {parts}"
+
+
+def memory_report(
+    owners : dict[str, dict[str, int]],
+    profiler : Optional[MemoryProfiler] = None,
+) -> str:
+    rss = rss_bytes()
+    lines = [f"RSS: {format_size(rss) if rss is not None else 'unknown'}"]
+    limit = get_config().memory_soft_limit_mb
+    if limit > 0:
+        lines[0] += f" (soft limit {limit:g}MB)"
+
+    lines.append("")
+    lines.append("Held by:")
+    for owner, usage in owners.items():
+        fields = ", ".join(
+            f"{key.replace('_', ' ')} {format_size(value) if key.endswith('bytes') else value}"
+            for key, value in usage.items()
+        )
+        lines.append(f"  {owner:<10}{fields}")
+
+    if profiler is None or not profiler.samples:
+        lines.append("")
+        lines.append("Run with --memprofile for allocation sites and per-subsystem totals.")
+        return "\n".join(lines)
+
+    sample = profiler.samples[-1]
+    lines.append("")
+    lines.append(f"Traced after turn {sample.turn}: {format_size(sample.traced)}")
+    for name, size in sample.by_subsystem.items():
+        lines.append(f"  {name:<10}{format_size(size):>10}")
+
+    lines.append("")
+    lines.append("Top allocation sites:")
+    for site, size, count in profiler.top_sites():
+        lines.append(f"  {format_size(size):>10}  {count:>8} blocks  {site}")
+
+    if sample.growth:
+        lines.append("")
+        lines.append("Grew most since the previous turn:")
+        for site, size_diff, count_diff in sample.growth:
+            lines.append(f"  {size_diff:>+12,} B  {count_diff:>+8} blocks  {site}")
+    return "\n".join(lines)
+
@@ -0,0 +1,271 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+import difflib
+import os
+import re
+import tempfile
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+class PatchError(Exception):
+    pass
+
+
+@dataclass
+class FileChange:
+    """New content for one file. ``new`` is None when the file is deleted."""
+    path : Path
+    old : Optional[str]
+    new : Optional[str]
+
+
+@dataclass
+class Hunk:
+    old_start : int
+    lines : list[str] = field(default_factory=list)
+
+    @property
+    def old_lines(self) -> list[str]:
+        return [line[1:] for line in self.lines if line[:1] in (" ", "-")]
+
+    @property
+    def new_lines(self) -> list[str]:
+        return [line[1:] for line in self.lines if line[:1] in (" ", "+")]
+
+
+@dataclass
+class FilePatch:
+    old_path : Optional[str]
+    new_path : Optional[str]
+    hunks : list[Hunk] = field(default_factory=list)
+
+
+def read_text(path : Path) -> str:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+def replace_once(content : str, old : str, new : str, replace_all : bool = False) -> str:
+    if not old:
+        raise PatchError("old_string must not be empty")
+
+    count = content.count(old)
+    if count == 0:
+        raise PatchError("old_string not found")
+    if count > 1 and not replace_all:
+        raise PatchError(
+            f"old_string matches {count} times; add surrounding context or set replace_all"
+        )
+
+    return content.replace(old, new) if replace_all else content.replace(old, new, 1)
+
+
+def _strip_prefix(path : str) -> Optional[str]:
+    path = path.split("\t", 1)[0].strip()
+    if path == "/dev/null":
+        return None
+    if path.startswith(("a/", "b/")):
+        return path[2:]
+    return path
+
+
+def parse_unified_diff(text : str) -> list[FilePatch]:
+    patches : list[FilePatch] = []
+    current : Optional[FilePatch] = None
+    lines = text.splitlines()
+    i = 0
+
+    while i < len(lines):
+        line = lines[i]
+
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            current = FilePatch(_strip_prefix(line[4:]), _strip_prefix(lines[i + 1][4:]))
+            patches.append(current)
+            i += 2
+            continue
+
+        match = _HUNK_HEADER.match(line)
+        if not match:
+            i += 1
+            continue
+
+        if current is None:
+            raise PatchError(f"Hunk without file header at line {i + 1}")
+
+        hunk = Hunk(old_start=int(match.group(1)))
+        current.hunks.append(hunk)
+        old_left = int(match.group(2) or 1)
+        new_left = int(match.group(4) or 1)
+        i += 1
+
+        while i < len(lines) and (old_left > 0 or new_left > 0):
+            body = lines[i] or " "
+            tag = body[:1]
+            if tag == "\\":
+                i += 1
+                continue
+            if tag not in (" ", "-", "+"):
+                raise PatchError(f"Unexpected line in hunk at line {i + 1}: {lines[i]!r}")
+
+            hunk.lines.append(body)
+            if tag in (" ", "-"):
+                old_left -= 1
+            if tag in (" ", "+"):
+                new_left -= 1
+            i += 1
+
+        if old_left > 0 or new_left > 0:
+            raise PatchError(f"Hunk starting at line {hunk.old_start} is shorter than its header says")
+
+    if not patches:
+        raise PatchError("No file headers ('--- a/path' / '+++ b/path') found in patch")
+
+    return patches
+
+
+def _find(lines : list[str], needle : list[str], expected : int, strip : bool) -> int:
+    def same(a : str, b : str) -> bool:
+        return a.rstrip() == b.rstrip() if strip else a == b
+
+    if not needle:
+        return min(max(expected, 0), len(lines))
+
+    last = len(lines) - len(needle)
+    for distance in range(0, len(lines) + 1):
+        for pos in (expected - distance, expected + distance):
+            if 0 <= pos <= last and all(
+                same(lines[pos + k], needle[k]) for k in range(len(needle))
+            ):
+                return pos
+        if expected - distance < 0 and expected + distance > last:
+            break
+
+    return -1
+
+
+def apply_hunks(content : str, hunks : list[Hunk], path : str) -> str:
+    newline = "\r\n" if "\r\n" in content else "\n"
+    trailing = content.endswith(("\n", "\r"))
+    lines = content.splitlines()
+    offset = 0
+
+    for index, hunk in enumerate(hunks, start=1):
+        old_lines = hunk.old_lines
+        expected = hunk.old_start - 1 + offset if hunk.old_start else 0
+
+        pos = _find(lines, old_lines, expected, strip=False)
+        if pos < 0:
+            pos = _find(lines, old_lines, expected, strip=True)
+        if pos < 0:
+            raise PatchError(f"{path}: hunk {index} does not apply")
+
+        new_lines = hunk.new_lines
+        lines[pos : pos + len(old_lines)] = new_lines
+        offset += len(new_lines) - len(old_lines)
+
+    result = newline.join(lines)
+    if lines and (trailing or not content):
+        result += newline
+
+    return result
+
+
+def compact_diff(path : str, old : Optional[str], new : Optional[str], context : int = 3) -> str:
+    """Unified diff of ``old`` -> ``new`` computed only around the changed span."""
+    old_lines = (old or "").splitlines()
+    new_lines = (new or "").splitlines()
+
+    prefix = 0
+    limit = min(len(old_lines), len(new_lines))
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+
+    suffix = 0
+    while (
+        suffix < limit - prefix
+        and old_lines[-1 - suffix] == new_lines[-1 - suffix]
+    ):
+        suffix += 1
+
+    start = max(0, prefix - context)
+    old_segment = old_lines[start : len(old_lines) - max(0, suffix - context)]
+    new_segment = new_lines[start : len(new_lines) - max(0, suffix - context)]
+
+    out = [
+        f"--- {'/dev/null' if old is None else 'a/' + path}",
+        f"+++ {'/dev/null' if new is None else 'b/' + path}",
+    ]
+    diff = difflib.unified_diff(old_segment, new_segment, n=context, lineterm="")
+    for line in diff:
+        match = _HUNK_HEADER.match(line)
+        if match:
+            old_start, old_len, new_start, new_len = match.groups()
+            old_start = int(old_start) + start if int(old_start) else start
+            new_start = int(new_start) + start if int(new_start) else start
+            out.append(
+                f"@@ -{old_start},{old_len or 1} +{new_start},{new_len or 1} @@"
+            )
+        elif len(out) > 2 or not line.startswith(("---", "+++")):
+            out.append(line)
+
+    return "\n".join(out)
+
+
+def _write_temp(path : Path, content : str) -> str:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists():
+            os.chmod(tmp, path.stat().st_mode & 0o7777)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+    return tmp
+
+
+def commit_changes(changes : list[FileChange]) -> None:
+    """Write every change or none of them.
+
+    New contents are staged as temp files next to their targets and then
+    moved into place with ``os.replace``. If any step fails, files that were
+    already replaced are restored from their previous content.
+    """
+    staged : list[tuple[FileChange, Optional[str]]] = []
+    try:
+        for change in changes:
+            if change.new is None:
+                staged.append((change, None))
+                continue
+            change.path.parent.mkdir(parents=True, exist_ok=True)
+            staged.append((change, _write_temp(change.path, change.new)))
+    except BaseException:
+        for _, tmp in staged:
+            if tmp:
+                os.unlink(tmp)
+        raise
+
+    done : list[FileChange] = []
+    try:
+        for change, tmp in staged:
+            if tmp is None:
+                os.unlink(change.path)
+            else:
+                os.replace(tmp, change.path)
+            done.append(change)
+    except BaseException:
+        for change, tmp in staged[len(done):]:
+            if tmp and os.path.exists(tmp):
+                os.unlink(tmp)
+        for change in reversed(done):
+            if change.old is None:
+                os.unlink(change.path)
+            else:
+                os.replace(_write_temp(change.path, change.old), change.path)
+        raise
@@ -1,5 +1,7 @@
 from pathlib import Path
 from typing import Union,Optional
+import os
+import re
 
 def resolve_path(base : Union[str, Path], path : Union[str, Path]) -> Path:
     path = Path(path)
@@ -29,4 +31,103 @@ def is_binary_file(path : Union[str, Path]) -> bool:
             return b"\x00" in chunk
 
     except(OSError,IOError):
-        return False
\ No newline at end of file
+        return False
+
+def compile_glob(pattern : str) -> re.Pattern[str]:
+    """Translate a glob with ``**`` support into a regex over posix paths."""
+    i, n = 0, len(pattern)
+    parts : list[str] = []
+
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i : i + 3] == "**/":
+                parts.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern[i : i + 2] == "**":
+                parts.append(".*")
+                i += 2
+                continue
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c == "[":
+            j = pattern.find("]", i + 1)
+            if j == -1:
+                parts.append(re.escape(c))
+            else:
+                body = pattern[i + 1 : j].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append(f"[{body}]")
+                i = j
+        else:
+            parts.append(re.escape(c))
+        i += 1
+
+    return re.compile("".join(parts) + r"\Z")
+
+
+def glob_base(pattern : str) -> str:
+    """Return the leading directory of ``pattern`` that contains no wildcards."""
+    base : list[str] = []
+    for part in pattern.split("/")[:-1]:
+        if any(c in part for c in "*?["):
+            break
+        base.append(part)
+
+    return "/".join(base)
+
+
+def guess_language(path : Optional[Union[str, Path]]) -> str:
+    if not path:
+        return "text"
+    suffix = Path(path).suffix.lower()
+    return {
+        ".py": "python",
+        ".js": "javascript",
+        ".jsx": "jsx",
+        ".ts": "typescript",
+        ".tsx": "tsx",
+        ".json": "json",
+        ".toml": "toml",
+        ".yaml": "yaml",
+        ".yml": "yaml",
+        ".md": "markdown",
+        ".sh": "bash",
+        ".bash": "bash",
+        ".zsh": "bash",
+        ".rs": "rust",
+        ".go": "go",
+        ".java": "java",
+        ".kt": "kotlin",
+        ".swift": "swift",
+        ".c": "c",
+        ".h": "c",
+        ".cpp": "cpp",
+        ".hpp": "cpp",
+        ".css": "css",
+        ".html": "html",
+        ".xml": "xml",
+        ".sql": "sql",
+    }.get(suffix, "text")
+
+
+def cache_dir(*parts : str) -> Path:
+    """Per-user cache directory for ved-cli, created on first use."""
+    base = os.getenv("VED_CACHE_DIR") or os.path.join(
+        os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "ved-cli",
+    )
+    path = Path(base, *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def find_git_root(path : Union[str, Path]) -> Optional[Path]:
+    path = Path(path).resolve()
+    for candidate in (path, *path.parents):
+        if (candidate / ".git").exists():
+            return candidate
+    return None
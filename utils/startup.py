@@ -0,0 +1,98 @@
+from __future__ import annotations
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+import importlib
+import subprocess
+import sys
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# what a prompt run loads; openai is imported lazily but every request needs it
+STARTUP_MODULES = ("agent.agent", "ui.tui", "openai")
+
+
+@dataclass
+class ImportTime:
+    module : str
+    self_us : int
+    cumulative_us : int
+    depth : int
+
+
+def import_times(modules : tuple[str, ...] = STARTUP_MODULES) -> list[ImportTime]:
+    """Import ``modules`` in a fresh interpreter under ``-X importtime``."""
+    code = "; ".join(f"import {module}" for module in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd = ROOT,
+        capture_output = True,
+        text = True,
+    )
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        rows.append(
+            ImportTime(
+                module = name.strip(),
+                self_us = int(self_us),
+                cumulative_us = int(cumulative_us),
+                depth = (len(name) - len(name.lstrip()) - 1) // 2,
+            )
+        )
+    return rows
+
+
+async def _phase_times() -> list[tuple[str, float]]:
+    phases = []
+
+    def timed(label : str, fn) -> object:
+        start = time.perf_counter()
+        result = fn()
+        phases.append((label, time.perf_counter() - start))
+        return result
+
+    for module in STARTUP_MODULES[:2]:
+        timed(f"import {module}", lambda : importlib.import_module(module))
+
+    from agent.agent import Agent
+
+    agent = timed("Agent() (tools)", Agent)
+    start = time.perf_counter()
+    await agent.__aenter__()
+    phases.append(("start watcher + client/schema warm-up", time.perf_counter() - start))
+    start = time.perf_counter()
+    await agent._preparing
+    phases.append(("system prompt (environment, repo map), after entry", time.perf_counter() - start))
+    await agent.__aexit__(None, None, None)
+    return phases
+
+
+def profile_startup(top : int = 15) -> str:
+    """Import-time breakdown by top-level package, slowest modules and startup phases."""
+    import asyncio
+
+    rows = import_times()
+    by_package : dict[str, int] = defaultdict(int)
+    for row in rows:
+        by_package[row.module.split(".")[0]] += row.self_us
+    total_us = sum(by_package.values())
+
+    lines = [f"Imports ({', '.join(STARTUP_MODULES)}): {total_us / 1000:.0f}ms in a fresh interpreter", ""]
+    lines.append(f"{'package':<28}{'self ms':>10}{'share':>8}")
+    for package, us in sorted(by_package.items(), key=lambda item : -item[1])[:top]:
+        lines.append(f"{package:<28}{us / 1000:>10.1f}{us / max(total_us, 1):>8.0%}")
+
+    lines += ["", f"{'slowest modules (cumulative)':<52}{'ms':>8}"]
+    for row in sorted((r for r in rows if r.depth <= 2), key=lambda r : -r.cumulative_us)[:top]:
+        lines.append(f"{'  ' * row.depth + row.module:<52}{row.cumulative_us / 1000:>8.1f}")
+
+    lines += ["", f"{'startup phase (this process)':<52}{'ms':>8}"]
+    for label, seconds in asyncio.run(_phase_times()):
+        lines.append(f"{label:<52}{seconds * 1000:>8.1f}")
+
+    return "\n".join(lines)
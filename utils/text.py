@@ -1,20 +1,8 @@
-import tiktoken
-
-def get_tokenizer(model : str):
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-        return encoding.encode
-    except Exception:
-        encoding  = tiktoken.get_encoding("cl100k_base")
-        return encoding.encode
+from collections import deque
+from utils.tokens import get_token_counter
 
 def count_token(text : str, model : str) -> int:
-    tokenizer = get_tokenizer(model)
-
-    if tokenizer:
-        return len(tokenizer(text))
-    
-    return max(1,len(text) // 4)
+    return get_token_counter(model).count(text)
 
 def truncate_text(
         text : str, 
@@ -70,3 +58,55 @@ def _truncate_by_chars(text: str, target_tokens: int, suffix: str, model: str) -
             high = mid - 1
 
     return text[:low] + suffix
+
+
+def format_size(size : int) -> str:
+    value = float(size)
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+
+    return f"{value:.1f}GB"
+
+
+class HeadTailBuffer:
+    """Bounded byte buffer keeping the first and last bytes written to it.
+
+    Memory stays at ``head_size + tail_size`` plus one chunk however much
+    data is written; everything in between is only counted.
+    """
+
+    def __init__(self, head_size : int, tail_size : int) -> None:
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.total = 0
+        self._head = bytearray()
+        self._tail : deque[bytes] = deque()
+        self._tail_len = 0
+
+    def write(self, data : bytes) -> None:
+        self.total += len(data)
+
+        room = self.head_size - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+
+        if not data:
+            return
+
+        self._tail.append(data)
+        self._tail_len += len(data)
+        while self._tail and self._tail_len - len(self._tail[0]) >= self.tail_size:
+            self._tail_len -= len(self._tail.popleft())
+
+    @property
+    def dropped(self) -> int:
+        return max(0, self.total - self.head_size - self.tail_size)
+
+    def head(self) -> bytes:
+        return bytes(self._head)
+
+    def tail(self) -> bytes:
+        return b"".join(self._tail)[-self.tail_size :] if self._tail else b""
@@ -0,0 +1,271 @@
+from __future__ import annotations
+from concurrent.futures import Future,ThreadPoolExecutor,TimeoutError as FutureTimeout
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable,Optional,Protocol,TYPE_CHECKING
+from utils.config import get_config
+from utils.paths import cache_dir
+import fnmatch
+import hashlib
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+
+if TYPE_CHECKING:
+    import tiktoken
+
+config = get_config()
+
+# tiktoken caches downloaded BPE files in a temp dir by default; keep them
+# with our own cache so they survive reboots and can be pre-seeded
+if "TIKTOKEN_CACHE_DIR" not in os.environ and "DATA_GYM_CACHE_DIR" not in os.environ:
+    os.environ["TIKTOKEN_CACHE_DIR"] = str(cache_dir("tiktoken"))
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHARS_PER_TOKEN = 4.0
+CALIBRATION_WEIGHT = 0.3
+MIN_CALIBRATION_TOKENS = 256
+MIN_CHARS_PER_TOKEN = 1.0
+MAX_CHARS_PER_TOKEN = 10.0
+LOAD_TIMEOUT = config.tokenizer_load_timeout
+
+ENCODING_URL = "https://openaipublic.blob.core.windows.net/encodings/{name}.tiktoken"
+
+# starting ratios for families tiktoken has no tokenizer for; the provider's
+# reported usage pulls them toward the real value after the first turn
+_FAMILY_CHARS_PER_TOKEN = (
+    ("*gemini*", 4.0),
+    ("*gemma*", 4.0),
+    ("*claude*", 3.5),
+    ("*llama*", 3.8),
+    ("*mistral*", 3.6),
+    ("*qwen*", 3.6),
+    ("*deepseek*", 3.6),
+)
+
+
+class TokenizerUnavailable(Exception):
+    pass
+
+
+class Encoder(Protocol):
+    def encode_ordinary(self, text : str) -> list[int]: ...
+    def decode(self, tokens : list[int]) -> str: ...
+
+
+def _cache_path(name : str) -> Path:
+    # tiktoken names cached files after the sha1 of the download URL
+    cache = os.getenv("TIKTOKEN_CACHE_DIR") or os.getenv("DATA_GYM_CACHE_DIR") or ""
+    key = hashlib.sha1(ENCODING_URL.format(name=name).encode()).hexdigest()
+    return Path(cache, key)
+
+
+def seed_tokenizer_cache(bundle_dir : Optional[str] = None) -> list[str]:
+    """Copy ``<encoding>.tiktoken`` files into tiktoken's cache so it never downloads.
+
+    Reads ``bundle_dir`` (default: $TIKTOKEN_BUNDLE_DIR) and tiktoken's old
+    temp-dir cache. Returns the encodings that were added.
+    """
+    sources : list[tuple[str, Path]] = []
+    bundle_dir = bundle_dir or os.getenv("TIKTOKEN_BUNDLE_DIR")
+    if bundle_dir and Path(bundle_dir).is_dir():
+        sources.extend((p.stem, p) for p in Path(bundle_dir).glob("*.tiktoken"))
+
+    temp_cache = Path(tempfile.gettempdir(), "data-gym-cache")
+    for name in ("cl100k_base", "o200k_base", "p50k_base", "r50k_base"):
+        sources.append((name, temp_cache / _cache_path(name).name))
+
+    seeded = []
+    for name, source in sources:
+        target = _cache_path(name)
+        if not target.parent.name or target.exists() or not source.is_file() or source == target:
+            continue
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            partial = target.with_name(target.name + ".seed")
+            shutil.copyfile(source, partial)
+            os.replace(partial, target)
+            seeded.append(name)
+        except OSError as e:
+            logger.warning(f"Could not seed tokenizer {name} from {source}: {e}")
+
+    return seeded
+
+
+def _load_encoding(name : str) -> tiktoken.Encoding:
+    import tiktoken
+
+    if os.getenv("TIKTOKEN_OFFLINE") and not _cache_path(name).exists():
+        raise TokenizerUnavailable(
+            f"{name} is not in {_cache_path(name).parent} and TIKTOKEN_OFFLINE is set"
+        )
+    return tiktoken.get_encoding(name)
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model : Optional[str]) -> tiktoken.Encoding:
+    """The tiktoken encoding for ``model``, or cl100k_base when it has none."""
+    name = _encoding_name(model)
+    return _load_encoding(name or "cl100k_base")
+
+
+def _encoding_name(model : Optional[str]) -> Optional[str]:
+    import tiktoken.model
+
+    # OpenRouter ids carry a provider prefix, e.g. "openai/gpt-4o"
+    try:
+        return tiktoken.model.encoding_name_for_model((model or "").split("/")[-1])
+    except KeyError:
+        return None
+
+
+_background : Optional[ThreadPoolExecutor] = None
+_background_lock = threading.Lock()
+
+
+def _background_pool() -> ThreadPoolExecutor:
+    global _background
+    with _background_lock:
+        if _background is None:
+            _background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="token-count")
+        return _background
+
+
+class TokenCounter:
+    """Token counts for one model.
+
+    ``estimate`` divides the text length by a chars-per-token ratio that is
+    recalibrated from the prompt_tokens the provider reports, so it tracks the
+    model's real tokenizer even when tiktoken does not know it. ``count`` is
+    exact once the model's tokenizer has loaded; loading happens on a
+    background thread, and while it is slow or failing ``count`` falls back
+    to the estimate instead of blocking.
+    """
+
+    def __init__(
+        self,
+        model : Optional[str],
+        chars_per_token : float = DEFAULT_CHARS_PER_TOKEN,
+        exact : Optional[Callable[[], Encoder]] = None,
+    ) -> None:
+        self.model = model
+        self.chars_per_token = chars_per_token
+        self._exact_factory = exact
+        self._loading : Optional[Future[Encoder]] = None
+        self._waited = False
+        self._lock = threading.Lock()
+
+    @property
+    def has_exact(self) -> bool:
+        return self._exact_factory is not None
+
+    def warm(self) -> Optional[Future[Encoder]]:
+        """Start loading the exact tokenizer in the background."""
+        if self._exact_factory is None:
+            return None
+
+        with self._lock:
+            if self._loading is None:
+                self._loading = _background_pool().submit(self._exact_factory)
+            return self._loading
+
+    def encoder(self) -> Optional[Encoder]:
+        """The exact tokenizer, or None while it is unavailable.
+
+        The first caller waits up to LOAD_TIMEOUT for the load; after that
+        callers only pick it up once it has finished.
+        """
+        loading = self.warm()
+        if loading is None:
+            return None
+
+        try:
+            return loading.result(timeout = 0 if self._waited else LOAD_TIMEOUT)
+        except FutureTimeout:
+            if not self._waited:
+                logger.warning(f"Tokenizer for {self.model} is still loading, estimating counts")
+            self._waited = True
+            return None
+        except Exception as e:
+            logger.warning(f"Tokenizer for {self.model} unavailable, estimating counts: {e}")
+            self._exact_factory = None
+            return None
+
+    def estimate(self, text : str) -> int:
+        return self.estimate_chars(len(text))
+
+    def estimate_chars(self, chars : int) -> int:
+        return math.ceil(chars / self.chars_per_token) if chars > 0 else 0
+
+    def count(self, text : str) -> int:
+        encoder = self.encoder()
+        if encoder is None:
+            return self.estimate(text)
+        return len(encoder.encode_ordinary(text))
+
+    def count_later(self, text : str) -> Future[int]:
+        """Exact count on a background thread."""
+        # queue the load first: the background pool has a single thread
+        self.warm()
+        return _background_pool().submit(self.count, text)
+
+    def observe(self, chars : int, prompt_tokens : int) -> None:
+        """Move the ratio toward ``chars / prompt_tokens`` from a real request."""
+        if prompt_tokens < MIN_CALIBRATION_TOKENS or chars <= 0:
+            return
+
+        ratio = min(MAX_CHARS_PER_TOKEN, max(MIN_CHARS_PER_TOKEN, chars / prompt_tokens))
+        self.chars_per_token += CALIBRATION_WEIGHT * (ratio - self.chars_per_token)
+
+
+TokenizerFactory = Callable[[Optional[str]], TokenCounter]
+
+_factories : list[tuple[str, TokenizerFactory]] = []
+
+
+def register_tokenizer(pattern : str, factory : TokenizerFactory) -> None:
+    """Use ``factory`` for models matching the glob ``pattern``; later registrations win."""
+    _factories.insert(0, (pattern, factory))
+    get_token_counter.cache_clear()
+
+
+def _tiktoken_counter(model : Optional[str]) -> TokenCounter:
+    return TokenCounter(model, exact=lambda : get_encoding(model))
+
+
+def _default_counter(model : Optional[str]) -> TokenCounter:
+    # known non-OpenAI families first, so they never import tiktoken
+    name = (model or "").lower()
+    for pattern, chars_per_token in _FAMILY_CHARS_PER_TOKEN:
+        if fnmatch.fnmatch(name, pattern):
+            return TokenCounter(model, chars_per_token)
+
+    if _encoding_name(model):
+        return _tiktoken_counter(model)
+    return TokenCounter(model)
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(model : Optional[str]) -> TokenCounter:
+    name = (model or "").lower()
+    for pattern, factory in _factories:
+        if fnmatch.fnmatch(name, pattern):
+            return factory(model)
+    return _default_counter(model)
+
+
+def warm_up_tokenizer(model : Optional[str] = None) -> None:
+    """Seed the tokenizer cache and load ``model``'s tokenizer off the main thread."""
+    counter = get_token_counter(model if model is not None else config.model)
+
+    def seed_then_load() -> None:
+        seeded = seed_tokenizer_cache()
+        if seeded:
+            logger.info(f"Seeded tokenizer cache with {', '.join(seeded)}")
+        counter.warm()
+
+    _background_pool().submit(seed_then_load)
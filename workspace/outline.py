@@ -0,0 +1,357 @@
+from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence, Union
+from utils.paths import guess_language
+import ast
+import os
+import re
+import threading
+
+
+@dataclass(frozen=True)
+class Symbol:
+    kind : str
+    name : str
+    signature : str
+    start : int
+    end : int
+    depth : int = 0
+
+
+@dataclass(frozen=True)
+class FileOutline:
+    path : str
+    language : str
+    total_lines : int
+    symbols : tuple[Symbol, ...]
+    error : Optional[str] = None
+
+
+_CONTROL = {"if", "for", "while", "switch", "catch", "return", "else", "do", "try", "sizeof", "elif", "match", "case"}
+
+_C_LIKE_FUNCTION = re.compile(
+    r"^\s*(?:[\w:<>,\*&\[\]]+\s+)+\**&?(?P<name>[A-Za-z_~][\w:]*)\s*\([^;]*\)\s*(?:const\s*)?(?:noexcept\s*)?(?:throws [\w., ]+)?\s*\{?\s*$"
+)
+
+_PATTERNS : dict[str, list[tuple[str, re.Pattern[str]]]] = {
+    "javascript": [
+        ("class", re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?class\s+(?P<name>[\w$]+)")),
+        ("function", re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s+(?P<name>[\w$]+)\s*\(")),
+        ("function", re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+(?P<name>[\w$]+)\s*(?::[^=]+)?=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*(?::[^=]+)?=>|[\w$]+\s*=>)")),
+        ("interface", re.compile(r"^\s*(?:export\s+)?interface\s+(?P<name>[\w$]+)")),
+        ("type", re.compile(r"^\s*(?:export\s+)?type\s+(?P<name>[\w$]+)\s*(?:<[^>]*>)?\s*=")),
+        ("enum", re.compile(r"^\s*(?:export\s+)?(?:const\s+)?enum\s+(?P<name>[\w$]+)")),
+        ("method", re.compile(r"^\s+(?:(?:public|private|protected|static|readonly|async|get|set|override)\s+)*(?P<name>[\w$]+)\s*(?:<[^>]*>)?\([^)]*\)\s*(?::[^{]+)?\{\s*$")),
+    ],
+    "rust": [
+        ("function", re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:const\s+)?(?:async\s+)?(?:unsafe\s+)?(?:extern\s+\"[^\"]*\"\s+)?fn\s+(?P<name>\w+)")),
+        ("struct", re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?struct\s+(?P<name>\w+)")),
+        ("enum", re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?enum\s+(?P<name>\w+)")),
+        ("trait", re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:unsafe\s+)?trait\s+(?P<name>\w+)")),
+        ("impl", re.compile(r"^\s*(?:unsafe\s+)?impl(?:<[^>]*>)?\s+(?P<name>[\w:<>, ]+?)\s*(?:where|\{|$)")),
+        ("module", re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?mod\s+(?P<name>\w+)")),
+    ],
+    "go": [
+        ("function", re.compile(r"^func\s+(?:\([^)]*\)\s*)?(?P<name>\w+)\s*[\[(]")),
+        ("type", re.compile(r"^type\s+(?P<name>\w+)\s+")),
+    ],
+    "java": [
+        ("class", re.compile(r"^\s*(?:(?:public|private|protected|static|final|abstract|sealed)\s+)*(?:class|interface|enum|record|@interface)\s+(?P<name>\w+)")),
+    ],
+    "kotlin": [
+        ("class", re.compile(r"^\s*(?:(?:public|private|protected|internal|open|abstract|sealed|data|inner|enum)\s+)*(?:class|interface|object)\s+(?P<name>\w+)")),
+        ("function", re.compile(r"^\s*(?:(?:public|private|protected|internal|open|override|suspend|inline)\s+)*fun\s+(?:<[^>]*>\s*)?(?:[\w.]+\.)?(?P<name>\w+)\s*\(")),
+    ],
+    "swift": [
+        ("class", re.compile(r"^\s*(?:(?:public|private|fileprivate|internal|open|final)\s+)*(?:class|struct|enum|protocol|extension|actor)\s+(?P<name>\w+)")),
+        ("function", re.compile(r"^\s*(?:(?:public|private|fileprivate|internal|open|override|static|class|mutating)\s+)*func\s+(?P<name>\w+)")),
+    ],
+    "c": [
+        ("struct", re.compile(r"^\s*(?:typedef\s+)?(?:struct|union|enum)\s+(?P<name>\w+)\s*\{?\s*$")),
+    ],
+    "cpp": [
+        ("class", re.compile(r"^\s*(?:template\s*<[^>]*>\s*)?(?:class|struct|union|enum(?:\s+class)?)\s+(?P<name>\w+)[^;]*$")),
+        ("namespace", re.compile(r"^\s*namespace\s+(?P<name>[\w:]+)")),
+    ],
+    "bash": [
+        ("function", re.compile(r"^\s*(?:function\s+)?(?P<name>[\w-]+)\s*\(\)\s*\{?")),
+        ("function", re.compile(r"^\s*function\s+(?P<name>[\w-]+)\s*\{?")),
+    ],
+    "sql": [
+        ("table", re.compile(r"^\s*create\s+(?:or\s+replace\s+)?(?:temporary\s+)?(?:table|view|function|procedure|index|trigger)\s+(?:if\s+not\s+exists\s+)?(?P<name>[\w.\"`]+)", re.IGNORECASE)),
+    ],
+    "toml": [
+        ("section", re.compile(r"^\[\[?(?P<name>[^\]]+)\]\]?\s*$")),
+    ],
+    "yaml": [
+        ("key", re.compile(r"^(?P<name>[\w][\w.-]*):(?:\s|$)")),
+    ],
+    "css": [
+        ("rule", re.compile(r"^(?P<name>[^\s{/][^{]*?)\s*\{\s*$")),
+    ],
+}
+_PATTERNS["python_fallback"] = [
+    ("class", re.compile(r"^\s*class\s+(?P<name>\w+)")),
+    ("function", re.compile(r"^\s*(?:async\s+)?def\s+(?P<name>\w+)")),
+]
+
+_PATTERNS["jsx"] = _PATTERNS["javascript"]
+_PATTERNS["typescript"] = _PATTERNS["javascript"]
+_PATTERNS["tsx"] = _PATTERNS["javascript"]
+
+_C_LIKE = {"c", "cpp", "java", "kotlin", "swift"}
+_BRACED = {"javascript", "jsx", "typescript", "tsx", "rust", "go", "java", "kotlin", "swift", "c", "cpp", "bash", "css"}
+
+SUPPORTED_LANGUAGES = (frozenset(_PATTERNS) - {"python_fallback"}) | {"python", "markdown"}
+
+
+def _python_signature(node : ast.AST) -> str:
+    if isinstance(node, ast.ClassDef):
+        bases = [ast.unparse(base) for base in node.bases]
+        bases += [ast.unparse(keyword) for keyword in node.keywords]
+        return f"class {node.name}({', '.join(bases)})" if bases else f"class {node.name}"
+
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    signature = f"{prefix} {node.name}({ast.unparse(node.args)})"
+    if node.returns is not None:
+        signature += f" -> {ast.unparse(node.returns)}"
+    return signature
+
+
+def _outline_python(text : str) -> list[Symbol]:
+    tree = ast.parse(text)
+    symbols : list[Symbol] = []
+
+    def visit(body : list[ast.stmt], depth : int, in_class : bool) -> None:
+        for node in body:
+            if not isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+
+            if isinstance(node, ast.ClassDef):
+                kind = "class"
+            else:
+                kind = "method" if in_class else "function"
+
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            symbols.append(
+                Symbol(kind, node.name, _python_signature(node), start, node.end_lineno or node.lineno, depth)
+            )
+
+            if isinstance(node, ast.ClassDef):
+                visit(node.body, depth + 1, True)
+            elif depth == 0:
+                visit(node.body, depth + 1, False)
+
+    visit(tree.body, 0, False)
+    return symbols
+
+
+def _outline_markdown(lines : list[str]) -> list[Symbol]:
+    headings : list[tuple[int, int, str]] = []
+    in_fence = False
+
+    for number, line in enumerate(lines, start=1):
+        if line.lstrip().startswith(("```", "~~~")):
+            in_fence = not in_fence
+            continue
+        if in_fence:
+            continue
+        match = re.match(r"^(#{1,6})\s+(.+?)\s*#*\s*$", line)
+        if match:
+            headings.append((number, len(match.group(1)), match.group(2)))
+
+    symbols = []
+    for index, (number, level, title) in enumerate(headings):
+        end = len(lines)
+        for next_number, next_level, _ in headings[index + 1 :]:
+            if next_level <= level:
+                end = next_number - 1
+                break
+        symbols.append(Symbol("heading", title, f"{'#' * level} {title}", number, end, level - 1))
+
+    return symbols
+
+
+def _brace_delta(line : str) -> int:
+    line = re.sub(r"\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*'|//.*$", "", line)
+    return line.count("{") - line.count("}")
+
+
+def _outline_regex(lines : list[str], language : str) -> list[Symbol]:
+    patterns = _PATTERNS.get(language, [])
+    braced = language in _BRACED
+    found : list[tuple[int, str, str, str]] = []
+    ends : dict[int, int] = {}
+    open_stack : list[list] = []
+    depth = 0
+    in_block_comment = False
+
+    for number, line in enumerate(lines, start=1):
+        stripped = line.strip()
+        if in_block_comment:
+            if "*/" in stripped:
+                in_block_comment = False
+            continue
+        if stripped.startswith("/*") and "*/" not in stripped:
+            in_block_comment = True
+            continue
+        if stripped.startswith(("//", "#", "*", "--")) and language not in ("toml", "yaml", "css"):
+            continue
+
+        match_kind = None
+        match_name = None
+        for kind, pattern in patterns:
+            match = pattern.match(line)
+            if match and match.group("name") not in _CONTROL:
+                match_kind, match_name = kind, match.group("name").strip()
+                break
+
+        if match_kind is None and language in _C_LIKE:
+            match = _C_LIKE_FUNCTION.match(line)
+            if match and match.group("name") not in _CONTROL and not stripped.startswith(("return", "else", "new ")):
+                match_kind, match_name = "function", match.group("name")
+
+        if match_kind:
+            found.append((number, match_kind, match_name, stripped.rstrip("{ ").strip()))
+            while open_stack and not open_stack[-1][2] and open_stack[-1][1] >= depth:
+                ends[open_stack.pop()[0]] = number - 1
+            open_stack.append([number, depth, False])
+
+        if not braced:
+            continue
+
+        delta = _brace_delta(line)
+        depth = max(0, depth + delta)
+        if match_kind and delta == 0 and "{" in line:
+            ends[open_stack.pop()[0]] = number
+            continue
+
+        for entry in open_stack:
+            if depth > entry[1]:
+                entry[2] = True
+        while open_stack and open_stack[-1][2] and depth <= open_stack[-1][1]:
+            ends[open_stack.pop()[0]] = number
+
+    symbols = []
+    nesting : list[int] = []
+    for index, (number, kind, name, signature) in enumerate(found):
+        if braced:
+            end = max(number, ends.get(number, len(lines)))
+        else:
+            end = found[index + 1][0] - 1 if index + 1 < len(found) else len(lines)
+
+        while nesting and nesting[-1] < number:
+            nesting.pop()
+        symbols.append(Symbol(kind, name, signature[:160], number, end, len(nesting)))
+        if end > number:
+            nesting.append(end)
+
+    return symbols
+
+
+def outline_source(text : str, language : str) -> list[Symbol]:
+    if language == "python":
+        return _outline_python(text)
+
+    lines = text.splitlines()
+    if language == "markdown":
+        return _outline_markdown(lines)
+
+    return _outline_regex(lines, language)
+
+
+def _identity(st : os.stat_result) -> tuple[int, int, int, int]:
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _parse(path : str, language : str) -> FileOutline:
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError as e:
+        return FileOutline(path, language, 0, (), error=str(e))
+
+    total_lines = text.count("\n") + (0 if text.endswith("\n") or not text else 1)
+    try:
+        symbols = outline_source(text, language)
+    except (SyntaxError, ValueError, RecursionError) as e:
+        if language != "python":
+            return FileOutline(path, language, total_lines, (), error=str(e))
+        symbols = _outline_regex(text.splitlines(), "python_fallback")
+        return FileOutline(path, language, total_lines, tuple(symbols), error=f"syntax error: {e}")
+
+    return FileOutline(path, language, total_lines, tuple(symbols))
+
+
+class OutlineCache:
+    """LRU of parsed outlines keyed by path and validated by file identity.
+
+    An entry is reused only while (device, inode, size, mtime) is unchanged,
+    so stale outlines are never returned even without invalidation events.
+    """
+
+    def __init__(self, max_entries : int = 4096) -> None:
+        self.max_entries = max_entries
+        self._entries : OrderedDict[str, tuple[tuple[int, int, int, int], FileOutline]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path : Union[str, Path]) -> FileOutline:
+        return self.get_many([path])[0]
+
+    def get_many(
+        self,
+        paths : Sequence[Union[str, Path]],
+        map_fn : Callable[..., Iterable[FileOutline]] = map,
+    ) -> list[FileOutline]:
+        """Outline ``paths`` in order, parsing only the cache misses.
+
+        Misses are parsed with ``map_fn(_parse, paths, languages)``; passing a
+        process pool's ``map`` spreads a cold tree over every core.
+        """
+        outlines : list[Optional[FileOutline]] = [None] * len(paths)
+        misses : list[tuple[int, str, str, tuple[int, int, int, int]]] = []
+
+        for i, path in enumerate(paths):
+            path = str(path)
+            language = guess_language(path)
+            try:
+                identity = _identity(os.stat(path))
+            except OSError as e:
+                outlines[i] = FileOutline(path, language, 0, (), error=str(e))
+                continue
+
+            with self._lock:
+                cached = self._entries.get(path)
+                if cached and cached[0] == identity:
+                    self._entries.move_to_end(path)
+                    outlines[i] = cached[1]
+                    continue
+            misses.append((i, path, language, identity))
+
+        if misses:
+            parsed = map_fn(_parse, [m[1] for m in misses], [m[2] for m in misses])
+            for (i, path, _, identity), outline in zip(misses, parsed):
+                self.put(path, identity, outline)
+                outlines[i] = outline
+
+        return outlines
+
+    def put(self, path : str, identity : tuple[int, int, int, int], outline : FileOutline) -> None:
+        with self._lock:
+            self._entries[path] = (identity, outline)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, paths : Optional[list[Path]] = None) -> None:
+        with self._lock:
+            if paths is None:
+                self._entries.clear()
+                return
+            for path in paths:
+                self._entries.pop(str(path), None)
+
+
+outline_cache = OutlineCache()
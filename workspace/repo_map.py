@@ -0,0 +1,440 @@
+from __future__ import annotations
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import astuple, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional, Union
+from utils.paths import cache_dir, guess_language
+from utils.text import count_token
+from workspace.outline import SUPPORTED_LANGUAGES, Symbol, outline_cache
+from workspace.snapshot import KIND_FILE, get_snapshot
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+if TYPE_CHECKING:
+    from workspace.watcher import WorkspaceChange, WorkspaceWatcher
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+MAP_LANGUAGES = SUPPORTED_LANGUAGES - {"markdown", "toml", "yaml", "css", "sql"}
+
+MAX_FILES = 5000
+MAX_FILE_BYTES = 512 * 1024
+MAX_WORKERS = min(8, os.cpu_count() or 4)
+
+DAMPING = 0.85
+ITERATIONS = 50
+TOLERANCE = 1e-8
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+
+@dataclass(frozen=True)
+class FileTags:
+    identity : tuple[int, int, int, int]
+    defines : dict[str, Symbol]
+    references : Counter
+
+
+def _tag_file(path : str) -> Optional[FileTags]:
+    """Tags for ``path``; files too large or unreadable get empty ones, so
+    they are not retried until they change. None if ``path`` is gone."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    try:
+        if st.st_size > MAX_FILE_BYTES:
+            raise OSError("too large")
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError:
+        return FileTags(identity, {}, Counter())
+
+    defines : dict[str, Symbol] = {}
+    for symbol in outline_cache.get(path).symbols:
+        if symbol.name.isidentifier():
+            defines.setdefault(symbol.name, symbol)
+
+    return FileTags(
+        identity = identity,
+        defines = defines,
+        references = Counter(_IDENTIFIER.findall(text)),
+    )
+
+
+def _cache_file(root : Path) -> Path:
+    name = hashlib.sha256(str(root).encode()).hexdigest()[:32]
+    return cache_dir("repo_map") / f"{name}.json"
+
+
+def pagerank(
+    size : int,
+    edges : list[tuple[int, int, float]],
+    damping : float = DAMPING,
+) -> list[float]:
+    """Weighted PageRank over ``size`` nodes.
+
+    Uses NumPy when it is installed and falls back to the same power
+    iteration in pure Python otherwise.
+    """
+    if size == 0:
+        return []
+
+    out_weight = [0.0] * size
+    for src, _, weight in edges:
+        out_weight[src] += weight
+
+    try:
+        import numpy as np
+    except ImportError:
+        return _pagerank_python(size, edges, out_weight, damping)
+
+    if not edges:
+        return [1.0 / size] * size
+
+    src = np.fromiter((e[0] for e in edges), dtype=np.int64, count=len(edges))
+    dst = np.fromiter((e[1] for e in edges), dtype=np.int64, count=len(edges))
+    weight = np.fromiter((e[2] for e in edges), dtype=np.float64, count=len(edges))
+    totals = np.asarray(out_weight)
+    weight = weight / totals[src]
+    dangling = totals == 0
+
+    rank = np.full(size, 1.0 / size)
+    for _ in range(ITERATIONS):
+        spread = np.bincount(dst, weights=rank[src] * weight, minlength=size)
+        updated = (1.0 - damping) / size + damping * (spread + rank[dangling].sum() / size)
+        if np.abs(updated - rank).sum() < TOLERANCE:
+            rank = updated
+            break
+        rank = updated
+
+    return rank.tolist()
+
+
+def _pagerank_python(
+    size : int,
+    edges : list[tuple[int, int, float]],
+    out_weight : list[float],
+    damping : float,
+) -> list[float]:
+    normalized = [(src, dst, weight / out_weight[src]) for src, dst, weight in edges]
+    dangling = [i for i in range(size) if out_weight[i] == 0]
+
+    rank = [1.0 / size] * size
+    for _ in range(ITERATIONS):
+        spread = [0.0] * size
+        for src, dst, weight in normalized:
+            spread[dst] += rank[src] * weight
+        leak = sum(rank[i] for i in dangling) / size
+        updated = [(1.0 - damping) / size + damping * (s + leak) for s in spread]
+        delta = sum(abs(a - b) for a, b in zip(updated, rank))
+        rank = updated
+        if delta < TOLERANCE:
+            break
+
+    return rank
+
+
+class RepoMap:
+    """Ranked map of the most referenced definitions under ``root``.
+
+    Files are tagged once with their definitions (from the outline cache)
+    and identifier references; tags are kept per file, stored on disk
+    between runs with the rendered map, and only recomputed when a file's
+    identity changes, so a warm start on an unchanged tree costs a stat per
+    file rather than a parse and a ranking. A file graph with an edge from every
+    referencing file to the file defining the name is ranked with PageRank,
+    and each file's rank is shared out to the definitions it points at.
+
+    While a reliable watcher covers ``root`` (see ``watch_repo_maps``), a
+    refresh only stats files it reported as changed, plus new ones.
+    """
+
+    def __init__(self, root : Union[str, Path], model : Optional[str] = None) -> None:
+        self.root = Path(root).resolve()
+        self.model = model
+        self._tags : dict[str, FileTags] = {}
+        self._ranked : Optional[list[tuple[float, str, Symbol]]] = None
+        self._rendered : dict[int, str] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.watched = False
+        self._verified = False
+        self._dirty : set[str] = set()
+        self._overflows = 0
+        # taken by watcher callbacks on the event loop; never held for long
+        self._dirty_lock = threading.Lock()
+
+    def _candidates(self) -> list[str]:
+        snapshot, rel = get_snapshot(self.root)
+        snapshot.refresh(rel)
+
+        files = []
+        for entry in snapshot.iter_entries(rel):
+            if entry.kind == KIND_FILE and guess_language(entry.path) in MAP_LANGUAGES:
+                files.append(str(snapshot.root / entry.path))
+                if len(files) >= MAX_FILES:
+                    break
+        return files
+
+    def _load(self) -> None:
+        """Seed the tags from the previous run; refresh() re-tags what changed since."""
+        try:
+            with open(_cache_file(self.root), encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") != CACHE_VERSION:
+                return
+            for path, (identity, defines, references) in cached["files"].items():
+                self._tags[path] = FileTags(
+                    identity = tuple(identity),
+                    defines = {name: Symbol(*fields) for name, fields in defines.items()},
+                    references = Counter(references),
+                )
+            self._rendered = {int(budget): text for budget, text in cached["rendered"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self._tags.clear()
+            self._rendered.clear()
+
+    def _save(self) -> None:
+        files = {
+            path: [
+                tags.identity,
+                {name: astuple(symbol) for name, symbol in tags.defines.items()},
+                tags.references,
+            ]
+            for path, tags in self._tags.items()
+        }
+        try:
+            cache_file = _cache_file(self.root)
+            tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(
+                json.dumps(
+                    {"version" : CACHE_VERSION, "files" : files, "rendered" : self._rendered},
+                    separators=(",", ":"),
+                ),
+                encoding="utf-8",
+            )
+            os.replace(tmp, cache_file)
+        except OSError:
+            logger.debug("Could not write repository map cache", exc_info=True)
+
+    def refresh(self) -> bool:
+        """Re-tag changed files; returns True if the ranking must be rebuilt."""
+        if not self._loaded:
+            self._loaded = True
+            self._load()
+
+        files = self._candidates()
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+            trusted = self.watched and self._verified
+            watched = self.watched
+            overflows = self._overflows
+
+        if trusted:
+            check = [path for path in files if path in dirty or path not in self._tags]
+        else:
+            check = files
+
+        stale = []
+        for path in check:
+            tags = self._tags.get(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if tags is None or tags.identity != (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns):
+                stale.append(path)
+
+        removed = self._tags.keys() - set(files)
+        for path in removed:
+            del self._tags[path]
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+                for path, tags in zip(stale, pool.map(_tag_file, stale)):
+                    if tags is None:
+                        self._tags.pop(path, None)
+                    else:
+                        self._tags[path] = tags
+
+        with self._dirty_lock:
+            # a full pass while watched makes the watcher's reports enough
+            if watched and not trusted and self.watched and overflows == self._overflows:
+                self._verified = True
+
+        changed = bool(stale or removed)
+        if changed:
+            self._ranked = None
+            self._rendered.clear()
+        return changed
+
+    def invalidate(self, change : WorkspaceChange) -> None:
+        with self._dirty_lock:
+            if change.overflow:
+                self._verified = False
+                self._overflows += 1
+            else:
+                self._dirty.update(str(path) for path in change.paths)
+
+    def _rank(self) -> list[tuple[float, str, Symbol]]:
+        paths = sorted(path for path, tags in self._tags.items() if tags.defines or tags.references)
+        index = {path: i for i, path in enumerate(paths)}
+
+        definers : dict[str, list[str]] = defaultdict(list)
+        for path in paths:
+            for name in self._tags[path].defines:
+                definers[name].append(path)
+
+        edges : list[tuple[int, int, float]] = []
+        targets : list[tuple[int, str, str, float]] = []
+        for path in paths:
+            src = index[path]
+            for name, count in self._tags[path].references.items():
+                owners = definers.get(name)
+                if not owners:
+                    continue
+                multiplier = 0.1 if name.startswith("_") or len(owners) > 5 else 1.0
+                weight = multiplier * math.sqrt(count) / len(owners)
+                for owner in owners:
+                    if owner == path:
+                        continue
+                    edges.append((src, index[owner], weight))
+                    targets.append((src, owner, name, weight))
+
+        rank = pagerank(len(paths), edges)
+
+        out_weight = [0.0] * len(paths)
+        for src, _, weight in edges:
+            out_weight[src] += weight
+
+        scores : dict[tuple[str, str], float] = defaultdict(float)
+        for src, owner, name, weight in targets:
+            scores[(owner, name)] += rank[src] * weight / out_weight[src]
+
+        ranked = [
+            (score, owner, self._tags[owner].defines[name])
+            for (owner, name), score in scores.items()
+        ]
+        ranked.sort(key=lambda item: (-item[0], item[1], item[2].start))
+        return ranked
+
+    def _render_top(self, ranked : list[tuple[float, str, Symbol]]) -> str:
+        by_file : dict[str, list[Symbol]] = defaultdict(list)
+        for _, path, symbol in ranked:
+            by_file[path].append(symbol)
+
+        blocks = []
+        for path in sorted(by_file):
+            chosen = by_file[path]
+            shown = [
+                symbol
+                for symbol in outline_cache.get(path).symbols
+                if symbol in chosen or any(
+                    symbol.depth < c.depth and symbol.start <= c.start and c.end <= symbol.end
+                    for c in chosen
+                )
+            ]
+
+            rel = os.path.relpath(path, self.root)
+            lines = [f"{rel}:"]
+            for symbol in shown or chosen:
+                indent = "  " * (symbol.depth + 1)
+                lines.append(f"{indent}{symbol.signature}  [{symbol.start}-{symbol.end}]")
+            blocks.append("\n".join(lines))
+
+        return "\n".join(blocks)
+
+    def render(self, max_tokens : int) -> str:
+        """Render as many top-ranked definitions as fit in ``max_tokens``."""
+        with self._lock:
+            self.refresh()
+            if max_tokens in self._rendered:
+                return self._rendered[max_tokens]
+
+            if self._ranked is None:
+                self._ranked = self._rank()
+            ranked = self._ranked
+
+            best = ""
+            low, high = 1, len(ranked)
+            while low <= high:
+                middle = (low + high) // 2
+                text = self._render_top(ranked[:middle])
+                if count_token(text, self.model) <= max_tokens:
+                    best = text
+                    low = middle + 1
+                else:
+                    high = middle - 1
+
+            self._rendered[max_tokens] = best
+            self._save()
+            return best
+
+
+_maps : dict[Path, RepoMap] = {}
+_maps_lock = threading.Lock()
+_watched_roots : set[Path] = set()
+
+
+def _is_watched(root : Path) -> bool:
+    return any(watched == root or watched in root.parents for watched in _watched_roots)
+
+
+def get_repo_map(root : Union[str, Path], model : Optional[str] = None) -> RepoMap:
+    root = Path(root).resolve()
+    with _maps_lock:
+        repo_map = _maps.get(root)
+        if repo_map is None:
+            repo_map = _maps[root] = RepoMap(root, model)
+            repo_map.watched = _is_watched(root)
+        return repo_map
+
+
+def watch_repo_maps(watcher : WorkspaceWatcher) -> Callable[[], None]:
+    """Route ``watcher`` events into every repository map below its root.
+
+    Only a reliable watcher lets maps skip stat'ing unchanged files.
+    """
+    root = watcher.root
+
+    def covered() -> list[RepoMap]:
+        return [
+            repo_map
+            for map_root, repo_map in _maps.items()
+            if map_root == root or root in map_root.parents
+        ]
+
+    def on_change(change : WorkspaceChange) -> None:
+        with _maps_lock:
+            maps = covered()
+        for repo_map in maps:
+            repo_map.invalidate(change)
+
+    with _maps_lock:
+        if watcher.reliable:
+            _watched_roots.add(root)
+            for repo_map in covered():
+                repo_map.watched = True
+
+    unsubscribe = watcher.subscribe(on_change)
+
+    def detach() -> None:
+        unsubscribe()
+        with _maps_lock:
+            _watched_roots.discard(root)
+            for repo_map in covered():
+                with repo_map._dirty_lock:
+                    repo_map.watched = _is_watched(repo_map.root)
+                    repo_map._verified = False
+
+    return detach
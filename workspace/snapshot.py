@@ -0,0 +1,516 @@
+from __future__ import annotations
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, NamedTuple, Optional, Union
+from utils.paths import cache_dir, find_git_root
+import atexit
+import base64
+import hashlib
+import json
+import logging
+import os
+import stat
+import threading
+import time
+
+if TYPE_CHECKING:
+    from workspace.watcher import WorkspaceChange, WorkspaceWatcher
+
+KIND_FILE = 0
+KIND_DIR = 1
+KIND_SYMLINK = 2
+KIND_OTHER = 3
+
+DEFAULT_IGNORES = (
+    ".git",
+    ".hg",
+    ".svn",
+    "node_modules",
+    "__pycache__",
+    ".venv",
+    "venv",
+    ".mypy_cache",
+    ".pytest_cache",
+    ".ruff_cache",
+    ".tox",
+    ".nox",
+    ".idea",
+    ".DS_Store",
+    "*.egg-info",
+)
+
+MAX_WORKERS = min(16, (os.cpu_count() or 4) * 2)
+CACHE_VERSION = 1
+# later changes are written at most this often, and once more at exit
+SAVE_INTERVAL = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+class IgnoreRules:
+    def __init__(self, patterns : list[str]) -> None:
+        self.patterns = patterns
+        self._name_patterns : list[tuple[str, bool]] = []
+        self._path_patterns : list[tuple[str, bool]] = []
+
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith("#") or pattern.startswith("!"):
+                continue
+
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+
+            if "/" in pattern:
+                self._path_patterns.append((pattern.lstrip("/"), dir_only))
+            else:
+                self._name_patterns.append((pattern, dir_only))
+
+    @classmethod
+    def for_root(cls, root : Path) -> IgnoreRules:
+        patterns = list(DEFAULT_IGNORES)
+        try:
+            patterns.extend(
+                (root / ".gitignore").read_text(encoding="utf-8").splitlines()
+            )
+        except (OSError, UnicodeDecodeError):
+            pass
+
+        return cls(patterns)
+
+    def is_ignored(self, rel_path : str, name : str, is_dir : bool) -> bool:
+        for pattern, dir_only in self._name_patterns:
+            if dir_only and not is_dir:
+                continue
+            if fnmatch(name, pattern):
+                return True
+
+        for pattern, dir_only in self._path_patterns:
+            if dir_only and not is_dir:
+                continue
+            if fnmatch(rel_path, pattern):
+                return True
+
+        return False
+
+
+@dataclass
+class DirTable:
+    mtime_ns : int
+    names : list[str] = field(default_factory=list)
+    sizes : array = field(default_factory=lambda: array("q"))
+    mtimes : array = field(default_factory=lambda: array("d"))
+    kinds : array = field(default_factory=lambda: array("b"))
+
+    def append(self, name : str, size : int, mtime : float, kind : int) -> None:
+        self.names.append(name)
+        self.sizes.append(size)
+        self.mtimes.append(mtime)
+        self.kinds.append(kind)
+
+    def subdirs(self) -> set[str]:
+        return {
+            name
+            for name, kind in zip(self.names, self.kinds)
+            if kind == KIND_DIR
+        }
+
+
+class Entry(NamedTuple):
+    path : str
+    size : int
+    mtime : float
+    kind : int
+
+    @property
+    def is_dir(self) -> bool:
+        return self.kind == KIND_DIR
+
+
+def _join(rel : str, name : str) -> str:
+    return f"{rel}/{name}" if rel else name
+
+
+def _within(rel : str, base : str) -> bool:
+    return not base or rel == base or rel.startswith(base + "/")
+
+
+def _pack(values : array) -> str:
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _unpack(typecode : str, text : str) -> array:
+    values = array(typecode)
+    values.frombytes(base64.b64decode(text))
+    return values
+
+
+def _cache_file(root : Path) -> Path:
+    name = hashlib.sha256(str(root).encode()).hexdigest()[:32]
+    return cache_dir("snapshot") / f"{name}.json"
+
+
+def _kind_of(mode : int) -> int:
+    if stat.S_ISDIR(mode):
+        return KIND_DIR
+    if stat.S_ISREG(mode):
+        return KIND_FILE
+    if stat.S_ISLNK(mode):
+        return KIND_SYMLINK
+    return KIND_OTHER
+
+
+class WorkspaceSnapshot:
+    """Incrementally refreshed table of every entry below ``root``.
+
+    Each directory is stored as one ``DirTable`` keyed by its posix path
+    relative to ``root``. A refresh only re-scans directories whose mtime
+    changed since they were last read. While a reliable watcher covers the
+    subtree ``watched`` (relative to ``root``), refreshes inside it only
+    re-scan directories the watcher reported as dirty and stat nothing.
+
+    The tables are stored on disk, so a new process starts from the last
+    one's and only re-scans what changed in between.
+    """
+
+    def __init__(self, root : Path, max_entries : int = 200_000) -> None:
+        self.root = root
+        self.max_entries = max_entries
+        self.ignore = IgnoreRules.for_root(root)
+        self.complete = True
+        self.watched : Optional[str] = None
+        self._verified = False
+        self._loaded = False
+        self._changed = False
+        self._saved_at = 0.0
+        self._dirty : set[str] = set()
+        self._dirs : dict[str, DirTable] = {}
+        self._entry_count = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=MAX_WORKERS,
+            thread_name_prefix="snapshot",
+        )
+
+    def _abs(self, rel : str) -> Path:
+        return self.root / rel if rel else self.root
+
+    def _dir_mtime(self, rel : str) -> Optional[int]:
+        try:
+            return os.stat(self._abs(rel)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan(self, rel : str) -> tuple[str, Optional[DirTable]]:
+        try:
+            table = DirTable(mtime_ns=os.stat(self._abs(rel)).st_mtime_ns)
+            with os.scandir(self._abs(rel)) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+
+                    kind = _kind_of(st.st_mode)
+                    if self.ignore.is_ignored(
+                        _join(rel, entry.name), entry.name, kind == KIND_DIR
+                    ):
+                        continue
+
+                    table.append(entry.name, st.st_size, st.st_mtime, kind)
+        except OSError:
+            return rel, None
+
+        return rel, table
+
+    def _drop(self, rel : str) -> None:
+        prefix = rel + "/"
+        for key in [k for k in self._dirs if k == rel or k.startswith(prefix)]:
+            self._entry_count -= len(self._dirs.pop(key).names)
+
+    def _load(self) -> None:
+        try:
+            with open(_cache_file(self.root), encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") != CACHE_VERSION or cached.get("ignore") != self.ignore.patterns:
+                return
+            dirs = {
+                rel: DirTable(mtime_ns, names, _unpack("q", sizes), _unpack("d", mtimes), _unpack("b", kinds))
+                for rel, (mtime_ns, names, sizes, mtimes, kinds) in cached["dirs"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+
+        self._dirs = dirs
+        self._entry_count = sum(len(table.names) for table in dirs.values())
+
+    def _save(self) -> None:
+        self._changed = False
+        self._saved_at = time.monotonic()
+        if not self.complete:
+            return
+
+        dirs = {
+            rel: [table.mtime_ns, table.names, _pack(table.sizes), _pack(table.mtimes), _pack(table.kinds)]
+            for rel, table in self._dirs.items()
+        }
+        try:
+            cache_file = _cache_file(self.root)
+            tmp = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(
+                json.dumps(
+                    {"version" : CACHE_VERSION, "ignore" : self.ignore.patterns, "dirs" : dirs},
+                    separators=(",", ":"),
+                ),
+                encoding="utf-8",
+            )
+            os.replace(tmp, cache_file)
+        except OSError:
+            logger.debug("Could not write workspace snapshot cache", exc_info=True)
+
+    def save(self) -> None:
+        """Write the tables to disk if they changed since the last save."""
+        with self._lock:
+            if self._changed:
+                self._save()
+
+    def _walk(self, rels : list[str]) -> None:
+        self._changed = True
+        frontier = rels
+        while frontier:
+            if self._entry_count >= self.max_entries:
+                self.complete = False
+                return
+
+            next_frontier : list[str] = []
+            for rel, table in self._executor.map(self._scan, frontier):
+                old = self._dirs.get(rel)
+                if table is None:
+                    self._drop(rel)
+                    continue
+
+                old_subdirs = old.subdirs() if old else set()
+                new_subdirs = table.subdirs()
+
+                for name in old_subdirs - new_subdirs:
+                    self._drop(_join(rel, name))
+
+                if old:
+                    self._entry_count -= len(old.names)
+                self._entry_count += len(table.names)
+                self._dirs[rel] = table
+
+                next_frontier.extend(
+                    _join(rel, name)
+                    for name in new_subdirs
+                    if _join(rel, name) not in self._dirs
+                )
+
+            frontier = next_frontier
+
+    def _under(self, rel : str) -> list[str]:
+        if not rel:
+            return list(self._dirs)
+
+        prefix = rel + "/"
+        return [k for k in self._dirs if k == rel or k.startswith(prefix)]
+
+    def refresh(self, rel : str = "") -> None:
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                self._load()
+            self._refresh(rel)
+            if self._changed and time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+                self._save()
+
+    def _refresh(self, rel : str) -> None:
+        if rel not in self._dirs:
+            self._walk([rel])
+            return
+
+        if self.watched is not None and self._verified and _within(rel, self.watched):
+            changed = [
+                key
+                for key in self._dirty
+                if key in self._dirs and _within(key, rel)
+            ]
+            self._dirty.difference_update(changed)
+        else:
+            rels = self._under(rel)
+            changed = [
+                key
+                for key, mtime in zip(rels, self._executor.map(self._dir_mtime, rels))
+                if mtime != self._dirs[key].mtime_ns
+            ]
+            # a stat pass over the whole watched subtree makes it trustworthy
+            if self.watched is not None and _within(self.watched, rel):
+                self._verified = True
+
+        if changed:
+            self._walk(changed)
+
+    def invalidate(self, change : WorkspaceChange) -> None:
+        with self._lock:
+            if change.overflow:
+                self._verified = False
+                return
+
+            for path in change.paths:
+                try:
+                    rel = path.relative_to(self.root).as_posix()
+                except ValueError:
+                    continue
+
+                if rel == ".":
+                    rel = ""
+                if rel in self._dirs:
+                    self._dirty.add(rel)
+                if rel:
+                    self._dirty.add(rel.rsplit("/", 1)[0] if "/" in rel else "")
+
+    def iter_entries(
+        self,
+        rel : str = "",
+        max_depth : Optional[int] = None,
+    ) -> Iterator[Entry]:
+        """Yield entries below ``rel`` depth first, sorted by name."""
+        stack : list[tuple[str, Iterator[tuple]]] = [(rel, self._rows(rel))]
+
+        while stack:
+            current, rows = stack[-1]
+            row = next(rows, None)
+            if row is None:
+                stack.pop()
+                continue
+
+            name, size, mtime, kind = row
+            path = _join(current, name)
+            yield Entry(path, size, mtime, kind)
+
+            if kind == KIND_DIR and (max_depth is None or len(stack) < max_depth):
+                stack.append((path, self._rows(path)))
+
+    def _rows(self, rel : str) -> Iterator[tuple]:
+        table = self._dirs.get(rel)
+        if table is None:
+            return iter(())
+
+        return iter(
+            sorted(
+                zip(table.names, table.sizes, table.mtimes, table.kinds),
+                key=lambda row: row[0],
+            )
+        )
+
+    def rel_path(self, path : Path) -> Optional[str]:
+        try:
+            rel = path.resolve().relative_to(self.root)
+        except ValueError:
+            return None
+
+        return "" if rel == Path(".") else rel.as_posix()
+
+
+_snapshots : dict[Path, WorkspaceSnapshot] = {}
+_snapshots_lock = threading.Lock()
+_watched_roots : set[Path] = set()
+
+
+def _snapshot_root(path : Path) -> Path:
+    """Snapshots are rooted at the git root, or else the working directory,
+    so nested requests share one snapshot and one ``.gitignore``."""
+    root = find_git_root(path)
+    if root is not None:
+        return root
+    cwd = Path.cwd().resolve()
+    if path == cwd or cwd in path.parents:
+        return cwd
+    return path
+
+
+def _related(a : Path, b : Path) -> bool:
+    return a == b or a in b.parents or b in a.parents
+
+
+def _watched_subtree(root : Path) -> Optional[str]:
+    """The part of the tree at ``root`` a reliable watcher covers, if any."""
+    for watched in _watched_roots:
+        if watched == root or watched in root.parents:
+            return ""
+    for watched in _watched_roots:
+        if root in watched.parents:
+            return watched.relative_to(root).as_posix()
+    return None
+
+
+def get_snapshot(path : Union[str, Path]) -> tuple[WorkspaceSnapshot, str]:
+    """Return the snapshot covering ``path`` and ``path`` relative to its root."""
+    path = Path(path).resolve()
+
+    with _snapshots_lock:
+        for root, snapshot in _snapshots.items():
+            if path == root or root in path.parents:
+                return snapshot, snapshot.rel_path(path) or ""
+
+        root = _snapshot_root(path)
+        # a snapshot further up replaces the ones below it
+        for nested in [r for r in _snapshots if root in r.parents]:
+            del _snapshots[nested]
+        snapshot = WorkspaceSnapshot(root)
+        snapshot.watched = _watched_subtree(root)
+        _snapshots[root] = snapshot
+        return snapshot, snapshot.rel_path(path) or ""
+
+
+def _save_all() -> None:
+    with _snapshots_lock:
+        snapshots = list(_snapshots.values())
+    for snapshot in snapshots:
+        snapshot.save()
+
+
+atexit.register(_save_all)
+
+
+def attach_watcher(watcher : WorkspaceWatcher) -> Callable[[], None]:
+    """Route ``watcher`` events into every snapshot overlapping its root.
+
+    Snapshots only skip their stat pass when the watcher is reliable, since
+    a polling watcher may lag behind the filesystem.
+    """
+    root = watcher.root
+
+    def covered() -> list[WorkspaceSnapshot]:
+        return [
+            snapshot
+            for snapshot_root, snapshot in _snapshots.items()
+            if _related(snapshot_root, root)
+        ]
+
+    def on_change(change : WorkspaceChange) -> None:
+        with _snapshots_lock:
+            snapshots = covered()
+        for snapshot in snapshots:
+            snapshot.invalidate(change)
+
+    with _snapshots_lock:
+        if watcher.reliable:
+            _watched_roots.add(root)
+            for snapshot in covered():
+                snapshot.watched = _watched_subtree(snapshot.root)
+
+    unsubscribe = watcher.subscribe(on_change)
+
+    def detach() -> None:
+        unsubscribe()
+        with _snapshots_lock:
+            _watched_roots.discard(root)
+            for snapshot in covered():
+                snapshot.watched = _watched_subtree(snapshot.root)
+                snapshot._verified = False
+
+    return detach
@@ -0,0 +1,367 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+import atexit
+import csv
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+BATCH_SIZE = 10_000
+SNIFF_BYTES = 64 * 1024
+
+TEXT_FORMATS = {
+    ".csv" : "csv",
+    ".tsv" : "tsv",
+    ".tab" : "tsv",
+    ".jsonl" : "jsonl",
+    ".ndjson" : "jsonl",
+}
+
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+csv.field_size_limit(2**31 - 1)
+
+
+class QueryError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class LoadedTable:
+    path : str
+    table : str
+    columns : tuple[str, ...]
+    rows : int
+    identity : tuple[int, int, int, int]
+    load_seconds : float
+
+
+def table_format(path : Union[str, Path]) -> Optional[str]:
+    return TEXT_FORMATS.get(Path(path).suffix.lower())
+
+
+def table_alias(path : Union[str, Path], taken : set[str]) -> str:
+    """SQL-friendly name for ``path``: its stem with non-word characters replaced."""
+    alias = re.sub(r"\W+", "_", Path(path).stem).strip("_").lower() or "data"
+    if alias[0].isdigit():
+        alias = f"t_{alias}"
+
+    candidate, n = alias, 2
+    while candidate in taken:
+        candidate = f"{alias}_{n}"
+        n += 1
+    return candidate
+
+
+def _column_names(raw : list[str]) -> list[str]:
+    names : list[str] = []
+    seen : set[str] = set()
+    for index, name in enumerate(raw):
+        name = re.sub(r"\s+", "_", (name or "").strip()) or f"column_{index + 1}"
+        candidate, n = name, 2
+        while candidate.lower() in seen:
+            candidate = f"{name}_{n}"
+            n += 1
+        seen.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+
+def quote_identifier(name : str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _cell(value : Any) -> Any:
+    if value == "":
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _batches(rows : Iterator[list[Any]]) -> Iterator[list[list[Any]]]:
+    batch : list[list[Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class TableStore:
+    """SQLite database holding one table per loaded data file.
+
+    The database lives in a temp file rather than in memory so that
+    multi-gigabyte inputs only cost page cache. Tables are reused while
+    the source file's (device, inode, size, mtime) is unchanged.
+    """
+
+    def __init__(self) -> None:
+        self._dir : Optional[str] = None
+        self._conn : Optional[sqlite3.Connection] = None
+        self._tables : dict[str, LoadedTable] = {}
+        self._counter = 0
+        self._lock = threading.RLock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._dir = tempfile.mkdtemp(prefix="ved-tables-")
+            conn = sqlite3.connect(
+                os.path.join(self._dir, "tables.sqlite"),
+                check_same_thread = False,
+                isolation_level = None,
+            )
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA cache_size = -65536")
+            self._conn = conn
+            atexit.register(self.close)
+        return self._conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            if self._dir is not None:
+                shutil.rmtree(self._dir, ignore_errors=True)
+                self._dir = None
+            self._tables.clear()
+
+    def load(self, path : Union[str, Path]) -> LoadedTable:
+        path = str(Path(path).resolve())
+        fmt = table_format(path)
+        if fmt is None:
+            raise QueryError(f"Unsupported data file type: {path}")
+
+        st = os.stat(path)
+        identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+        with self._lock:
+            loaded = self._tables.get(path)
+            if loaded and loaded.identity == identity:
+                return loaded
+
+            conn = self._connection()
+            if loaded:
+                conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(loaded.table)}")
+                del self._tables[path]
+
+            self._counter += 1
+            table = f"file_{self._counter}"
+            started = time.monotonic()
+
+            conn.execute("BEGIN")
+            try:
+                if fmt == "jsonl":
+                    columns, rows = self._load_jsonl(conn, table, path)
+                else:
+                    columns, rows = self._load_csv(conn, table, path, "\t" if fmt == "tsv" else None)
+                conn.execute("COMMIT")
+            except (sqlite3.Error, csv.Error) as e:
+                conn.execute("ROLLBACK")
+                raise QueryError(f"could not load {Path(path).name}: {e}") from None
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            loaded = LoadedTable(
+                path = path,
+                table = table,
+                columns = tuple(columns),
+                rows = rows,
+                identity = identity,
+                load_seconds = time.monotonic() - started,
+            )
+            self._tables[path] = loaded
+            return loaded
+
+    def _load_csv(
+        self,
+        conn : sqlite3.Connection,
+        table : str,
+        path : str,
+        delimiter : Optional[str],
+    ) -> tuple[list[str], int]:
+        with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+            if delimiter is None:
+                sample = f.read(SNIFF_BYTES)
+                f.seek(0)
+                try:
+                    delimiter = csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+                except csv.Error:
+                    delimiter = ","
+
+            reader = csv.reader(f, delimiter=delimiter)
+            header = next(reader, None)
+            if header is None:
+                raise QueryError(f"{path} is empty")
+
+            columns = _column_names(header)
+            width = len(columns)
+            conn.execute(
+                f"CREATE TABLE {quote_identifier(table)} ("
+                + ", ".join(f"{quote_identifier(c)} NUMERIC" for c in columns)
+                + ")"
+            )
+            insert = (
+                f"INSERT INTO {quote_identifier(table)} VALUES ("
+                + ", ".join("?" * width)
+                + ")"
+            )
+
+            def rows() -> Iterator[list[Any]]:
+                for record in reader:
+                    if not record:
+                        continue
+                    if len(record) != width:
+                        record = (record + [""] * width)[:width]
+                    yield [None if value == "" else value for value in record]
+
+            count = 0
+            for batch in _batches(rows()):
+                conn.executemany(insert, batch)
+                count += len(batch)
+
+        return columns, count
+
+    def _load_jsonl(
+        self,
+        conn : sqlite3.Connection,
+        table : str,
+        path : str,
+    ) -> tuple[list[str], int]:
+        columns : list[str] = []
+        index : dict[str, int] = {}
+        # SQLite column names are case-insensitive, as in _column_names
+        seen = {"_line"}
+        conn.execute(f"CREATE TABLE {quote_identifier(table)} (_line INTEGER)")
+
+        def insert_sql() -> str:
+            return (
+                f"INSERT INTO {quote_identifier(table)} ({', '.join(quote_identifier(c) for c in ['_line', *columns])}) "
+                f"VALUES ({', '.join('?' * (len(columns) + 1))})"
+            )
+
+        insert = insert_sql()
+        batch : list[list[Any]] = []
+        count = 0
+
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise QueryError(f"{path}:{number}: invalid JSON: {e}") from None
+                if not isinstance(record, dict):
+                    record = {"value" : record}
+
+                new_keys = [key for key in record if key not in index]
+                if new_keys:
+                    if batch:
+                        conn.executemany(insert, batch)
+                        batch = []
+                    for key in new_keys:
+                        name = key or f"column_{len(columns) + 1}"
+                        candidate, n = name, 2
+                        while candidate.lower() in seen:
+                            candidate = f"{name}_{n}"
+                            n += 1
+                        seen.add(candidate.lower())
+                        index[key] = len(columns)
+                        columns.append(candidate)
+                        conn.execute(f"ALTER TABLE {quote_identifier(table)} ADD COLUMN {quote_identifier(candidate)} NUMERIC")
+                    insert = insert_sql()
+
+                row = [None] * (len(columns) + 1)
+                row[0] = number
+                for key, value in record.items():
+                    row[index[key] + 1] = _cell(value)
+                batch.append(row)
+                count += 1
+
+                if len(batch) >= BATCH_SIZE:
+                    conn.executemany(insert, batch)
+                    batch = []
+
+        if batch:
+            conn.executemany(insert, batch)
+
+        return ["_line", *columns], count
+
+    def query(
+        self,
+        sql : str,
+        aliases : dict[str, LoadedTable],
+        limit : int,
+        timeout : float,
+    ) -> tuple[list[str], list[tuple], bool]:
+        """Run a read-only ``sql`` with each alias bound to its table.
+
+        Returns the column names, at most ``limit`` rows and whether more
+        rows were available.
+        """
+        with self._lock:
+            conn = self._connection()
+            for alias, loaded in aliases.items():
+                conn.execute(
+                    f"CREATE TEMP VIEW {quote_identifier(alias)} AS SELECT * FROM main.{quote_identifier(loaded.table)}"
+                )
+
+            deadline = time.monotonic() + timeout
+
+            def authorize(action : int, *args : Any) -> int:
+                return sqlite3.SQLITE_OK if action in _ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+            conn.set_authorizer(authorize)
+            conn.set_progress_handler(lambda: int(time.monotonic() > deadline), 10_000)
+            try:
+                cursor = conn.execute(sql)
+                rows = cursor.fetchmany(limit + 1)
+                columns = [d[0] for d in cursor.description or ()]
+                cursor.close()
+            except sqlite3.DatabaseError as e:
+                message = str(e)
+                if message == "interrupted":
+                    message = f"query exceeded {timeout:g}s"
+                elif "not authorized" in message:
+                    message = "only SELECT queries are allowed"
+                raise QueryError(message) from None
+            finally:
+                conn.set_authorizer(None)
+                conn.set_progress_handler(None, 0)
+                for alias in aliases:
+                    conn.execute(f"DROP VIEW IF EXISTS temp.{quote_identifier(alias)}")
+
+            return columns, rows[:limit], len(rows) > limit
+
+    def invalidate(self, paths : Optional[list[Path]] = None) -> None:
+        with self._lock:
+            targets = list(self._tables) if paths is None else [str(p) for p in paths]
+            for path in targets:
+                loaded = self._tables.pop(path, None)
+                if loaded and self._conn is not None:
+                    self._conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(loaded.table)}")
+
+
+table_store = TableStore()
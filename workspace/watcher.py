@@ -0,0 +1,354 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+from workspace.snapshot import IgnoreRules
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import sys
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WorkspaceChange:
+    """A coalesced batch of changed paths below the watched root.
+
+    ``overflow`` means the watcher lost track of individual paths and every
+    cache covering the workspace must be dropped.
+    """
+    paths : frozenset[Path]
+    overflow : bool = False
+    source : str = "fs"
+
+    def touches(self, path : Path) -> bool:
+        if self.overflow:
+            return True
+
+        return path in self.paths or any(p in path.parents for p in self.paths)
+
+
+Subscriber = Callable[[WorkspaceChange], None]
+
+
+class _Inotify:
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (
+        IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+        | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+    )
+
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self.fd = fd
+        self.watches : dict[int, Path] = {}
+
+    def add_watch(self, path : Path) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return
+            raise OSError(err, f"inotify_add_watch failed for {path}")
+
+        self.watches[wd] = path
+
+    def read_events(self) -> list[tuple[Path, int]]:
+        events : list[tuple[Path, int]] = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    events.append((Path(), mask))
+                    continue
+
+                base = self.watches.get(wd)
+                if base is None:
+                    continue
+                if mask & self.IN_IGNORED:
+                    del self.watches[wd]
+                    continue
+
+                events.append((base / os.fsdecode(name) if name else base, mask))
+
+    def close(self) -> None:
+        os.close(self.fd)
+        self.watches.clear()
+
+
+class WorkspaceWatcher:
+    """Publishes coalesced ``WorkspaceChange`` events for files below ``root``.
+
+    Uses inotify through ctypes on Linux and falls back to polling mtimes
+    elsewhere or when the inotify watch limit is exhausted.
+    """
+
+    def __init__(
+        self,
+        root : Path,
+        debounce : float = 0.05,
+        poll_interval : float = 2.0,
+        max_entries : int = 200_000,
+    ) -> None:
+        self.root = root.resolve()
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.max_entries = max_entries
+        self.ignore = IgnoreRules.for_root(self.root)
+        self.backend : Optional[str] = None
+
+        self._subscribers : list[Subscriber] = []
+        self._pending : set[Path] = set()
+        self._pending_overflow = False
+        self._flush_handle : Optional[asyncio.TimerHandle] = None
+        self._loop : Optional[asyncio.AbstractEventLoop] = None
+        self._inotify : Optional[_Inotify] = None
+        self._poll_task : Optional[asyncio.Task] = None
+        self._poll_state : dict[Path, tuple[int, int]] = {}
+
+    @property
+    def reliable(self) -> bool:
+        """True when every change is reported without polling latency."""
+        return self.backend == "inotify"
+
+    def subscribe(self, callback : Subscriber) -> Callable[[], None]:
+        self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    async def start(self) -> None:
+        if self.backend is not None:
+            return
+
+        self._loop = asyncio.get_running_loop()
+
+        if sys.platform.startswith("linux"):
+            try:
+                self._inotify = await asyncio.to_thread(self._start_inotify)
+                self._loop.add_reader(self._inotify.fd, self._on_inotify_readable)
+                self.backend = "inotify"
+                return
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify unavailable, falling back to polling: {e}")
+                if self._inotify:
+                    self._inotify.close()
+                self._inotify = None
+
+        self._poll_state = await asyncio.to_thread(self._scan_mtimes)
+        self._poll_task = asyncio.create_task(self._poll_loop())
+        self.backend = "polling"
+
+    async def stop(self) -> None:
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if self._inotify:
+            self._loop.remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+
+        if self._poll_task:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+
+        self.backend = None
+
+    async def sync(self, paths : Optional[Iterable[Path]] = None) -> None:
+        """Publish pending changes now, including writes the agent just made.
+
+        With ``paths`` the given files are published directly. Without them
+        the backend is drained (inotify) or re-scanned (polling) so that
+        changes made by e.g. a shell command are visible before the next
+        tool call.
+        """
+        if paths is not None:
+            self._pending.update(Path(p).resolve() for p in paths)
+        elif self._inotify:
+            self._on_inotify_readable(schedule=False)
+        elif self.backend == "polling":
+            self._apply_poll(await asyncio.to_thread(self._scan_mtimes))
+        else:
+            self._pending_overflow = True
+
+        self._flush(source="agent")
+
+    def _walk_dirs(self) -> Iterable[Path]:
+        stack = [self.root]
+        count = 0
+        while stack and count < self.max_entries:
+            current = stack.pop()
+            yield current
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        count += 1
+                        if not entry.is_dir(follow_symlinks=False):
+                            continue
+                        rel = Path(entry.path).relative_to(self.root).as_posix()
+                        if not self.ignore.is_ignored(rel, entry.name, True):
+                            stack.append(Path(entry.path))
+            except OSError:
+                continue
+
+    def _start_inotify(self) -> _Inotify:
+        inotify = _Inotify()
+        try:
+            for directory in self._walk_dirs():
+                inotify.add_watch(directory)
+        except OSError:
+            inotify.close()
+            raise
+
+        return inotify
+
+    def _on_inotify_readable(self, schedule : bool = True) -> None:
+        if not self._inotify:
+            return
+
+        for path, mask in self._inotify.read_events():
+            if mask & _Inotify.IN_Q_OVERFLOW:
+                self._pending_overflow = True
+                continue
+
+            if path != self.root:
+                rel = path.relative_to(self.root).as_posix()
+                if self.ignore.is_ignored(rel, path.name, bool(mask & _Inotify.IN_ISDIR)):
+                    continue
+
+            self._pending.add(path)
+
+            if mask & _Inotify.IN_ISDIR and mask & (_Inotify.IN_CREATE | _Inotify.IN_MOVED_TO):
+                self._watch_new_tree(path)
+
+        if schedule:
+            self._schedule_flush()
+
+    def _watch_new_tree(self, path : Path) -> None:
+        stack = [path]
+        try:
+            while stack:
+                current = stack.pop()
+                self._inotify.add_watch(current)
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+                        self._pending.add(Path(entry.path))
+        except OSError as e:
+            logger.warning(f"Could not watch {path}: {e}")
+            self._pending_overflow = True
+
+    def _scan_mtimes(self) -> dict[Path, tuple[int, int]]:
+        state : dict[Path, tuple[int, int]] = {}
+        for directory in self._walk_dirs():
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        rel = Path(entry.path).relative_to(self.root).as_posix()
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                        if self.ignore.is_ignored(rel, entry.name, is_dir):
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                        state[Path(entry.path)] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+
+        return state
+
+    def _apply_poll(self, state : dict[Path, tuple[int, int]]) -> None:
+        previous = self._poll_state
+        for path, value in state.items():
+            if previous.get(path) != value:
+                self._pending.add(path)
+
+        self._pending.update(path for path in previous.keys() - state.keys())
+        self._poll_state = state
+
+    async def _poll_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self._apply_poll(await asyncio.to_thread(self._scan_mtimes))
+            except Exception:
+                logger.exception("Workspace poll failed")
+                continue
+
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_handle or not (self._pending or self._pending_overflow):
+            return
+
+        self._flush_handle = self._loop.call_later(self.debounce, self._flush)
+
+    def _flush(self, source : str = "fs") -> None:
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not (self._pending or self._pending_overflow):
+            return
+
+        change = WorkspaceChange(
+            paths = frozenset(self._pending),
+            overflow = self._pending_overflow,
+            source = source,
+        )
+        self._pending = set()
+        self._pending_overflow = False
+
+        for callback in list(self._subscribers):
+            try:
+                callback(change)
+            except Exception:
+                logger.exception(f"Workspace change subscriber {callback!r} failed")